@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import re
+import threading
+
+from kayak_urls import AIRPORT_CODES
+
+RESULTS_URL_RE = re.compile(r"/flights/([A-Z]{3})[^/-]*-([A-Z]{3})[^/]*/\d{4}-\d{2}-\d{2}")
+
+_default_resolver = None
+_default_lock = threading.Lock()
+
+
+class AirportResolver:
+    """
+    Persistent map from free-text city names to the codes Kayak resolved them to
+
+    Seeded with the built-in AIRPORT_CODES and whatever earlier runs saved to
+    `path`. Every search that goes through the autocomplete form teaches it
+    the codes Kayak picked (read back from the results URL), so the next task
+    for that city can deep-link and skip autocomplete entirely.
+    """
+
+    def __init__(self, path="data/airport_codes.json", seed=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._codes = {k.lower(): v for k, v in (AIRPORT_CODES if seed is None else seed).items()}
+        self._codes.update(self._load())
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return {k.lower(): v for k, v in json.load(f).items()}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read airport code cache {self.path}: {e}")
+            return {}
+
+    def resolve(self, place):
+        with self._lock:
+            return self._codes.get(place.strip().lower())
+
+    def learn(self, place, code):
+        """Remember a city's code and persist it if it is new"""
+        key = place.strip().lower()
+        with self._lock:
+            if self._codes.get(key) == code:
+                return False
+            self._codes[key] = code
+        logging.info(f"Airport cache: {place} -> {code}")
+        self.save()
+        return True
+
+    def learn_from_url(self, origin, destination, url):
+        """Pick the origin/destination codes out of a Kayak results URL"""
+        match = RESULTS_URL_RE.search(url or "")
+        if not match:
+            return False
+        learned_origin = self.learn(origin, match.group(1))
+        learned_destination = self.learn(destination, match.group(2))
+        return learned_origin or learned_destination
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            # Merge with what other processes saved since we loaded
+            codes = self._load()
+            codes.update(self._codes)
+            self._codes = codes
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(codes, f, indent=4, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def default_resolver():
+    """Process-wide resolver backed by data/airport_codes.json"""
+    global _default_resolver
+    with _default_lock:
+        if _default_resolver is None:
+            _default_resolver = AirportResolver()
+        return _default_resolver
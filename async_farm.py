@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import signal
+
+from farm_common import ROUTES, build_tasks, setup_logging, summarize_task
+from driver_pool import DriverPool
+from kayak_urls import KAYAK_BASE_URL
+from metrics import RunMetrics, format_report, save_report
+from scheduler import order_tasks
+from tracing import Tracer, log_breakdown
+from rate_limiter import AdaptiveRateLimiter
+
+
+class AsyncScraperFarm:
+    """
+    asyncio replacement for the thread-per-worker farm
+
+    Tasks sit in an asyncio.Queue and are consumed by `max_concurrency` worker
+    coroutines. The "http" backend awaits the HTTP engine directly, so every
+    in-flight search is just a pending coroutine; the "browser" backend runs
+    Selenium in worker threads bounded by `browser_slots`. Each task gets
+    `task_timeout` seconds. stop() (also wired to SIGINT/SIGTERM) stops taking
+    new tasks and lets in-flight ones drain for up to `drain_timeout` seconds
+    before they are cancelled. Both backends pace requests through a shared
+    AdaptiveRateLimiter, every task is recorded on a RunMetrics and, with a
+    Tracer, each search is timed as a span.
+    """
+
+    def __init__(self, backend="browser", max_concurrency=3, browser_slots=None, task_timeout=600,
+                 drain_timeout=120, base_url=KAYAK_BASE_URL, pool=None, lean=None, limiter=None,
+                 flight_store=None, max_retries=2, fallback=True, metrics=None, tracer=None):
+        if backend not in ("browser", "http"):
+            raise ValueError(f"Unknown backend: {backend}")
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.browser_slots_size = browser_slots or (max_concurrency if backend == "browser" else 2)
+        self.task_timeout = task_timeout
+        self.drain_timeout = drain_timeout
+        self.base_url = base_url
+        self.pool = pool
+        self.lean = lean
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.flight_store = flight_store
+        self.max_retries = max_retries
+        self.fallback = fallback
+        self.metrics = metrics
+        self.tracer = tracer
+
+        self.results = []
+        self._stopping = None
+        self._browser_slots = None
+        self._engine = None
+
+    def stop(self):
+        """Stop taking new tasks; in-flight tasks keep running until drained"""
+        if self._stopping and not self._stopping.is_set():
+            logging.info("Shutdown requested, draining in-flight tasks")
+            self._stopping.set()
+
+    async def _run_browser(self, task):
+        from farm import scrape_flight_data
+
+        # The slot is held until the thread really finishes, even if the task
+        # times out, since a Selenium call cannot be interrupted from outside
+        await self._browser_slots.acquire()
+        job = asyncio.ensure_future(asyncio.to_thread(
+            scrape_flight_data, task["origin"], task["destination"], task["date"],
+            headless=True, pool=self.pool, lean=self.lean, limiter=self.limiter, metrics=self.metrics,
+            tracer=self.tracer
+        ))
+        job.add_done_callback(lambda _: self._browser_slots.release())
+        return await asyncio.shield(job)
+
+    async def _run_http(self, task):
+        from http_engine import scrape_flight_data_async
+
+        return await scrape_flight_data_async(
+            self._engine, task["origin"], task["destination"], task["date"],
+            max_retries=self.max_retries, fallback=self.fallback, browser_slots=self._browser_slots,
+            metrics=self.metrics, tracer=self.tracer, headless=True, pool=self.pool, lean=self.lean, limiter=self.limiter
+        )
+
+    async def _worker(self, name, task_queue):
+        run = self._run_http if self.backend == "http" else self._run_browser
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            try:
+                task = task_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            origin, destination, date_str = task["origin"], task["destination"], task["date"]
+            started = loop.time()
+            error = None
+            try:
+                flight_data = await asyncio.wait_for(run(task), self.task_timeout)
+            except asyncio.TimeoutError:
+                logging.error(f"{name}: {origin} to {destination} on {date_str} timed out after {self.task_timeout}s")
+                flight_data, error = [], "timeout"
+            except Exception as e:
+                logging.error(f"{name} error: {e}", exc_info=True)
+                flight_data, error = [], str(e)
+            finally:
+                task_queue.task_done()
+            if self.metrics:
+                self.metrics.record(task, flight_data, loop.time() - started, error=error)
+
+            # File writes are blocking, keep them off the event loop
+            self.results.append(await asyncio.to_thread(summarize_task, flight_data, origin, destination, date_str,
+                                                        self.flight_store))
+
+    async def run(self, tasks):
+        tasks = list(tasks)
+        self._stopping = asyncio.Event()
+        self._browser_slots = asyncio.Semaphore(self.browser_slots_size)
+        if self.metrics is None:
+            self.metrics = RunMetrics(f"async-{self.backend}", planned=tasks)
+
+        # One shared queue needs no stealing, only priority order
+        task_queue = asyncio.Queue()
+        for task in order_tasks(tasks):
+            task_queue.put_nowait(task)
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows, or not running in the main thread
+
+        owns_pool = self.backend == "browser" and self.pool is None
+        if owns_pool:
+            from farm import setup_driver
+
+            self.pool = DriverPool(lambda: setup_driver(headless=True, lean=self.lean),
+                                   max_size=self.browser_slots_size)
+        if self.backend == "http":
+            from http_engine import HttpSearchEngine
+            self._engine = HttpSearchEngine(base_url=self.base_url, max_connections=max(self.max_concurrency, 10),
+                                            limiter=self.limiter)
+
+        workers = [
+            asyncio.create_task(self._worker(f"worker-{i}", task_queue))
+            for i in range(min(self.max_concurrency, task_queue.qsize()))
+        ]
+        try:
+            # Returns when the queue is exhausted or a stop request has been drained
+            stop_wait = asyncio.create_task(self._stopping.wait())
+            done_wait = asyncio.gather(*workers)
+            await asyncio.wait([stop_wait, done_wait], return_when=asyncio.FIRST_COMPLETED)
+            if self._stopping.is_set():
+                _, pending = await asyncio.wait(workers, timeout=self.drain_timeout)
+                for worker_task in pending:
+                    worker_task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                logging.info(f"Shutdown complete, {task_queue.qsize()} tasks left unstarted")
+            stop_wait.cancel()
+            await asyncio.gather(done_wait, return_exceptions=True)
+        finally:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.remove_signal_handler(sig)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            if self._engine:
+                await self._engine.close()
+            if self.flight_store is not None:
+                await asyncio.to_thread(self.flight_store.flush)
+            if owns_pool:
+                # Let browser threads that outlived a timeout finish before closing
+                await asyncio.to_thread(self.pool.close)
+                self.pool = None
+            self.metrics.finish()
+            if self.tracer:
+                self.tracer.flush()
+
+        return self.results
+
+
+def run_async_farm(routes=None, days_ahead=None, backend="browser", max_concurrency=3, per_task_files=False,
+                   **kwargs):
+    """
+    Event-loop counterpart of farm.run_scraper_farm
+
+    Args:
+        routes: List of origin-destination pairs to scrape. Default is ROUTES.
+        days_ahead: List of days to look ahead for each route. Default is [0, 7, 14].
+        backend: "browser" for Selenium or "http" for the browserless engine.
+        max_concurrency: Number of tasks in flight at once.
+        per_task_files: Write per-task JSON/CSV files instead of the default
+            FlightStoreWriter on data/flights (used when no flight_store is given).
+            A flight_store passed in kwargs is closed when the run ends.
+        **kwargs: Passed through to AsyncScraperFarm. A Tracer is created
+            unless one is given, and its per-stage breakdown is logged.
+    """
+    if routes is None:
+        routes = ROUTES
+    if days_ahead is None:
+        days_ahead = [0, 7, 14]
+
+    kwargs.setdefault("tracer", Tracer(f"async-{backend}"))
+    if kwargs.get("flight_store") is None and not per_task_files:
+        from flight_store import FlightStoreWriter
+
+        kwargs["flight_store"] = FlightStoreWriter()
+    farm = AsyncScraperFarm(backend=backend, max_concurrency=max_concurrency, **kwargs)
+    try:
+        results = asyncio.run(farm.run(build_tasks(routes, days_ahead)))
+    finally:
+        # The farm owns the sink from here on: flush it and release its client
+        if farm.flight_store is not None:
+            farm.flight_store.close()
+    for key, stats in farm.limiter.snapshot().items():
+        logging.info(f"Rate limiter {key}: {stats['rate'] * 60:.1f} requests/min "
+                     f"({stats['successes']} clean, {stats['blocks']} blocked)")
+
+    logging.info(f"Scraping completed for {len(results)} route-date combinations")
+    for result in results:
+        status = "SUCCESS" if result["flights_found"] > 0 else "FAILED"
+        logging.info(f"{status}: {result['origin']} to {result['destination']} on {result['date']}: {result['flights_found']} flights")
+    report = farm.metrics.report()
+    for line in format_report(report).splitlines():
+        logging.info(line)
+    save_report(report)
+    if farm.tracer:
+        log_breakdown(farm.tracer)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the scraper farm on an asyncio event loop")
+    parser.add_argument("--backend", choices=["browser", "http"], default="browser")
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--task-timeout", type=float, default=600)
+    parser.add_argument("--base-url", default=KAYAK_BASE_URL)
+    args = parser.parse_args()
+
+    setup_logging()
+    run_async_farm(backend=args.backend, max_concurrency=args.concurrency,
+                   task_timeout=args.task_timeout, base_url=args.base_url)
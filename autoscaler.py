@@ -0,0 +1,251 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+_last_cpu_times = None
+
+
+def _proc_cpu_load():
+    """Busy fraction of all cores since the previous call, from /proc/stat (what psutil.cpu_percent does)"""
+    global _last_cpu_times
+    with open("/proc/stat", encoding="ascii") as f:
+        fields = [int(value) for value in f.readline().split()[1:]]
+    idle, total = fields[3] + fields[4], sum(fields[:8])  # idle + iowait; guest time is already in user
+    previous, _last_cpu_times = _last_cpu_times, (idle, total)
+    if previous is None or total == previous[1]:
+        return None
+    return 1 - (idle - previous[0]) / (total - previous[1])
+
+
+def host_resources():
+    """
+    Free memory (MiB), CPU load (0..1 of all cores) and core count of this host
+    Uses psutil when installed, /proc otherwise (the load average off Linux); unknown values are None
+    """
+    cpus = os.cpu_count() or 1
+    try:
+        import psutil
+
+        memory = psutil.virtual_memory()
+        return {"free_memory_mb": memory.available / 2 ** 20, "total_memory_mb": memory.total / 2 ** 20,
+                "cpu_load": psutil.cpu_percent(interval=None) / 100, "cpus": cpus}
+    except ImportError:
+        pass
+
+    free = total = None
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            meminfo = {line.split(":")[0]: int(line.split()[1]) for line in f}
+        free, total = meminfo["MemAvailable"] / 1024, meminfo["MemTotal"] / 1024
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        load = _proc_cpu_load()
+    except (OSError, IndexError, ValueError):
+        try:
+            load = os.getloadavg()[0] / cpus
+        except (AttributeError, OSError):
+            load = None
+    return {"free_memory_mb": free, "total_memory_mb": total, "cpu_load": load, "cpus": cpus}
+
+
+def default_max_sessions(memory_per_session_mb=500, min_free_memory_mb=1024):
+    """How many browsers this box could hold: bounded by memory headroom and two per core"""
+    resources = host_resources()
+    by_cpu = resources["cpus"] * 2
+    if resources["total_memory_mb"] is None:
+        return max(1, by_cpu)
+    by_memory = int((resources["total_memory_mb"] - min_free_memory_mb) // memory_per_session_mb)
+    return max(1, min(by_cpu, by_memory))
+
+
+class Autoscaler:
+    """
+    Adjusts the number of concurrently active browser sessions while a farm runs
+
+    Workers hold a slot (session()) for each task, so at most `target` tasks
+    run at once; the farm starts `max_sessions` threads and the rest wait. A
+    control thread re-evaluates the target every `interval` seconds:
+
+    - it halves the target on a limiter block or when the task error rate
+      exceeds `max_error_rate`, and then holds off growing for `cooldown`
+      intervals;
+    - it sheds a browser when free memory drops below `min_free_memory_mb`
+      (halving when it drops below half of that), or when CPU load is above
+      `max_cpu`, so the box backs off before it swaps;
+    - otherwise it hill-climbs on throughput. Once a setting has finished
+      `min_samples` tasks, it grows by one while that keeps paying (tasks/s
+      up by at least `min_gain`), but only while every slot has work and the
+      next browser fits in memory. When growth stops paying it steps back
+      and holds.
+
+    on_resize(target) is called after every change, e.g. DriverPool.resize,
+    so idle browsers above the new target are quit.
+    """
+
+    def __init__(self, min_sessions=1, max_sessions=None, initial=2, interval=15.0, limiter=None,
+                 memory_per_session_mb=500, min_free_memory_mb=1024, max_cpu=0.9, max_error_rate=0.3,
+                 min_samples=None, min_gain=0.05, cooldown=4, on_resize=None):
+        self.min_sessions = min_sessions
+        self.max_sessions = max_sessions or default_max_sessions(memory_per_session_mb, min_free_memory_mb)
+        self.target = max(min_sessions, min(initial, self.max_sessions))
+        self.interval = interval
+        self.limiter = limiter
+        self.memory_per_session_mb = memory_per_session_mb
+        self.min_free_memory_mb = min_free_memory_mb
+        self.max_cpu = max_cpu
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.min_gain = min_gain
+        self.cooldown = cooldown
+        self.on_resize = on_resize
+
+        self.history = []
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._done = 0
+        self._failed = 0
+        self._window_started = time.monotonic()
+        self._window_busy = False
+        self._last_throughput = None
+        self._last_move = 0
+        self._hold = 0
+        self._blocks_seen = self._limiter_blocks()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _limiter_blocks(self):
+        if not self.limiter:
+            return 0
+        return sum(stats["blocks"] for stats in self.limiter.snapshot().values())
+
+    def acquire(self):
+        """Block until the number of active sessions is below the target"""
+        with self._cond:
+            self._waiting += 1
+            while self._active >= self.target and not self._stop.is_set():
+                self._cond.wait()
+            self._waiting -= 1
+            self._active += 1
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def session(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record(self, ok):
+        """One finished task; failures count towards the error rate"""
+        with self._cond:
+            self._done += 1
+            if not ok:
+                self._failed += 1
+            # Only windows where every slot had work say anything about throughput
+            if self._waiting:
+                self._window_busy = True
+
+    def _resize(self, target, reason):
+        target = max(self.min_sessions, min(self.max_sessions, target))
+        with self._cond:
+            previous, self.target = self.target, target
+            self._cond.notify_all()
+        if target == previous:
+            return
+        logging.info(f"Autoscaler: {previous} -> {target} sessions ({reason})")
+        self.history.append({"time": time.time(), "from": previous, "to": target, "reason": reason})
+        if self.on_resize:
+            self.on_resize(target)
+
+    def _headroom(self, free, load):
+        """Room for one more browser without going under the memory floor or over the CPU limit"""
+        fits = free is None or free >= self.min_free_memory_mb + self.memory_per_session_mb
+        return fits and (load is None or load < self.max_cpu)
+
+    def _new_window(self):
+        self._done = self._failed = 0
+        self._window_started = time.monotonic()
+        self._window_busy = False
+
+    def step(self):
+        """One control decision; called every `interval` seconds by start()"""
+        resources = host_resources()
+        free, load = resources["free_memory_mb"], resources["cpu_load"]
+        blocks = self._limiter_blocks()
+        new_blocks, self._blocks_seen = blocks - self._blocks_seen, blocks
+        with self._cond:
+            done, failed, busy = self._done, self._failed, self._window_busy
+            elapsed = time.monotonic() - self._window_started
+        self._hold = max(self._hold - 1, 0)
+        climbing = self._last_move, self._last_throughput
+        # Safety decisions start the throughput comparison over
+        self._last_move, self._last_throughput = 0, None
+
+        if free is not None and free < self.min_free_memory_mb:
+            # Well below the floor the box is about to swap: halve, otherwise shed one browser
+            self._hold = self.cooldown
+            shrink = self.target // 2 if free < self.min_free_memory_mb / 2 else self.target - 1
+            self._resize(shrink, f"free memory {free:.0f} MiB")
+        elif new_blocks or (done >= 3 and failed / done > self.max_error_rate):
+            self._hold = self.cooldown
+            reason = f"{new_blocks} blocks" if new_blocks else f"error rate {failed / done:.0%}"
+            self._resize(self.target // 2, reason)
+        elif load is not None and load > self.max_cpu:
+            self._resize(self.target - 1, f"CPU load {load:.0%}")
+        elif done >= (self.min_samples or self.target) and elapsed > 0:
+            throughput = done / elapsed
+            last_move, last_throughput = climbing
+            if last_move > 0 and last_throughput and throughput < last_throughput * (1 + self.min_gain):
+                # The last session added nothing: step back and stay there for a while
+                self._hold = self.cooldown
+                self._last_move = -1
+                self._resize(self.target - 1, f"throughput plateaued at {throughput * 60:.1f} tasks/min")
+            elif busy and not self._hold and self.target < self.max_sessions and self._headroom(free, load):
+                self._last_move = 1
+                self._resize(self.target + 1, f"{throughput * 60:.1f} tasks/min with headroom")
+            else:
+                self._last_move = 0
+            self._last_throughput = throughput
+        else:
+            # Not enough finished tasks to judge this setting yet
+            self._last_move, self._last_throughput = climbing
+            return
+        with self._cond:
+            self._new_window()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                logging.warning(f"Autoscaler step failed: {e}")
+
+    def start(self):
+        host_resources()  # psutil's first cpu_percent() call only primes its counters
+        self._thread = threading.Thread(target=self._run, name="autoscaler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def summary(self):
+        targets = [self.history[0]["from"]] + [change["to"] for change in self.history] if self.history \
+            else [self.target]
+        return {"final": self.target, "min": min(targets), "max": max(targets), "changes": len(self.history),
+                "max_sessions": self.max_sessions}
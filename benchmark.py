@@ -0,0 +1,471 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_CITIES = ["Karachi", "Lahore", "Islamabad", "London", "Paris", "Berlin"]
+HYBRID_PROCESSES = [1, 2, 4, 6, 8]
+
+
+def build_bench_tasks(cities, days_ahead):
+    """Every ordered city pair for every day ahead, in a fixed order"""
+    tasks = []
+    for days in days_ahead:
+        day = (datetime.now() + timedelta(days=days)).strftime("%B %d, %Y")
+        for origin in cities:
+            for destination in cities:
+                if origin != destination:
+                    tasks.append({"origin": origin, "destination": destination, "date": day})
+    return tasks
+
+
+def _scrape_task(job):
+    """
+    One unit of work: a search against the mock (or the live site when base_url is None)
+    Returns (flights, seconds, attempts) so process pools can report back per-task numbers
+    """
+    from metrics import RunMetrics
+
+    task, base_url, retries = job
+    started = time.perf_counter()
+    if base_url is None:
+        from main import scrape_kayak_flights
+
+        return scrape_kayak_flights(task["origin"], task["destination"]), time.perf_counter() - started, 1
+    from http_engine import scrape_flight_data_http
+
+    counter = RunMetrics("task")
+    flights = scrape_flight_data_http(task["origin"], task["destination"], task["date"],
+                                      max_retries=retries, fallback=False, base_url=base_url, metrics=counter)
+    return flights, time.perf_counter() - started, counter.report()["pages"]
+
+
+def _scrape_chunk(jobs):
+    with ThreadPoolExecutor() as executor:
+        return list(executor.map(_scrape_task, jobs))
+
+
+def _chunkify(data, num_chunks):
+    chunk_size = math.ceil(len(data) / num_chunks)
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+
+def _collect(jobs, outcomes, metrics):
+    for (task, _, _), (flights, seconds, attempts) in zip(jobs, outcomes):
+        metrics.record(task, flights, seconds, attempts=attempts)
+    return [flights for flights, _, _ in outcomes]
+
+
+def run_sequential(jobs, workers, metrics):
+    return _collect(jobs, [_scrape_task(job) for job in jobs], metrics)
+
+
+def run_threadpool(jobs, workers, metrics):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return _collect(jobs, list(executor.map(_scrape_task, jobs)), metrics)
+
+
+def run_processpool(jobs, workers, metrics):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return _collect(jobs, list(executor.map(_scrape_task, jobs)), metrics)
+
+
+def run_joblib(jobs, workers, metrics):
+    from joblib import Parallel, delayed
+
+    return _collect(jobs, Parallel(n_jobs=workers)(delayed(_scrape_task)(job) for job in jobs), metrics)
+
+
+def make_hybrid(num_processes):
+    def run_hybrid(jobs, workers, metrics):
+        with ProcessPoolExecutor(max_workers=num_processes) as executor:
+            nested = list(executor.map(_scrape_chunk, _chunkify(jobs, num_processes)))
+        return _collect(jobs, [item for chunk in nested for item in chunk], metrics)
+    return run_hybrid
+
+
+def run_autoscaled(jobs, workers, metrics):
+    """Up to `workers` threads, with an Autoscaler deciding how many of them scrape at once"""
+    from autoscaler import Autoscaler
+
+    scaler = Autoscaler(max_sessions=workers, initial=1, interval=1.0, min_samples=2, cooldown=2).start()
+
+    def scrape(job):
+        with scaler.session():
+            outcome = _scrape_task(job)
+            scaler.record(bool(outcome[0]))
+        return outcome
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(scrape, jobs))
+    finally:
+        scaler.stop()
+    logging.info(f"Autoscaled: {scaler.summary()}")
+    return _collect(jobs, outcomes, metrics)
+
+
+def _steal_worker(scheduler, worker, base_url, retries):
+    outcomes = []
+    while True:
+        task = scheduler.next(worker)
+        if task is None:
+            return outcomes
+        outcome = _scrape_task((task, base_url, retries))
+        scheduler.done(task, outcome[1])
+        outcomes.append((task, outcome))
+
+
+def _steal_process(scheduler, first_worker, threads, base_url, retries):
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        nested = executor.map(lambda worker: _steal_worker(scheduler, worker, base_url, retries),
+                              range(first_worker, first_worker + threads))
+        return [outcome for chunk in nested for outcome in chunk]
+
+
+def make_hybrid_steal(num_processes):
+    """Hybrid-N with a shared work-stealing scheduler instead of fixed chunks"""
+    def run_hybrid_steal(jobs, workers, metrics):
+        from scheduler import shared_scheduler
+
+        _, base_url, retries = jobs[0]
+        # Same thread count per process as Hybrid-N's default ThreadPoolExecutor
+        threads = min(32, (os.cpu_count() or 1) + 4)
+        manager, scheduler = shared_scheduler([task for task, _, _ in jobs], workers=num_processes * threads)
+        try:
+            with ProcessPoolExecutor(max_workers=num_processes) as executor:
+                nested = list(executor.map(_steal_process, [scheduler] * num_processes,
+                                           range(0, num_processes * threads, threads), [threads] * num_processes,
+                                           [base_url] * num_processes, [retries] * num_processes))
+            logging.info(f"HybridSteal-{num_processes}: {scheduler.stats()}")
+        finally:
+            manager.shutdown()
+        by_task = {(t["origin"], t["destination"], t["date"]): outcome
+                   for chunk in nested for t, outcome in chunk}
+        outcomes = [by_task[(t["origin"], t["destination"], t["date"])] for t, _, _ in jobs]
+        return _collect(jobs, outcomes, metrics)
+    return run_hybrid_steal
+
+
+class _CollectSink:
+    """Keeps each task's flights in memory so the async farm writes no files during a benchmark"""
+
+    def __init__(self):
+        self.flights = {}
+
+    def write(self, records):
+        first = records[0]
+        self.flights[(first["origin"], first["destination"], first["date"])] = records
+
+    def flush(self):
+        pass
+
+
+def run_async_http(jobs, workers, metrics):
+    """The asyncio farm on its HTTP backend, with pacing effectively disabled"""
+    from async_farm import AsyncScraperFarm
+    from kayak_urls import KAYAK_BASE_URL
+    from rate_limiter import AdaptiveRateLimiter
+
+    tasks = [task for task, _, _ in jobs]
+    base_url, retries = jobs[0][1] or KAYAK_BASE_URL, jobs[0][2]
+    sink = _CollectSink()
+    farm = AsyncScraperFarm(backend="http", max_concurrency=workers, base_url=base_url,
+                            limiter=AdaptiveRateLimiter(initial_rate=1e6, max_rate=1e6, burst=workers),
+                            flight_store=sink, max_retries=retries, fallback=False, metrics=metrics)
+    asyncio.run(farm.run(tasks))
+    return [sink.flights.get((t["origin"], t["destination"], t["date"]), []) for t in tasks]
+
+
+# Strategies on the HTTP engine, whose polling protocol is unverified against kayak.com (see http_engine.POLL_PATH)
+MOCK_ONLY = {"AsyncHTTP"}
+
+
+def strategies():
+    """Name -> runner(jobs, workers, metrics), the same set scraper.py used to compare plus the newer engines"""
+    table = {
+        "Sequential": run_sequential,
+        "ThreadPool": run_threadpool,
+        "ProcessPool": run_processpool,
+        "Joblib": run_joblib,
+    }
+    for num_processes in HYBRID_PROCESSES:
+        table[f"Hybrid-{num_processes}"] = make_hybrid(num_processes)
+    for num_processes in HYBRID_PROCESSES:
+        table[f"HybridSteal-{num_processes}"] = make_hybrid_steal(num_processes)
+    table["Autoscaled"] = run_autoscaled
+    table["AsyncHTTP"] = run_async_http
+    return table
+
+
+def _usage():
+    """CPU seconds and peak RSS (MiB) so far; both are process-lifetime high-water marks, see run_trial_isolated"""
+    if resource is None:
+        return 0.0, 0.0
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return cpu, max(own.ru_maxrss, children.ru_maxrss) * scale / 2 ** 20
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def run_trial(name, runner, jobs, workers, server=None):
+    from metrics import RunMetrics
+
+    if server is not None:
+        server.reset()
+    metrics = RunMetrics(name, planned=[task for task, _, _ in jobs])
+    cpu_before, _ = _usage()
+    started = time.perf_counter()
+    results = runner(jobs, workers, metrics)
+    wall = time.perf_counter() - started
+    cpu_after, peak_rss = _usage()
+    report = metrics.finish().report()
+
+    succeeded = sorted(f"{job[0]['origin']}-{job[0]['destination']}-{job[0]['date']}"
+                       for job, flights in zip(jobs, results) if flights)
+    return {
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(cpu_after - cpu_before, 4),
+        "peak_rss_mb": round(peak_rss, 1),
+        "succeeded": len(succeeded),
+        "failed": len(jobs) - len(succeeded),
+        "flights": sum(len(flights or []) for flights in results),
+        "work_digest": hashlib.sha1("|".join(succeeded).encode()).hexdigest()[:12],
+        "metrics": {k: v for k, v in report.items() if k not in ("label", "missing_tasks")},
+    }
+
+
+def _isolated_trial(args):
+    name, jobs, workers = args
+    return run_trial(name, strategies()[name], jobs, workers)
+
+
+def run_trial_isolated(name, jobs, workers, server=None):
+    """
+    run_trial in a freshly spawned process
+    ru_maxrss only ever rises within a process, so in-process trials would report the
+    peak of every earlier strategy; a fresh process measures this trial's peak alone
+    """
+    import multiprocessing
+
+    if server is not None:
+        server.reset()
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_isolated_trial, (name, jobs, workers)).result()
+
+
+def summarize(trials, task_count):
+    walls = [t["wall_seconds"] for t in trials]
+    median_wall = statistics.median(walls)
+    return {
+        "median_wall_seconds": round(median_wall, 4),
+        "p95_wall_seconds": round(_percentile(walls, 95), 4),
+        "throughput_tasks_per_second": round(task_count / median_wall, 3) if median_wall else None,
+        "median_cpu_seconds": round(statistics.median(t["cpu_seconds"] for t in trials), 4),
+        "peak_rss_mb": max(t["peak_rss_mb"] for t in trials),
+        "succeeded": trials[-1]["succeeded"],
+        "failed": trials[-1]["failed"],
+        # Every trial should have done exactly the same work
+        "consistent": len({t["work_digest"] for t in trials}) == 1,
+        "work_digest": trials[-1]["work_digest"],
+        "median_latency_p95_seconds": round(statistics.median(t["metrics"]["latency_seconds"]["p95"] or 0
+                                                              for t in trials), 3),
+        "retry_rate": trials[-1]["metrics"]["retry_rate"],
+        "duplicate_rate": trials[-1]["metrics"]["duplicate_rate"],
+        "coverage": trials[-1]["metrics"]["coverage"],
+        "trials": trials,
+    }
+
+
+def run_suite(tasks, names=None, workers=4, trials=5, warmup=1, retries=0, base_url=None, server=None, isolate=True):
+    """
+    Warm up and time every strategy over the same task list; returns {name: summary}
+    With isolate every trial runs in its own process, so peak RSS is per trial
+    """
+    jobs = [(task, base_url, retries) for task in tasks]
+    report = {}
+    for name, runner in strategies().items():
+        if names and name not in names:
+            continue
+        if base_url is None and name in MOCK_ONLY:
+            logging.warning(f"Skipping {name}: the HTTP engine is experimental and only runs against the mock")
+            report[name] = {"skipped": "experimental HTTP engine, mock target only"}
+            continue
+        if isolate:
+            trial = lambda: run_trial_isolated(name, jobs, workers, server)
+        else:
+            trial = lambda: run_trial(name, runner, jobs, workers, server)
+        try:
+            for _ in range(warmup):
+                trial()
+            runs = []
+            for i in range(trials):
+                runs.append(trial())
+                logging.info(f"{name} trial {i + 1}/{trials}: {runs[-1]['wall_seconds']:.2f}s, "
+                             f"{runs[-1]['succeeded']}/{len(jobs)} tasks")
+        except ImportError as e:
+            logging.warning(f"Skipping {name}: {e}")
+            report[name] = {"skipped": str(e)}
+            continue
+        report[name] = summarize(runs, len(jobs))
+
+    digests = {r["work_digest"] for r in report.values() if "work_digest" in r}
+    if len(digests) > 1:
+        logging.warning("Strategies completed different task sets; compare their succeeded/failed counts")
+    return report
+
+
+def compare(report, baseline, tolerance=0.10):
+    """Strategies whose median wall time regressed by more than `tolerance` against a baseline report"""
+    ignored = ("strategies", "tolerance")
+    current_config = {k: v for k, v in report["meta"]["config"].items() if k not in ignored}
+    baseline_config = {k: v for k, v in baseline.get("meta", {}).get("config", {}).items() if k not in ignored}
+    if current_config != baseline_config:
+        logging.warning("Baseline was run with a different configuration, timings may not be comparable")
+
+    regressions = []
+    for name, current in report["strategies"].items():
+        previous = baseline.get("strategies", {}).get(name, {})
+        if "median_wall_seconds" not in current or "median_wall_seconds" not in previous:
+            continue
+        ratio = current["median_wall_seconds"] / previous["median_wall_seconds"]
+        print(f"{name:<14} {previous['median_wall_seconds']:>8.3f}s -> {current['median_wall_seconds']:>8.3f}s "
+              f"({ratio:.2f}x)")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def plot_report(report, path):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    rows = {name: r for name, r in report["strategies"].items() if "median_wall_seconds" in r}
+    labels = list(rows)
+    plt.figure(figsize=(14, 5))
+    for i, (key, title, color) in enumerate([("median_wall_seconds", "Median wall time (s)", "steelblue"),
+                                             ("throughput_tasks_per_second", "Throughput (tasks/s)", "green"),
+                                             ("median_cpu_seconds", "CPU time (s)", "orange")]):
+        plt.subplot(1, 3, i + 1)
+        plt.bar(labels, [rows[name][key] or 0 for name in labels], color=color)
+        plt.title(title)
+        plt.xticks(rotation=45)
+    plt.tight_layout()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    plt.savefig(path)
+    plt.close()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the scraping strategies against a local mock Kayak")
+    parser.add_argument("--target", choices=["mock", "live"], default="mock")
+    parser.add_argument("--strategies", nargs="+", help=f"Subset of: {', '.join(strategies())}")
+    parser.add_argument("--cities", nargs="+", default=DEFAULT_CITIES)
+    parser.add_argument("--days", type=int, nargs="+", default=[7])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--retries", type=int, default=0, help="Per-task retries (mock target)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="data/benchmark.json")
+    parser.add_argument("--compare", help="Baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--plot", help="Save a bar chart to this image path")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run trials in this process (faster; peak RSS then only ever rises)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    tasks = build_bench_tasks(args.cities, args.days)
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "compare", "plot")}
+    config["tasks"] = len(tasks)
+
+    if args.target == "mock":
+        from mock_kayak import MockKayakServer
+
+        with MockKayakServer(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+                             seed=args.seed) as server:
+            results = run_suite(tasks, args.strategies, args.workers, args.trials, args.warmup, args.retries,
+                                base_url=server.base_url, server=server, isolate=not args.in_process)
+    else:
+        results = run_suite(tasks, args.strategies, args.workers, args.trials, args.warmup,
+                            isolate=not args.in_process)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": config,
+        },
+        "strategies": results,
+    }
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    print(f"\n{'strategy':<14} {'median s':>9} {'p95 s':>8} {'tasks/s':>8} {'cpu s':>7} {'rss MB':>7}  done")
+    for name, r in results.items():
+        if "skipped" in r:
+            print(f"{name:<14} skipped ({r['skipped']})")
+            continue
+        print(f"{name:<14} {r['median_wall_seconds']:>9.3f} {r['p95_wall_seconds']:>8.3f} "
+              f"{r['throughput_tasks_per_second']:>8.2f} {r['median_cpu_seconds']:>7.2f} {r['peak_rss_mb']:>7.1f}  "
+              f"{r['succeeded']}/{len(tasks)}{'' if r['consistent'] else ' (varied between trials)'}")
+    print(f"Report saved to {args.out}")
+
+    if args.plot:
+        try:
+            plot_report(report, args.plot)
+        except ImportError as e:
+            logging.warning(f"Cannot plot without matplotlib: {e}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+
+PATHS_CACHE = "data/browser_paths.json"
+
+# Profile parts that are large, rebuilt by Chrome anyway, or lock the directory to one process
+_CLONE_IGNORE = shutil.ignore_patterns("Singleton*", "*.lock", "lockfile", "Crashpad", "ShaderCache", "GrShaderCache",
+                                       "GraphiteDawnCache", "Safe Browsing", "component_crx_cache",
+                                       "optimization_guide_model_store", "BrowserMetrics*")
+
+_paths = None
+_paths_lock = threading.Lock()
+
+
+def _usable(paths):
+    return bool(paths) and all(paths.get(key) and os.path.isfile(paths[key]) for key in ("driver_path", "browser_path"))
+
+
+def resolve_browser_paths(cache_path=PATHS_CACHE, refresh=False):
+    """
+    chromedriver and Chrome binary paths, resolved once
+
+    Without explicit paths every webdriver.Chrome() call runs Selenium
+    Manager in a subprocess to find them. The result is kept for the process
+    and in `cache_path` while both files still exist. CHROMEDRIVER and
+    CHROME_BINARY override the lookup. Returns {} when nothing can be
+    resolved, leaving it to Selenium.
+    """
+    global _paths
+    with _paths_lock:
+        if _paths is not None and not refresh:
+            return _paths
+
+        paths = {}
+        if not refresh and cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding="utf-8") as f:
+                    paths = json.load(f)
+            except (OSError, ValueError):
+                paths = {}
+        if not _usable(paths):
+            paths = {"driver_path": os.environ.get("CHROMEDRIVER"), "browser_path": os.environ.get("CHROME_BINARY")}
+            if not _usable(paths):
+                try:
+                    from selenium.webdriver.common.selenium_manager import SeleniumManager
+
+                    paths = SeleniumManager().binary_paths(["--browser", "chrome"])
+                    paths = {"driver_path": paths.get("driver_path"), "browser_path": paths.get("browser_path")}
+                except Exception as e:
+                    logging.warning(f"Could not resolve chromedriver/Chrome paths, Selenium will look them up: {e}")
+                    paths = {}
+            if _usable(paths) and cache_path:
+                directory = os.path.dirname(cache_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(cache_path, "w", encoding="utf-8") as f:
+                    json.dump(paths, f)
+                logging.info(f"Resolved chromedriver {paths['driver_path']} and Chrome {paths['browser_path']}")
+        _paths = paths if _usable(paths) else {}
+        return _paths
+
+
+def chrome_service(options):
+    """A Service with the cached chromedriver path; also points options at the cached Chrome binary"""
+    from selenium.webdriver.chrome.service import Service
+
+    paths = resolve_browser_paths()
+    if not paths:
+        return Service()
+    if not options.binary_location:
+        options.binary_location = paths["browser_path"]
+    return Service(executable_path=paths["driver_path"])
+
+
+class ProfileTemplate:
+    """
+    A Chrome profile prepared once and copied for every session
+
+    prepare() launches one browser on the template directory and runs a warm
+    callable, e.g. open the site and accept the consent banner. Clones then
+    start with its HTTP cache, cookies and consent state instead of an empty
+    profile. The template is re-prepared after `max_age` seconds. Each clone
+    is a temporary directory removed once its driver is garbage collected
+    (or at exit).
+    """
+
+    def __init__(self, path="data/profile_template", max_age=24 * 3600, clone_root=None):
+        self.path = path
+        self.max_age = max_age
+        self.clone_root = clone_root
+        self._marker = os.path.join(path, ".prepared")
+        self._lock = threading.Lock()
+
+    def is_fresh(self):
+        try:
+            return time.time() - os.path.getmtime(self._marker) < self.max_age
+        except OSError:
+            return False
+
+    def prepare(self, launch, warm):
+        """launch(user_data_dir) -> driver; warm(driver) visits the site. Failures leave clones empty"""
+        with self._lock:
+            if self.is_fresh():
+                return True
+            started = time.perf_counter()
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.makedirs(self.path, exist_ok=True)
+            driver = None
+            try:
+                driver = launch(os.path.abspath(self.path))
+                warm(driver)
+            except Exception as e:
+                logging.warning(f"Profile template: preparation failed, sessions start with empty profiles: {e}")
+                return False
+            finally:
+                if driver is not None:
+                    driver.quit()  # Flushes cookies and cache to disk
+            with open(self._marker, "w", encoding="utf-8") as f:
+                f.write(time.strftime("%Y-%m-%d %H:%M:%S"))
+            logging.info(f"Profile template prepared in {time.perf_counter() - started:.1f}s at {self.path}")
+            return True
+
+    def clone(self):
+        """Path of a fresh copy of the template, or None when it has not been prepared"""
+        if not os.path.exists(self._marker):
+            return None
+        if self.clone_root:
+            os.makedirs(self.clone_root, exist_ok=True)
+        target = tempfile.mkdtemp(prefix="kayak-profile-", dir=self.clone_root)
+        shutil.copytree(self.path, target, ignore=_CLONE_IGNORE, dirs_exist_ok=True)
+        return target
+
+    @staticmethod
+    def track(driver, clone_path):
+        """Remove a clone once the driver using it is gone"""
+        weakref.finalize(driver, shutil.rmtree, clone_path, ignore_errors=True)
+
+
+_default_profile = None
+
+
+def default_profile():
+    """Process-wide ProfileTemplate at data/profile_template"""
+    global _default_profile
+    if _default_profile is None:
+        _default_profile = ProfileTemplate()
+    return _default_profile
+
+
+def time_to_first_page(launch, url, runs=3):
+    """Seconds from asking for a browser to having `url` loaded, per run (launch() -> driver, quit after)"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        driver = launch()
+        try:
+            driver.get(url)
+            timings.append(time.perf_counter() - started)
+        finally:
+            driver.quit()
+    return timings
+
+
+def run_startup_benchmark(url, runs=3, profile=None):
+    """
+    Time-to-first-page for each startup layer, added one at a time:
+    the old setup (Selenium Manager lookup per launch, legacy headless, empty profile),
+    cached binary paths with --headless=new, plus a prewarmed profile clone,
+    and checkout from a DriverPool whose standby browser was launched ahead of time
+    """
+    import statistics
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    from driver_pool import DriverPool
+    from farm import prepare_profile, setup_driver
+
+    def legacy():
+        options = Options()
+        for argument in ("--headless", "--window-size=1920,1080", "--no-sandbox", "--disable-dev-shm-usage",
+                         "--disable-gpu"):
+            options.add_argument(argument)
+        return webdriver.Chrome(options=options)
+
+    profile = profile or default_profile()
+    prepare_profile(profile)
+    layers = {
+        "legacy": legacy,
+        "cached-paths+headless-new": lambda: setup_driver(headless=True),
+        "+profile-template": lambda: setup_driver(headless=True, profile=profile),
+    }
+    results = {}
+    for name, launch in layers.items():
+        timings = time_to_first_page(launch, url, runs)
+        results[name] = {"median_seconds": round(statistics.median(timings), 3),
+                         "runs": [round(t, 3) for t in timings]}
+
+    # Standby: the browser was started while nobody was waiting, so a checkout only pays for the page load
+    pool = DriverPool(lambda: setup_driver(headless=True, profile=profile), max_size=1, max_pages=1, standby=1,
+                      keep_cookies=True)
+    timings = []
+    try:
+        pool.prewarm()
+        for _ in range(runs):
+            pool.wait_standby()
+            started = time.perf_counter()
+            driver = pool.checkout()
+            driver.get(url)
+            timings.append(time.perf_counter() - started)
+            pool.checkin(driver, broken=True)  # Replaced in the background
+    finally:
+        pool.close()
+    results["+standby-pool"] = {"median_seconds": round(statistics.median(timings), 3),
+                                "runs": [round(t, 3) for t in timings]}
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Browser startup: resolve binaries, prepare the profile, benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("resolve", help="Resolve and cache the chromedriver/Chrome paths")
+    sub.add_parser("prepare", help="(Re)build the prewarmed profile template")
+    bench_parser = sub.add_parser("bench", help="Time-to-first-page for each startup layer")
+    bench_parser.add_argument("--url", help="Page to load; defaults to a results page on a local mock Kayak")
+    bench_parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "resolve":
+        print(resolve_browser_paths(refresh=True))
+    elif args.command == "prepare":
+        from farm import prepare_profile
+
+        if os.path.exists(default_profile()._marker):
+            os.remove(default_profile()._marker)
+        prepare_profile(default_profile())
+    else:
+        if args.url:
+            print(json.dumps(run_startup_benchmark(args.url, args.runs), indent=4))
+        else:
+            from kayak_urls import build_results_url
+            from mock_kayak import MockKayakServer
+
+            with MockKayakServer() as server:
+                url = build_results_url("Karachi", "Lahore", time.strftime("%Y-%m-%d"), base_url=server.base_url)
+                print(json.dumps(run_startup_benchmark(url, args.runs), indent=4))
@@ -0,0 +1,248 @@
+"""
+Single entry point for the scrapers: crawl, farm, bench, report, query and startup
+
+Only the standard library is imported here. Each subcommand imports what it
+needs when it runs, so `--help`, a report or a query never loads Selenium,
+and worker processes that re-import the main module (spawn start method)
+stay light.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+HEAVY_PACKAGES = ("selenium", "httpx", "numpy", "pandas", "pyarrow", "matplotlib", "joblib", "pymongo", "lxml")
+
+# What each subcommand imports before doing any work; `startup` times these in a fresh interpreter
+STARTUP_PROBES = {
+    "--help": (),
+    "crawl": ("farm",),
+    "crawl --engine http": ("http_engine",),
+    "farm": ("farm", "result_cache"),
+    "farm --async http": ("async_farm",),
+    "bench": ("benchmark",),
+    "report": ("metrics", "tracing"),
+    "query": ("price_index",),
+}
+
+
+def travel_date_string(days):
+    """The scrapers' "June 5, 2025" form of today + days"""
+    day = datetime.now() + timedelta(days=days)
+    return f"{day:%B} {day.day}, {day.year}"
+
+
+def parse_route(value):
+    origin, sep, destination = value.partition(":")
+    if not sep or not origin or not destination:
+        raise argparse.ArgumentTypeError(f"expected ORIGIN:DESTINATION, got {value!r}")
+    return {"origin": origin, "destination": destination}
+
+
+def run_crawl(args):
+    date_str = args.date or travel_date_string(args.days)
+    if args.engine == "http":
+        from http_engine import scrape_flight_data_http
+
+        logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+        kwargs = {"base_url": args.base_url} if args.base_url else {}
+        flights = scrape_flight_data_http(args.origin, args.destination, date_str, fallback=False, **kwargs)
+    else:
+        from farm import scrape_flight_data, setup_logging
+
+        setup_logging()
+        kwargs = {"base_url": args.base_url} if args.base_url else {}
+        flights = scrape_flight_data(args.origin, args.destination, date_str, headless=not args.show_browser,
+                                     **kwargs)
+    flights = flights or []
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(flights, f, indent=4)
+        logging.info(f"{len(flights)} flights saved to {args.out}")
+    else:
+        print(json.dumps(flights, indent=4))
+    return 0 if flights else 1
+
+
+def run_farm(args):
+    routes = args.route or None
+    if args.run_async:
+        from async_farm import run_async_farm
+        from farm_common import save_summary, setup_logging
+
+        setup_logging()
+        kwargs = {"base_url": args.base_url} if args.base_url else {}
+        results = run_async_farm(routes=routes, days_ahead=args.days, backend=args.run_async,
+                                 max_concurrency=args.workers, per_task_files=args.per_task_files, **kwargs)
+    else:
+        from farm import run_scraper_farm, save_summary, setup_logging
+
+        if args.base_url:
+            print("--base-url needs --async; the thread farm scrapes kayak.com", file=sys.stderr)
+            return 2
+        setup_logging()
+        kwargs = {}
+        if args.cache:
+            from result_cache import ResultCache
+
+            kwargs["cache"] = ResultCache()
+        if args.autoscale:
+            from autoscaler import Autoscaler
+
+            kwargs["autoscaler"] = Autoscaler()
+        if args.profile:
+            from browser_startup import default_profile
+
+            kwargs["profile"] = default_profile()
+        results = run_scraper_farm(routes=routes, days_ahead=args.days, max_workers=args.workers,
+                                   task_store=args.task_store, multi_date=args.multi_date,
+                                   per_task_files=args.per_task_files, prewarm=args.prewarm, **kwargs)
+    save_summary(results)
+    return 0
+
+
+def run_report(args):
+    from metrics import format_report
+    from tracing import breakdown_spans, format_breakdown, load_spans
+
+    found = False
+    try:
+        with open(args.metrics, encoding="utf-8") as f:
+            reports = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        reports = []
+    for report in reports[-args.last:]:
+        print(format_report(report))
+        found = True
+    try:
+        spans = load_spans(args.trace, args.run)
+    except FileNotFoundError:
+        spans = []
+    if spans:
+        print(format_breakdown(breakdown_spans(spans), f"Stages of {spans[0]['run']} ({len(spans)} spans)"))
+        found = True
+    if not found:
+        print(f"No run reports in {args.metrics} and no spans in {args.trace}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_bench(args, extra):
+    from benchmark import main
+
+    return main(extra)
+
+
+def run_query(args, extra):
+    from price_index import main
+
+    return main(extra)
+
+
+def probe_startup(modules):
+    """Import `modules` in a fresh interpreter; returns seconds, module count and heavy packages loaded"""
+    code = ("import sys, time, json\n"
+            "started = time.perf_counter()\n"
+            "import cli\n"
+            f"for name in {list(modules)!r}: __import__(name)\n"
+            "seconds = time.perf_counter() - started\n"
+            f"heavy = [name for name in {list(HEAVY_PACKAGES)!r} if name in sys.modules]\n"
+            "print(json.dumps({'seconds': seconds, 'modules': len(sys.modules), 'heavy': heavy}))\n")
+    # Run from a scratch directory so imports with side effects cannot touch the working tree
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory() as scratch:
+        output = subprocess.run([sys.executable, "-c", code], cwd=scratch, env=env, check=True,
+                                capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_startup(args):
+    import statistics
+
+    print(f"{'subcommand':<22}{'import ms':>10}{'modules':>9}  heavy packages")
+    slow = []
+    for command, modules in STARTUP_PROBES.items():
+        probes = [probe_startup(modules) for _ in range(args.runs)]
+        ms = statistics.median(probe["seconds"] for probe in probes) * 1000
+        print(f"{command:<22}{ms:>10.0f}{probes[-1]['modules']:>9}  {', '.join(probes[-1]['heavy']) or '-'}")
+        if args.max_ms and ms > args.max_ms:
+            slow.append(command)
+    if slow:
+        print(f"Over {args.max_ms:.0f} ms: {', '.join(slow)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Kayak flight scrapers")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    crawl = sub.add_parser("crawl", help="Scrape one route and date")
+    crawl.add_argument("origin")
+    crawl.add_argument("destination")
+    when = crawl.add_mutually_exclusive_group()
+    when.add_argument("--days", type=int, default=7, help="Travel date as days from today")
+    when.add_argument("--date", help='Travel date as the scrapers write it, e.g. "June 5, 2025"')
+    crawl.add_argument("--engine", choices=["browser", "http"], default="browser")
+    crawl.add_argument("--base-url", help="Site or mock/replay server to scrape")
+    crawl.add_argument("--show-browser", action="store_true", help="Run Chrome with a window")
+    crawl.add_argument("--out", help="Write the flights here instead of printing them")
+    crawl.set_defaults(handler=run_crawl)
+
+    farm = sub.add_parser("farm", help="Scrape many routes and dates with a pool of browsers")
+    farm.add_argument("--route", action="append", type=parse_route, metavar="ORIGIN:DESTINATION",
+                      help="Repeatable; defaults to farm.ROUTES")
+    farm.add_argument("--days", type=int, nargs="+", help="Days ahead to scrape; default 0 7 14")
+    farm.add_argument("--workers", type=int, default=3)
+    farm.add_argument("--task-store", help="SQLite task store, so an interrupted run resumes")
+    farm.add_argument("--cache", action="store_true", help="Reuse recent results from the result cache")
+    farm.add_argument("--autoscale", action="store_true", help="Size the browser count to this host")
+    farm.add_argument("--multi-date", action="store_true", help="One browser session per route")
+    farm.add_argument("--async", dest="run_async", choices=["browser", "http"],
+                      help="Run on the asyncio farm with this backend instead")
+    farm.add_argument("--base-url", help="Site or mock/replay server for the asyncio farm")
+    farm.add_argument("--profile", action="store_true",
+                      help="Start browsers from the prewarmed profile template (data/profile_template)")
+    farm.add_argument("--prewarm", action="store_true", help="Launch the browser pool up front, keep a standby")
+    farm.add_argument("--per-task-files", action="store_true",
+                      help="One JSON and CSV file per task instead of the Parquet flight store")
+    farm.set_defaults(handler=run_farm)
+
+    # bench and query hand their arguments to benchmark.py and price_index.py; --help shows theirs
+    bench = sub.add_parser("bench", add_help=False, help="Strategy benchmark (options of benchmark.py)")
+    bench.set_defaults(handler=run_bench, passthrough=True)
+    query = sub.add_parser("query", add_help=False, help="Price-history queries (options of price_index.py)")
+    query.set_defaults(handler=run_query, passthrough=True)
+
+    report = sub.add_parser("report", help="Print recent run reports and the latest stage breakdown")
+    report.add_argument("--metrics", default="data/metrics.jsonl")
+    report.add_argument("--last", type=int, default=1, help="How many run reports")
+    report.add_argument("--trace", default="data/traces.jsonl")
+    report.add_argument("--run", help="Trace run id; defaults to the most recent")
+    report.set_defaults(handler=run_report)
+
+    startup = sub.add_parser("startup", help="Import time of each subcommand in a fresh interpreter")
+    startup.add_argument("--runs", type=int, default=3)
+    startup.add_argument("--max-ms", type=float, help="Exit non-zero when a subcommand takes longer")
+    startup.set_defaults(handler=run_startup)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if getattr(args, "passthrough", False):
+        return args.handler(args, extra)
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
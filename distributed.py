@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+
+from task_store import LeaseHeartbeat, TaskStore, PENDING, LEASED
+
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    # Set on a subclass so other ThreadingTCPServers in the process keep the stdlib defaults
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class Coordinator:
+    """
+    Hands route-date tasks to worker nodes over a line-delimited JSON protocol
+
+    Tasks live in a TaskStore with short leases. Nodes heartbeat while they
+    work; a node that dies stops heartbeating, its lease expires and the task
+    is leased to another node. Every finished task's flights are appended to
+    a central JSONL sink.
+
+    Requests (one JSON object per line, each answered with one line):
+        {"op": "register", "node": id}
+        {"op": "lease", "node": id, "owner": owner}
+        {"op": "heartbeat", "node": id, "owner": owner, "task_id": n}
+        {"op": "result", "node": id, "owner": owner, "task_id": n, "summary": {...}, "flights": [...]}
+        {"op": "fail", "node": id, "owner": owner, "task_id": n, "error": "..."}
+        {"op": "status"}
+    """
+
+    def __init__(self, store, sink_path="data/results.jsonl", host="0.0.0.0", port=7070, node_timeout=None):
+        self.store = store
+        self.sink_path = sink_path
+        self.node_timeout = node_timeout or store.lease_seconds
+        self.nodes = {}
+        self._sink_lock = threading.Lock()
+        self._nodes_lock = threading.Lock()
+
+        directory = os.path.dirname(sink_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        reply = coordinator.dispatch(json.loads(line))
+                    except Exception as e:
+                        logging.error(f"Coordinator error: {e}", exc_info=True)
+                        reply = {"ok": False, "error": str(e)}
+                    self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+        self.server = _CoordinatorServer((host, port), Handler)
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def _seen(self, node):
+        with self._nodes_lock:
+            if node not in self.nodes:
+                logging.info(f"Coordinator: node {node} joined")
+            self.nodes[node] = time.time()
+
+    def live_nodes(self):
+        """Nodes that have talked to the coordinator within node_timeout"""
+        cutoff = time.time() - self.node_timeout
+        with self._nodes_lock:
+            for node, last_seen in list(self.nodes.items()):
+                if last_seen < cutoff:
+                    logging.warning(f"Coordinator: node {node} missed its heartbeats, its leases will be reassigned")
+                    del self.nodes[node]
+            return sorted(self.nodes)
+
+    def _write_result(self, message):
+        record = {
+            "task_id": message["task_id"],
+            "node": message["node"],
+            "received_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "summary": message.get("summary"),
+            "flights": message.get("flights", []),
+        }
+        with self._sink_lock:
+            with open(self.sink_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def dispatch(self, message):
+        op = message.get("op")
+        node = message.get("node")
+        if node:
+            self._seen(node)
+
+        if op == "register":
+            return {"ok": True, "lease_seconds": self.store.lease_seconds}
+        if op == "lease":
+            task = self.store.lease(message["owner"])
+            if task is None:
+                counts = self.store.counts()
+                return {"ok": True, "task": None, "finished": counts[PENDING] + counts[LEASED] == 0}
+            logging.info(f"Coordinator: task {task['id']} ({task['origin']} to {task['destination']} "
+                         f"on {task['date']}) leased to {message['owner']}")
+            return {"ok": True, "task": task}
+        if op == "heartbeat":
+            return {"ok": self.store.heartbeat(message["task_id"], message["owner"])}
+        if op == "result":
+            owned = self.store.complete(message["task_id"], message["owner"], message.get("summary"))
+            if owned:
+                # A late result from a node whose lease was reassigned is dropped
+                self._write_result(message)
+            return {"ok": owned}
+        if op == "fail":
+            return {"ok": self.store.fail(message["task_id"], message["owner"], message.get("error"),
+                                          message.get("summary"))}
+        if op == "status":
+            return {"ok": True, "tasks": self.store.counts(), "nodes": self.live_nodes()}
+        return {"ok": False, "error": f"unknown op {op!r}"}
+
+    def serve_forever(self, exit_when_finished=False, poll_interval=5):
+        """Serve until interrupted, or until every task is done/failed when exit_when_finished"""
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        host, port = self.address
+        logging.info(f"Coordinator listening on {host}:{port}, tasks: {self.store.counts()}")
+        try:
+            while True:
+                time.sleep(poll_interval)
+                counts = self.store.counts()
+                logging.info(f"Coordinator: {counts}, live nodes: {self.live_nodes()}")
+                if exit_when_finished and counts[PENDING] + counts[LEASED] == 0:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class CoordinatorClient:
+    """Blocking client for the coordinator protocol, safe to share between threads"""
+
+    def __init__(self, host, port, node, timeout=30):
+        self.node = node
+        self._lock = threading.Lock()
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._sock.makefile("rwb")
+
+    def call(self, op, **fields):
+        message = dict(fields, op=op, node=self.node)
+        with self._lock:
+            self._file.write((json.dumps(message) + "\n").encode("utf-8"))
+            self._file.flush()
+            line = self._file.readline()
+        if not line:
+            raise ConnectionError("Coordinator closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+
+def node_worker(client, scrape, owner, lease_seconds, idle_wait=5):
+    """Lease, scrape and report tasks until the coordinator says the run is finished"""
+    while True:
+        reply = client.call("lease", owner=owner)
+        task = reply.get("task")
+        if task is None:
+            if reply.get("finished"):
+                return
+            # Other nodes hold the remaining leases; one may still die
+            time.sleep(idle_wait)
+            continue
+
+        try:
+            with LeaseHeartbeat(lambda: client.call("heartbeat", owner=owner, task_id=task["id"])["ok"], task["id"],
+                                lease_seconds):
+                flight_data = scrape(task["origin"], task["destination"], task["date"])
+            summary = {
+                "origin": task["origin"],
+                "destination": task["destination"],
+                "date": task["date"],
+                "flights_found": len(flight_data),
+            }
+            if flight_data:
+                client.call("result", owner=owner, task_id=task["id"], summary=summary, flights=flight_data)
+            else:
+                client.call("fail", owner=owner, task_id=task["id"], error="no flights found", summary=summary)
+        except Exception as e:
+            logging.error(f"Node worker error: {e}", exc_info=True)
+            client.call("fail", owner=owner, task_id=task["id"], error=str(e))
+
+
+def run_node(host, port, engine="browser", concurrency=1, base_url=None):
+    """Run one worker node with `concurrency` lease loops sharing browsers and a rate limiter"""
+    from rate_limiter import AdaptiveRateLimiter
+
+    node = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    client = CoordinatorClient(host, port, node)
+    lease_seconds = client.call("register")["lease_seconds"]
+    limiter = AdaptiveRateLimiter()
+    pool = None
+    loop = None
+
+    if engine == "http":
+        import asyncio
+        from http_engine import HttpSearchEngine, scrape_flight_data_async
+        from kayak_urls import KAYAK_BASE_URL
+
+        # One event loop, client and limiter for the node, so every leased task reuses the connections
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="http-engine", daemon=True).start()
+
+        async def open_engine():
+            return HttpSearchEngine(base_url=base_url or KAYAK_BASE_URL, max_connections=max(concurrency, 10),
+                                    limiter=limiter)
+
+        search_engine = asyncio.run_coroutine_threadsafe(open_engine(), loop).result()
+
+        def scrape(origin, destination, date_str):
+            return asyncio.run_coroutine_threadsafe(
+                scrape_flight_data_async(search_engine, origin, destination, date_str, limiter=limiter), loop).result()
+    else:
+        from driver_pool import DriverPool
+        from farm import scrape_flight_data, setup_driver
+
+        pool = DriverPool(lambda: setup_driver(headless=True), max_size=concurrency)
+
+        def scrape(origin, destination, date_str):
+            return scrape_flight_data(origin, destination, date_str, pool=pool, limiter=limiter)
+
+    threads = [
+        threading.Thread(target=node_worker, args=(client, scrape, f"{node}/{i}", lease_seconds))
+        for i in range(concurrency)
+    ]
+    logging.info(f"Node {node} started {concurrency} workers against {host}:{port}")
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if pool:
+            pool.close()
+        if loop:
+            asyncio.run_coroutine_threadsafe(search_engine.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+        client.close()
+    logging.info(f"Node {node} finished")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Distributed scraper farm: one coordinator, many worker nodes")
+    sub = parser.add_subparsers(dest="role", required=True)
+
+    coordinator_parser = sub.add_parser("coordinator", help="Serve tasks to worker nodes")
+    coordinator_parser.add_argument("--host", default="0.0.0.0")
+    coordinator_parser.add_argument("--port", type=int, default=7070)
+    coordinator_parser.add_argument("--store", default="data/coordinator.sqlite3")
+    coordinator_parser.add_argument("--sink", default="data/results.jsonl")
+    coordinator_parser.add_argument("--days", type=int, nargs="+", default=[0, 7, 14])
+    coordinator_parser.add_argument("--lease-seconds", type=int, default=120)
+    coordinator_parser.add_argument("--exit-when-finished", action="store_true")
+
+    worker_parser = sub.add_parser("worker", help="Lease and scrape tasks from a coordinator")
+    worker_parser.add_argument("--coordinator", default="127.0.0.1:7070", help="host:port")
+    worker_parser.add_argument("--engine", choices=["browser", "http"], default="browser")
+    worker_parser.add_argument("--concurrency", type=int, default=1)
+    worker_parser.add_argument("--base-url", help="Results site root, e.g. a local mock_kayak server")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.role == "coordinator":
+        from farm_common import ROUTES, build_tasks
+
+        store = TaskStore(args.store, lease_seconds=args.lease_seconds)
+        store.add_tasks(build_tasks(ROUTES, args.days))
+        Coordinator(store, sink_path=args.sink, host=args.host, port=args.port).serve_forever(
+            exit_when_finished=args.exit_when_finished)
+    else:
+        host, port = args.coordinator.rsplit(":", 1)
+        run_node(host, int(port), engine=args.engine, concurrency=args.concurrency, base_url=args.base_url)
@@ -0,0 +1,293 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class DriverPool:
+    """
+    Bounded pool of reusable WebDriver sessions
+
+    Drivers are created lazily by `driver_factory` up to `max_size`, handed out
+    with `checkout()` and given back with `checkin()` (or the `driver()` context
+    manager). A driver is recycled once it has served `max_pages` tasks, when it
+    fails its health check, or when the caller reports it as broken.
+
+    With `standby` > 0 the pool keeps that many browsers launched ahead of
+    demand: whenever a checkout or a recycle leaves fewer idle, replacements
+    are started in the background (within `max_size`), so a checkout rarely
+    waits for Chrome to boot. prewarm() starts the first ones in parallel.
+
+    With `keep_cookies` reset() leaves cookies alone, e.g. so sessions started
+    from a prepared profile template keep its consent cookies.
+    """
+
+    def __init__(self, driver_factory, max_size=3, max_pages=20, checkout_timeout=None, standby=0,
+                 keep_cookies=False):
+        self.driver_factory = driver_factory
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.checkout_timeout = checkout_timeout
+        self.standby = standby
+        self.keep_cookies = keep_cookies
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._pages = {}
+        self._closed = False
+        self._launching = 0
+        # Notified whenever a browser goes idle, a slot frees up or a launch ends
+        self._launched = threading.Condition(self._lock)
+
+    def _create(self):
+        driver = self.driver_factory()
+        self._pages[id(driver)] = 0
+        logging.info(f"Driver pool: started browser ({self._created}/{self.max_size})")
+        return driver
+
+    def _discard(self, driver):
+        self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f"Driver pool: error closing browser: {e}")
+        with self._lock:
+            self._created -= 1
+            self._launched.notify_all()
+        self._replenish()
+
+    def _launch_idle(self):
+        """Start one browser for a reserved slot and park it idle"""
+        try:
+            driver = self._create()
+        except Exception as e:
+            logging.warning(f"Driver pool: could not start standby browser: {e}")
+            with self._lock:
+                self._created -= 1
+                self._launching -= 1
+                self._launched.notify_all()
+            return
+        if self._closed:
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+        with self._lock:
+            self._launching -= 1
+            self._launched.notify_all()
+
+    def _replenish(self, count=None):
+        """Start browsers in the background until `count` (default: standby) are idle or launching"""
+        want = self.standby if count is None else count
+        threads = []
+        while not self._closed:
+            with self._lock:
+                if self._idle.qsize() + self._launching >= want or self._created >= self.max_size:
+                    break
+                self._created += 1
+                self._launching += 1
+            thread = threading.Thread(target=self._launch_idle, name="driver-standby", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def prewarm(self, count=None):
+        """Launch browsers in parallel before the first checkout (default: standby, else max_size) and wait"""
+        for thread in self._replenish(count or self.standby or self.max_size):
+            thread.join()
+
+    def wait_standby(self, timeout=None):
+        """Block until no standby launch is in flight"""
+        with self._lock:
+            return self._launched.wait_for(lambda: not self._launching, timeout)
+
+    def is_healthy(self, driver):
+        """Cheap liveness probe: the session must answer a trivial command"""
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def reset(self, driver):
+        """Clear cookies (unless keep_cookies), storage and extra tabs so the next task starts clean"""
+        handles = driver.window_handles
+        if len(handles) > 1:
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+        if not self.keep_cookies:
+            driver.delete_all_cookies()
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except Exception:
+            # about:blank and data: pages have no storage to clear
+            pass
+        driver.get("about:blank")
+
+    def _wait_for_driver(self, deadline):
+        """An idle driver, or None once this caller may start one; waits while the pool is full"""
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                try:
+                    return self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+                if self._created < self.max_size:
+                    self._created += 1
+                    return None
+                # A checkin, a discarded browser, a failed standby launch or a resize wakes us up
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a free browser")
+                self._launched.wait(remaining)
+
+    def checkout(self):
+        """Return a healthy driver, starting a new one if the pool has room"""
+        deadline = None if self.checkout_timeout is None else time.monotonic() + self.checkout_timeout
+        while True:
+            driver = self._wait_for_driver(deadline)
+            if driver is None:
+                try:
+                    return self._create()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                        self._launched.notify_all()
+                    raise
+
+            if self.is_healthy(driver):
+                if self.standby:
+                    self._replenish()
+                return driver
+            logging.warning("Driver pool: idle browser failed health check, replacing it")
+            self._discard(driver)
+
+    def resize(self, max_size):
+        """Change the pool size; idle browsers above it are quit now, busy ones on checkin"""
+        with self._lock:
+            self.max_size = max_size
+            self._launched.notify_all()
+        while True:
+            with self._lock:
+                if self._created <= self.max_size:
+                    return
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            logging.info(f"Driver pool: shrinking to {max_size} browsers")
+            self._discard(driver)
+
+    def checkin(self, driver, broken=False):
+        """Give a driver back; broken or worn-out drivers are quit instead of reused"""
+        pages = self._pages.get(id(driver), 0) + 1
+        self._pages[id(driver)] = pages
+
+        if self._closed or broken:
+            self._discard(driver)
+            return
+
+        if self._created > self.max_size:
+            # The pool was resized below what is running
+            self._discard(driver)
+            return
+
+        if pages >= self.max_pages:
+            logging.info(f"Driver pool: recycling browser after {pages} pages")
+            self._discard(driver)
+            return
+
+        try:
+            self.reset(driver)
+        except Exception as e:
+            logging.warning(f"Driver pool: reset failed, dropping browser: {e}")
+            self._discard(driver)
+            return
+
+        with self._lock:
+            self._idle.put(driver)
+            self._launched.notify_all()
+
+    @contextmanager
+    def driver(self):
+        """Context manager around checkout/checkin that recycles the driver on error"""
+        driver = self.checkout()
+        broken = False
+        try:
+            yield driver
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            self.checkin(driver, broken=broken)
+
+    def close(self):
+        """Quit every idle driver; drivers still checked out are quit on checkin"""
+        with self._lock:
+            self._closed = True
+            self._launched.notify_all()
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RouteSession:
+    """
+    Pool stand-in that hands the same browser to every scrape of one route
+
+    Nothing is reset between checkouts, so the consent popups dismissed, the
+    cookies and the cached page assets of the first date carry over to the
+    next ones. A browser reported broken is given back (or quit) and the
+    next checkout takes a fresh one. The browser comes from `pool` when given,
+    otherwise from `driver_factory`; close() returns it.
+    """
+
+    def __init__(self, pool=None, driver_factory=None):
+        self.pool = pool
+        self.driver_factory = driver_factory
+        self._driver = None
+
+    def checkout(self):
+        if self._driver is None:
+            self._driver = self.pool.checkout() if self.pool else self.driver_factory()
+        return self._driver
+
+    def is_healthy(self, driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def checkin(self, driver, broken=False):
+        if broken:
+            self._release(broken=True)
+
+    def _release(self, broken=False):
+        driver, self._driver = self._driver, None
+        if driver is None:
+            return
+        if self.pool:
+            self.pool.checkin(driver, broken=broken)
+        else:
+            try:
+                driver.quit()
+            except Exception as e:
+                logging.warning(f"Route session: error closing browser: {e}")
+
+    def close(self):
+        self._release()
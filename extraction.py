@@ -0,0 +1,120 @@
+import logging
+
+# Result card containers, tried in order until one matches
+RESULT_CONTAINERS = [
+    '//div[@class="Fxw9-result-item-container"]',
+    '//div[contains(@class, "result-item")]',
+    '//div[contains(@class, "flight-result")]',
+]
+
+# Relative XPaths for each field of a card, first match wins
+FARM_FIELDS = {
+    "time": ['.//div[contains(@class, "vmXl")]//span', './/div[contains(@class, "time")]'],
+    "airline": ['.//div[contains(@class, "c_cgF")]', './/div[contains(@class, "carrier")]'],
+    "price": ['.//div[contains(@class, "price-text")]', './/div[contains(@class, "price")]'],
+    "duration": ['.//div[contains(@class, "duration")]'],
+    "stops": ['.//div[contains(@class, "stops")]'],
+}
+
+MAIN_FIELDS = {
+    "departure_time": ['.//div[@class="vmXl vmXl-mod-variant-large"]//span'],
+    "price": ['.//div[@class="e2GB-price-text"]'],
+}
+
+# Runs in the page: evaluates every card and field in one WebDriver round trip
+_EXTRACT_JS = """
+const containers = arguments[0], fields = arguments[1];
+const first = (xp, ctx) => document.evaluate(
+    xp, ctx, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const misses = {};
+for (const name in fields) misses[name] = 0;
+
+let cards = null, used = null;
+for (const xp of containers) {
+    const snapshot = document.evaluate(xp, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    if (snapshot.snapshotLength) { cards = snapshot; used = xp; break; }
+}
+const records = [];
+if (cards) {
+    for (let i = 0; i < cards.snapshotLength; i++) {
+        const card = cards.snapshotItem(i), record = {};
+        for (const name in fields) {
+            let value = null;
+            for (const xp of fields[name]) {
+                const node = first(xp, card);
+                if (node) { value = (node.innerText || node.textContent || "").trim(); break; }
+            }
+            if (value === null) misses[name]++;
+            record[name] = value;
+        }
+        records.push(record);
+    }
+}
+return {container: used, records: records, misses: misses};
+"""
+
+
+def extract_result_cards(driver, fields=FARM_FIELDS, containers=RESULT_CONTAINERS):
+    """
+    Pull every result card in a single execute_script call
+    Returns (records, misses): one dict per card with None for fields that were
+    not found, and a per-field count of those misses
+    """
+    payload = driver.execute_script(_EXTRACT_JS, containers, fields) or {}
+    records = payload.get("records") or []
+    misses = payload.get("misses") or {name: 0 for name in fields}
+
+    if records:
+        missed = {name: count for name, count in misses.items() if count}
+        logging.info(f"Extracted {len(records)} result cards via {payload.get('container')}"
+                     + (f", missing fields: {missed}" if missed else ""))
+    return records, misses
+
+
+_compiled = {}
+
+
+def _xpath(expression):
+    from lxml import etree
+
+    compiled = _compiled.get(expression)
+    if compiled is None:
+        compiled = _compiled[expression] = etree.XPath(expression)
+    return compiled
+
+
+def extract_result_cards_html(html, fields=FARM_FIELDS, containers=RESULT_CONTAINERS):
+    """
+    Browserless twin of extract_result_cards for saved page HTML
+    Evaluates the same XPaths with lxml (compiled once per process) and returns
+    the same (records, misses) shape, so archived pages can be replayed through
+    the extraction path thousands of times a minute
+    """
+    import lxml.html
+
+    document = lxml.html.fromstring(html) if html else None
+    misses = {name: 0 for name in fields}
+    records = []
+    if document is None:
+        return records, misses
+
+    cards = []
+    for expression in containers:
+        cards = _xpath(expression)(document)
+        if cards:
+            break
+
+    for card in cards:
+        record = {}
+        for name, expressions in fields.items():
+            value = None
+            for expression in expressions:
+                nodes = _xpath(expression)(card)
+                if nodes:
+                    value = nodes[0].text_content().strip()
+                    break
+            if value is None:
+                misses[name] += 1
+            record[name] = value
+        records.append(record)
+    return records, misses
@@ -1,52 +1,34 @@
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, StaleElementReferenceException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
-import json
 import os
-import csv
 import random
 import threading
 import queue
-from concurrent.futures import ThreadPoolExecutor
+import socket
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='flight_scraper_farm.log'
-)
-
-# Create a console handler
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-console_handler.setFormatter(console_formatter)
-logging.getLogger().addHandler(console_handler)
-
-# Ensure output directories exist
-os.makedirs('data/json', exist_ok=True)
-os.makedirs('data/csv', exist_ok=True)
-os.makedirs('logs', exist_ok=True)
-
-# Define popular routes to scrape
-ROUTES = [
-    {"origin": "Jeddah", "destination": "Dubai"},
-    {"origin": "Jeddah", "destination": "Riyadh"},
-    {"origin": "Dubai", "destination": "London"},
-    {"origin": "Riyadh", "destination": "Cairo"},
-    {"origin": "Jeddah", "destination": "Istanbul"}
-    # Add more routes as needed
-]
+from driver_pool import DriverPool, RouteSession
+from extraction import extract_result_cards, FARM_FIELDS
+from kayak_urls import KAYAK_BASE_URL, build_results_url
+from airport_cache import default_resolver
+from lean_profile import measure_page
+from rate_limiter import AdaptiveRateLimiter
+from task_store import LeaseHeartbeat, TaskStore, PENDING, LEASED
+from result_cache import ResultCache
+from metrics import RunMetrics, format_report, save_report
+from tracing import Tracer, TaskTrace, log_breakdown
+from autoscaler import Autoscaler
+from scheduler import Scheduler, order_tasks
+from browser_startup import ProfileTemplate, chrome_service
+from farm_common import (ROUTES, build_route_tasks, build_tasks, get_formatted_date, save_summary, save_to_csv,
+                         save_to_json, setup_logging, summarize_task)
 
 # User agent list for rotation
 USER_AGENTS = [
@@ -56,34 +38,32 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"
 ]
 
-# Format the date properly for Kayak's date picker
-def get_formatted_date(days_from_now=0):
-    target_date = datetime.now() + timedelta(days=days_from_now)
-    formatted_date = target_date.strftime("%B %d %Y")  # %B = full month name
-    array = formatted_date.split(" ")
-    
-    # Remove leading zero from day if present and add comma
-    if array[1][0] == "0":
-        array[1] = array[1][1] + ","
-    else:
-        array[1] = array[1] + ","
-        
-    formatted_date = ' '.join(array)
-    return formatted_date
-
-def setup_driver(headless=True, proxy=None):
+def setup_driver(headless=True, proxy=None, lean=None, profile=None, user_data_dir=None):
+    """
+    Start a Chrome session from the cached chromedriver/Chrome paths
+    profile: ProfileTemplate whose prepared copy the session starts from (cookies, consent, cache)
+    user_data_dir: run on this profile directory as is (used to prepare the template itself)
+    """
     chrome_options = Options()
-    chrome_options.add_experimental_option("prefs", {
+    prefs = {
         "profile.default_content_setting_values.popups": 0,  # 0 = block
         "profile.default_content_setting_values.notifications": 2  # block notifications
-    })
+    }
+    if lean:
+        prefs.update(lean.prefs)
+        lean.apply_options(chrome_options)
+    chrome_options.add_experimental_option("prefs", prefs)
     
     # Rotate user agents
     chrome_options.add_argument(f"user-agent={random.choice(USER_AGENTS)}")
     
     if headless:
-        chrome_options.add_argument("--headless")
+        chrome_options.add_argument("--headless=new")
         chrome_options.add_argument("--window-size=1920,1080")
+
+    clone = profile.clone() if profile and not user_data_dir else None
+    if user_data_dir or clone:
+        chrome_options.add_argument(f"--user-data-dir={user_data_dir or clone}")
     
     # Add proxy if provided
     if proxy:
@@ -96,10 +76,27 @@ def setup_driver(headless=True, proxy=None):
     chrome_options.add_argument("--disable-features=NetworkService")
     chrome_options.add_argument("--disable-features=VizDisplayCompositor")
     
-    driver = webdriver.Chrome(options=chrome_options)
-    driver.maximize_window()  # Maximize window to ensure all elements are visible
+    driver = webdriver.Chrome(options=chrome_options, service=chrome_service(chrome_options))
+    if clone:
+        ProfileTemplate.track(driver, clone)
+    if not headless:
+        driver.maximize_window()  # Maximize window to ensure all elements are visible
+    
+    # Block fonts, media, ads and analytics for the whole session
+    if lean:
+        lean.apply_driver(driver)
     return driver
 
+def prepare_profile(profile, url=KAYAK_BASE_URL):
+    """Open the site once in the template profile and accept its popups so every clone starts past them"""
+    def warm(driver):
+        driver.get(url)
+        time.sleep(3)
+        handle_popups(driver)
+        time.sleep(2)  # Let the cache and cookie writes land before the browser quits
+
+    return profile.prepare(lambda path: setup_driver(headless=True, user_data_dir=path), warm)
+
 def select_from_dropdown(driver, input_xpath, input_text, list_id, max_retries=3):
     """Generic function to handle input and dropdown selection with retries"""
     for attempt in range(max_retries):
@@ -135,6 +132,16 @@ def select_from_dropdown(driver, input_xpath, input_text, list_id, max_retries=3
     logging.error(f"Failed to select {input_text} after {max_retries} attempts")
     return False
 
+def page_is_blocked(driver):
+    """Detect Kayak's bot check / captcha interstitial"""
+    try:
+        if "/security/check" in driver.current_url:
+            return True
+        source = driver.page_source.lower()
+    except Exception:
+        return False
+    return "captcha" in source or "verify you are a human" in source
+
 def handle_popups(driver):
     """Handle common popups that might appear on Kayak"""
     try:
@@ -158,153 +165,206 @@ def handle_popups(driver):
     except Exception as e:
         logging.warning(f"Error handling popups: {e}")
 
-def save_to_json(data, origin, destination, date_str):
-    """Save scraped data to JSON file"""
-    filename = f"data/json/{origin}_{destination}_{date_str.replace(' ', '_')}.json"
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
-    logging.info(f"Saved JSON data to {filename}")
-    return filename
-
-def save_to_csv(data, origin, destination, date_str):
-    """Save scraped data to CSV file"""
-    if not data:
-        logging.warning("No data to save to CSV")
-        return None
+def search_via_form(driver, origin, destination, date_str, trace=None):
+    """
+    Fill in and submit the homepage search form, leaving the driver on the results tab
+    Each step is timed as a span on trace, a tracing.TaskTrace, if given
+    """
+    trace = trace or TaskTrace(None, origin, destination, date_str)
+    
+    # Navigate to Kayak
+    with trace.span("homepage_load"):
+        driver.get("https://www.kayak.com/")
+        logging.info("Navigated to Kayak homepage")
+        
+        # Wait for initial page load
+        time.sleep(3 + random.uniform(1, 3))  # Add randomness to avoid detection
+    
+    # Handle potential popups or overlays
+    with trace.span("popups"):
+        handle_popups(driver)
+    
+    with trace.span("trip_type"):
+        # Click on flight type dropdown
+        dropdown = WebDriverWait(driver, 15).until(
+            EC.element_to_be_clickable((By.CLASS_NAME, "Uqct-title"))
+        )   
+        dropdown.click()
+        logging.info("Clicked flight type dropdown")
+        time.sleep(1)
+        
+        # Select one-way flight
+        oneway = WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.XPATH, '//*[@id="oneway"]'))
+        )
+        oneway.click()
+        logging.info("Selected one-way flight")
+        time.sleep(1)
+        
+        # Clear origin if needed
+        try:
+            clear_buttons = driver.find_elements(By.XPATH, '//div[@aria-label="Remove value"]')
+            for btn in clear_buttons:
+                if btn.is_displayed():
+                    btn.click()
+                    logging.info("Cleared a field")
+                    time.sleep(1)
+        except Exception:
+            logging.info("No clear buttons found or accessible")
+    
+    # Enter origin
+    with trace.span("autocomplete_origin"):
+        if not select_from_dropdown(
+            driver, 
+            '//input[@aria-label="Flight origin input"]', 
+            origin, 
+            "flight-origin-smarty-input-list"
+        ):
+            raise Exception(f"Failed to select origin location: {origin}")
+        
+        time.sleep(1 + random.uniform(0.5, 1.5))  # Add randomness
+    
+    # Enter destination
+    with trace.span("autocomplete_destination"):
+        if not select_from_dropdown(
+            driver, 
+            '//input[@aria-label="Flight destination input"]', 
+            destination, 
+            "flight-destination-smarty-input-list"
+        ):
+            raise Exception(f"Failed to select destination location: {destination}")
         
-    filename = f"data/csv/{origin}_{destination}_{date_str.replace(' ', '_')}.csv"
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = data[0].keys()
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in data:
-            writer.writerow(row)
-    logging.info(f"Saved CSV data to {filename}")
-    return filename
+        time.sleep(1 + random.uniform(0.5, 1.5))  # Add randomness
+    
+    # Select departure date
+    with trace.span("date_picker") as span:
+        try:
+            wait = WebDriverWait(driver, 15)
+            depart_date = wait.until(EC.element_to_be_clickable((
+                By.XPATH,
+                f'//div[@role="button" and contains(@aria-label, "{date_str}")]'
+            )))
+            depart_date.click()
+            logging.info(f"Selected departure date: {date_str}")
+        except TimeoutException:
+            logging.warning(f"Could not find exact date {date_str}, trying alternative date selection")
+            span["fallback"] = True
+            # Try clicking on a date input field first (site might have changed)
+            try:
+                date_input = driver.find_element(By.XPATH, '//input[contains(@placeholder, "Date")]')
+                date_input.click()
+                time.sleep(1)
+                
+                # Try finding a date by its number only
+                day_number = date_str.split()[1].replace(',', '')
+                day_element = driver.find_element(By.XPATH, f'//div[contains(@aria-label, "{day_number}") and @role="button"]')
+                day_element.click()
+            except Exception as e:
+                logging.error(f"Alternative date selection failed: {e}")
+                raise
+        
+        time.sleep(1 + random.uniform(0.5, 1.5))  # Add randomness
+    
+    # Click search button
+    with trace.span("search_click"):
+        button = WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.XPATH, '//button[@aria-label="Search"]'))
+        )
+        button.click()
+        logging.info("Clicked search button")
+    
+    # Handle window/tab switching
+    with trace.span("tab_switch") as span:
+        time.sleep(5)  # Wait for new tab to open
+        
+        # Make sure we have window handles before trying to access them
+        span["windows"] = len(driver.window_handles)
+        if len(driver.window_handles) > 1:
+            original_window = driver.current_window_handle
+            
+            # Find the new tab/window
+            for window_handle in driver.window_handles:
+                if window_handle != original_window:
+                    driver.switch_to.window(window_handle)
+                    break
+    
+    # Just make sure we're on the results page by checking the URL
+    current_url = driver.current_url
+    if "kayak" not in current_url or "flights" not in current_url:
+        logging.warning(f"Unexpected URL after search: {current_url}")
+        # We might still be on the right page, so continue
+
+class ScrapeOptions:
+    """
+    The optional collaborators of a scrape, shared by a farm's workers; None leaves a feature off
+    pool: DriverPool to borrow browsers from, lean: LeanProfile, limiter: AdaptiveRateLimiter,
+    cache: ResultCache, metrics: RunMetrics, tracer: Tracer, archive: PageArchive of results pages,
+    flight_store: sink for a farm's flights, autoscaler: Autoscaler, base_url: results site root
+    """
+
+    def __init__(self, pool=None, lean=None, limiter=None, cache=None, metrics=None, tracer=None, archive=None,
+                 flight_store=None, autoscaler=None, base_url=KAYAK_BASE_URL):
+        self.pool = pool
+        self.lean = lean
+        self.limiter = limiter
+        self.cache = cache
+        self.metrics = metrics
+        self.tracer = tracer
+        self.archive = archive
+        self.flight_store = flight_store
+        self.autoscaler = autoscaler
+        self.base_url = base_url
+
+    def replace(self, **changes):
+        """A copy with the given fields changed"""
+        options = ScrapeOptions(**vars(self))
+        for name, value in changes.items():
+            if name not in vars(options):
+                raise TypeError(f"Unknown scrape option: {name}")
+            setattr(options, name, value)
+        return options
 
-def scrape_flight_data(origin, destination, date_str, headless=True, proxy=None, max_retries=2):
+def scrape_flight_data(origin, destination, date_str, options=None, headless=True, proxy=None, max_retries=2,
+                       deep_link=True, **overrides):
     """
-    Scrape flight data for a specific route and date
-    Returns a list of flight data dictionaries
+    Scrape flight data for a specific route and date; returns a list of flight data dictionaries
+    options: ScrapeOptions; keyword arguments such as pool= or limiter= override single fields
     """
+    options = (options or ScrapeOptions()).replace(**overrides)
+    pool, lean, limiter, cache = options.pool, options.lean, options.limiter, options.cache
+    metrics, tracer, archive, base_url = options.metrics, options.tracer, options.archive, options.base_url
+    
+    trace = TaskTrace(tracer, origin, destination, date_str)
     retry_count = 0
+    use_deep_link = deep_link
     while retry_count <= max_retries:
         driver = None
+        results_url = None
+        trace.retry = retry_count
         try:
-            driver = setup_driver(headless=headless, proxy=proxy)
-            logging.info(f"Starting scrape: {origin} to {destination} on {date_str}")
-            
-            # Navigate to Kayak
-            driver.get("https://www.kayak.com/")
-            logging.info("Navigated to Kayak homepage")
-            
-            # Wait for initial page load
-            time.sleep(3 + random.uniform(1, 3))  # Add randomness to avoid detection
-            
-            # Handle potential popups or overlays
-            handle_popups(driver)
-            
-            # Click on flight type dropdown
-            dropdown = WebDriverWait(driver, 15).until(
-                EC.element_to_be_clickable((By.CLASS_NAME, "Uqct-title"))
-            )   
-            dropdown.click()
-            logging.info("Clicked flight type dropdown")
-            time.sleep(1)
-            
-            # Select one-way flight
-            oneway = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, '//*[@id="oneway"]'))
-            )
-            oneway.click()
-            logging.info("Selected one-way flight")
-            time.sleep(1)
+            # Wait for a token before taking a browser, so no browser sits checked out and idle
+            if limiter:
+                with trace.span("rate_limit"):
+                    limiter.acquire(base_url, proxy)
             
-            # Clear origin if needed
-            try:
-                clear_buttons = driver.find_elements(By.XPATH, '//div[@aria-label="Remove value"]')
-                for btn in clear_buttons:
-                    if btn.is_displayed():
-                        btn.click()
-                        logging.info("Cleared a field")
-                        time.sleep(1)
-            except Exception:
-                logging.info("No clear buttons found or accessible")
-            
-            # Enter origin
-            if not select_from_dropdown(
-                driver, 
-                '//input[@aria-label="Flight origin input"]', 
-                origin, 
-                "flight-origin-smarty-input-list"
-            ):
-                raise Exception(f"Failed to select origin location: {origin}")
-            
-            time.sleep(1 + random.uniform(0.5, 1.5))  # Add randomness
-            
-            # Enter destination
-            if not select_from_dropdown(
-                driver, 
-                '//input[@aria-label="Flight destination input"]', 
-                destination, 
-                "flight-destination-smarty-input-list"
-            ):
-                raise Exception(f"Failed to select destination location: {destination}")
-            
-            time.sleep(1 + random.uniform(0.5, 1.5))  # Add randomness
-            
-            # Select departure date
-            try:
-                wait = WebDriverWait(driver, 15)
-                depart_date = wait.until(EC.element_to_be_clickable((
-                    By.XPATH,
-                    f'//div[@role="button" and contains(@aria-label, "{date_str}")]'
-                )))
-                depart_date.click()
-                logging.info(f"Selected departure date: {date_str}")
-            except TimeoutException:
-                logging.warning(f"Could not find exact date {date_str}, trying alternative date selection")
-                # Try clicking on a date input field first (site might have changed)
-                try:
-                    date_input = driver.find_element(By.XPATH, '//input[contains(@placeholder, "Date")]')
-                    date_input.click()
-                    time.sleep(1)
-                    
-                    # Try finding a date by its number only
-                    day_number = date_str.split()[1].replace(',', '')
-                    day_element = driver.find_element(By.XPATH, f'//div[contains(@aria-label, "{day_number}") and @role="button"]')
-                    day_element.click()
-                except Exception as e:
-                    logging.error(f"Alternative date selection failed: {e}")
-                    raise
-            
-            time.sleep(1 + random.uniform(0.5, 1.5))  # Add randomness
-            
-            # Click search button
-            button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, '//button[@aria-label="Search"]'))
-            )
-            button.click()
-            logging.info("Clicked search button")
-            
-            # Handle window/tab switching
-            time.sleep(5)  # Wait for new tab to open
-            
-            # Make sure we have window handles before trying to access them
-            if len(driver.window_handles) > 1:
-                original_window = driver.current_window_handle
-                
-                # Find the new tab/window
-                for window_handle in driver.window_handles:
-                    if window_handle != original_window:
-                        driver.switch_to.window(window_handle)
-                        break
-            
-            # Just make sure we're on the results page by checking the URL
-            current_url = driver.current_url
-            if "kayak" not in current_url or "flights" not in current_url:
-                logging.warning(f"Unexpected URL after search: {current_url}")
-                # We might still be on the right page, so continue
+            with trace.span("driver", pooled=pool is not None):
+                driver = pool.checkout() if pool else setup_driver(headless=headless, proxy=proxy, lean=lean)
+            logging.info(f"Starting scrape: {origin} to {destination} on {date_str}")
+            if metrics:
+                metrics.record_attempt(origin, destination, date_str)
+            
+            results_url = build_results_url(origin, destination, date_str, base_url=base_url) if use_deep_link else None
+            if results_url:
+                # Load the results page directly and skip the homepage form
+                with trace.span("deep_link_load"):
+                    driver.get(results_url)
+                logging.info(f"Opened results page directly: {results_url}")
+                with trace.span("popups"):
+                    handle_popups(driver)
+            else:
+                search_via_form(driver, origin, destination, date_str, trace=trace)
+                # Remember the codes autocomplete picked so next time can deep-link
+                default_resolver().learn_from_url(origin, destination, driver.current_url)
             
             logging.info("Waiting for results to load (this may take up to 2 minutes)...")
             
@@ -312,238 +372,416 @@ def scrape_flight_data(origin, destination, date_str, headless=True, proxy=None,
             result_wait = WebDriverWait(driver, 120)
             
             # First try to wait for the loading indicator to disappear
-            try:
-                result_wait.until(EC.invisibility_of_element_located(
-                    (By.XPATH, '//div[contains(@class, "Spinner") or contains(@class, "loader")]')
-                ))
-            except:
-                logging.info("Loading indicator method failed or timed out, continuing anyway")
+            with trace.span("spinner_wait") as span:
+                try:
+                    result_wait.until(EC.invisibility_of_element_located(
+                        (By.XPATH, '//div[contains(@class, "Spinner") or contains(@class, "loader")]')
+                    ))
+                except:
+                    span["outcome"] = "timeout"
+                    logging.info("Loading indicator method failed or timed out, continuing anyway")
             
             # Then wait for actual results
-            try:
-                all_results = result_wait.until(
-                    EC.presence_of_all_elements_located((By.XPATH, '//div[@class="Fxw9-result-item-container"]'))
-                )
-            except TimeoutException:
-                # Try alternative selectors if the original one doesn't work
+            with trace.span("results_wait") as span:
                 try:
                     all_results = result_wait.until(
-                        EC.presence_of_all_elements_located((By.XPATH, '//div[contains(@class, "result-item")]'))
+                        EC.presence_of_all_elements_located((By.XPATH, '//div[@class="Fxw9-result-item-container"]'))
                     )
                 except TimeoutException:
-                    # One more attempt with a very generic selector
-                    all_results = result_wait.until(
-                        EC.presence_of_all_elements_located((By.XPATH, '//div[contains(@class, "flight-result")]'))
-                    )
+                    # Try alternative selectors if the original one doesn't work
+                    span["fallback_selector"] = True
+                    try:
+                        all_results = result_wait.until(
+                            EC.presence_of_all_elements_located((By.XPATH, '//div[contains(@class, "result-item")]'))
+                        )
+                    except TimeoutException:
+                        # One more attempt with a very generic selector
+                        all_results = result_wait.until(
+                            EC.presence_of_all_elements_located((By.XPATH, '//div[contains(@class, "flight-result")]'))
+                        )
+                span["results"] = len(all_results)
             
             # If we still have no results, take a screenshot for debugging
             if not all_results:
                 screenshot_path = f"logs/error_screenshot_{origin}_{destination}_{int(time.time())}.png"
+                os.makedirs('logs', exist_ok=True)
                 driver.save_screenshot(screenshot_path)
                 logging.warning(f"No results found. Screenshot saved to {screenshot_path}")
+                if limiter and page_is_blocked(driver):
+                    limiter.record_block(base_url, proxy, reason="bot check")
                 if retry_count < max_retries:
                     retry_count += 1
+                    use_deep_link = False
                     logging.info(f"Retrying ({retry_count}/{max_retries})...")
-                    if driver:
-                        driver.quit()
-                    time.sleep(5 + random.uniform(2, 5))  # Wait before retrying
-                    continue
+                    if not limiter:
+                        with trace.span("retry_wait"):
+                            time.sleep(5 + random.uniform(2, 5))  # Wait before retrying
+                    continue  # finally releases the browser
                 else:
                     return []
             
             logging.info(f"Found {len(all_results)} flight results")
             
-            # Process flight results
-            flight_data = []
-            for i, result in enumerate(all_results):
-                try:
-                    flight_info = {
+            if archive is not None:
+                with trace.span("archive"):
+                    archive.record_page(driver.current_url, driver.page_source, strip_scripts=True)
+            
+            with trace.span("extraction") as span:
+                # Read every card in one round trip; missing fields come back as None
+                cards, _ = extract_result_cards(driver, FARM_FIELDS)
+                scrape_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                
+                # Process flight results
+                flight_data = []
+                for i, card in enumerate(cards):
+                    flight_data.append({
                         "origin": origin,
                         "destination": destination,
                         "date": date_str,
                         "flight_number": i + 1,
-                        "scrape_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                    
-                    # Try multiple ways to extract flight time
-                    try:
-                        time_element = result.find_element(By.XPATH, './/div[contains(@class, "vmXl")]//span')
-                        flight_info["time"] = time_element.text
-                    except:
-                        try:
-                            time_element = result.find_element(By.XPATH, './/div[contains(@class, "time")]')
-                            flight_info["time"] = time_element.text
-                        except:
-                            flight_info["time"] = "Not available"
-                    
-                    # Try to extract airline
-                    try:
-                        airline = result.find_element(By.XPATH, './/div[contains(@class, "c_cgF")]')
-                        flight_info["airline"] = airline.text
-                    except:
-                        try:
-                            airline = result.find_element(By.XPATH, './/div[contains(@class, "carrier")]')
-                            flight_info["airline"] = airline.text
-                        except:
-                            flight_info["airline"] = "Unknown"
-                    
-                    # Try to extract price
-                    try:
-                        price = result.find_element(By.XPATH, './/div[contains(@class, "price-text")]')
-                        flight_info["price"] = price.text
-                    except:
-                        try:
-                            price = result.find_element(By.XPATH, './/div[contains(@class, "price")]')
-                            flight_info["price"] = price.text
-                        except:
-                            flight_info["price"] = "Price not available"
-                    
-                    # Try to extract flight duration
-                    try:
-                        duration = result.find_element(By.XPATH, './/div[contains(@class, "duration")]')
-                        flight_info["duration"] = duration.text
-                    except:
-                        flight_info["duration"] = "Not available"
-                    
-                    # Try to extract stops information
-                    try:
-                        stops = result.find_element(By.XPATH, './/div[contains(@class, "stops")]')
-                        flight_info["stops"] = stops.text
-                    except:
-                        flight_info["stops"] = "Not available"
-                    
-                    flight_data.append(flight_info)
-                    logging.info(f"Processed flight {i+1}/{len(all_results)}")
-                    
-                except (NoSuchElementException, StaleElementReferenceException) as e:
-                    logging.warning(f"Issue processing flight {i+1}: {e}")
-                    continue
+                        "scrape_time": scrape_time,
+                        "time": card["time"] or "Not available",
+                        "airline": card["airline"] or "Unknown",
+                        "price": card["price"] or "Price not available",
+                        "duration": card["duration"] or "Not available",
+                        "stops": card["stops"] or "Not available"
+                    })
+                span["records"] = len(flight_data)
+            
+            if lean and lean.measure:
+                weight = measure_page(driver)
+                logging.info(f"Page weight: {weight['requests']} requests, {weight['bytes'] / 1024:.0f} KiB, "
+                             f"{weight['blocked_requests']} requests blocked")
             
             # Successfully scraped data, return it
+            if limiter:
+                limiter.record_success(base_url, proxy)
+            if cache:
+                cache.put(origin, destination, date_str, flight_data)
             return flight_data
             
         except Exception as e:
             logging.error(f"Error during scraping: {e}", exc_info=True)
+            if limiter and isinstance(e, TimeoutException):
+                limiter.record_block(base_url, proxy, reason="timeout")
+            elif limiter and driver and page_is_blocked(driver):
+                limiter.record_block(base_url, proxy, reason="bot check")
+            if results_url:
+                logging.info("Deep-linked attempt failed, falling back to the search form")
+                use_deep_link = False
             if retry_count < max_retries:
                 retry_count += 1
                 logging.info(f"Retrying ({retry_count}/{max_retries})...")
-                time.sleep(5 + random.uniform(2, 5))  # Wait before retrying
+                if not limiter:
+                    with trace.span("retry_wait"):
+                        time.sleep(5 + random.uniform(2, 5))  # Wait before retrying
             else:
                 logging.error(f"Failed to scrape {origin} to {destination} on {date_str} after {max_retries} attempts")
                 return []
                 
         finally:
             if driver:
-                driver.quit()
-                logging.info("Browser closed")
+                with trace.span("driver_release"):
+                    if pool:
+                        # A crashed session fails the health check and gets replaced
+                        pool.checkin(driver, broken=not pool.is_healthy(driver))
+                    else:
+                        driver.quit()
+                        logging.info("Browser closed")
     
     return []  # Return empty list if all retries failed
 
-def worker(task_queue, results, max_workers):
-    """Worker function for thread pool"""
-    while not task_queue.empty():
+def cached_flights(cache, origin, destination, date_str):
+    """Flights for a task from the ResultCache if a fresh enough entry exists, otherwise None"""
+    if not cache:
+        return None
+    cached = cache.get(origin, destination, date_str)
+    if cached is not None:
+        logging.info(f"Cache hit: {origin} to {destination} on {date_str} ({len(cached)} flights)")
+    return cached
+
+def scrape_task(origin, destination, date_str, options, **kwargs):
+    """(flights, from_cache): fresh cached flights when there are some, otherwise a scrape"""
+    cached = cached_flights(options.cache, origin, destination, date_str)
+    if cached is not None:
+        return cached, True
+    return scrape_flight_data(origin, destination, date_str, options, **kwargs), False
+
+def scrape_route_dates(origin, destination, dates, options=None, headless=True, proxy=None):
+    """
+    Scrape several dates of one route in one browser session; yields (date_str, flights, seconds, from_cache)
+    Each date still loads its own deep link; cookies, dismissed popups and cached assets carry over
+    """
+    options = options or ScrapeOptions()
+    session = RouteSession(options.pool, lambda: setup_driver(headless=headless, proxy=proxy, lean=options.lean))
+    try:
+        for date_str in dates:
+            started = time.perf_counter()
+            flight_data, from_cache = scrape_task(origin, destination, date_str, options.replace(pool=session),
+                                                  headless=headless, proxy=proxy)
+            yield date_str, flight_data, time.perf_counter() - started, from_cache
+    finally:
+        session.close()
+
+def worker(task_queue, results, options):
+    """Worker function for thread pool; with an Autoscaler each task runs in one of its session slots"""
+    autoscaler, metrics = options.autoscaler, options.metrics
+    while True:
+        if autoscaler:
+            autoscaler.acquire()
+        # Checking empty() and then calling a blocking get() races with the
+        # other workers and can hang forever on the last task
+        try:
+            task = task_queue.get_nowait()
+        except queue.Empty:
+            if autoscaler:
+                autoscaler.release()
+            break
+        
         try:
-            task = task_queue.get()
             origin = task["origin"]
             destination = task["destination"]
             date_str = task["date"]
             
-            # Random delay between scrapes to avoid being blocked
-            delay = random.uniform(1, 5)
-            logging.info(f"Worker waiting {delay:.2f} seconds before starting task")
-            time.sleep(delay)
-            
-            # Perform the scraping
-            flight_data = scrape_flight_data(origin, destination, date_str, headless=True)
+            # Random delay between scrapes to avoid being blocked, unless the
+            # rate limiter is pacing requests
+            if not options.limiter:
+                delay = random.uniform(1, 5)
+                logging.info(f"Worker waiting {delay:.2f} seconds before starting task")
+                time.sleep(delay)
             
-            if flight_data:
-                # Save results to files
-                json_file = save_to_json(flight_data, origin, destination, date_str)
-                csv_file = save_to_csv(flight_data, origin, destination, date_str)
+            # A route task carries all its dates and is scraped in one browser session
+            if "dates" in task:
+                route_dates = scrape_route_dates(origin, destination, task["dates"], options)
+            else:
+                started = time.perf_counter()
+                flight_data, from_cache = scrape_task(origin, destination, date_str, options)
+                route_dates = [(date_str, flight_data, time.perf_counter() - started, from_cache)]
+            
+            for date_str, flight_data, seconds, from_cache in route_dates:
+                if metrics:
+                    metrics.record({**task, "date": date_str}, flight_data, seconds)
+                if autoscaler:
+                    autoscaler.record(bool(flight_data))
                 
                 # Add summary to results
-                results.append({
-                    "origin": origin,
-                    "destination": destination,
-                    "date": date_str,
-                    "flights_found": len(flight_data),
-                    "json_file": json_file,
-                    "csv_file": csv_file
-                })
-            else:
-                logging.warning(f"No flight data found for {origin} to {destination} on {date_str}")
-                results.append({
-                    "origin": origin,
-                    "destination": destination,
-                    "date": date_str,
-                    "flights_found": 0,
-                    "json_file": None,
-                    "csv_file": None
-                })
+                results.append(summarize_task(flight_data, origin, destination, date_str, options.flight_store,
+                                              from_cache))
                 
         except Exception as e:
             logging.error(f"Worker error: {e}", exc_info=True)
         finally:
             task_queue.task_done()
+            if autoscaler:
+                autoscaler.release()
+
+def lease_owner_prefix():
+    """Prefix of the lease owners of this process's store workers"""
+    return f"{socket.gethostname()}:{os.getpid()}:"
 
-def run_scraper_farm(routes=None, days_ahead=None, max_workers=3):
+def store_worker(store, results, options, stop=None):
+    """
+    Worker that leases tasks from a durable TaskStore instead of an in-memory queue
+    The lease is heartbeated while a task runs; once `stop` is set no new task is leased
+    """
+    autoscaler, metrics = options.autoscaler, options.metrics
+    owner = f"{lease_owner_prefix()}{threading.get_ident()}"
+    while not (stop and stop.is_set()):
+        # Take a session slot before leasing so a waiting worker holds no lease
+        if autoscaler:
+            autoscaler.acquire()
+        task = store.lease(owner)
+        if task is None:
+            if autoscaler:
+                autoscaler.release()
+            break
+        
+        origin = task["origin"]
+        destination = task["destination"]
+        date_str = task["date"]
+        started = time.perf_counter()
+        try:
+            # The lease is extended until the scrape is over, then completed or failed
+            with LeaseHeartbeat(lambda: store.heartbeat(task["id"], owner), task["id"], store.lease_seconds):
+                flight_data, from_cache = scrape_task(origin, destination, date_str, options)
+            if metrics:
+                metrics.record(task, flight_data, time.perf_counter() - started)
+            if autoscaler:
+                autoscaler.record(bool(flight_data))
+            summary = summarize_task(flight_data, origin, destination, date_str, options.flight_store, from_cache)
+            if flight_data:
+                store.complete(task["id"], owner, summary)
+            else:
+                store.fail(task["id"], owner, "no flights found", summary)
+            results.append(summary)
+        except Exception as e:
+            logging.error(f"Worker error: {e}", exc_info=True)
+            if metrics:
+                metrics.record(task, [], time.perf_counter() - started, error=str(e))
+            if autoscaler:
+                autoscaler.record(False)
+            store.fail(task["id"], owner, e)
+        finally:
+            if autoscaler:
+                autoscaler.release()
+
+def run_scraper_farm(routes=None, days_ahead=None, max_workers=3, options=None, task_store=None, multi_date=False,
+                     per_task_files=False, profile=None, prewarm=False, **overrides):
     """
     Run the scraper farm with multiple threads
     
     Args:
         routes: List of origin-destination pairs to scrape. Default is ROUTES.
+            A route's "priority" and "deadline" order its tasks (see scheduler.py).
         days_ahead: List of days to look ahead for each route. Default is [0, 7, 14].
-        max_workers: Maximum number of concurrent workers. Default is 3.
+        max_workers: Maximum number of concurrent workers. Default is 3; an autoscaler sets its own.
+        options: ScrapeOptions; keyword arguments override single fields. The pool, limiter, metrics,
+            tracer and flight store (a FlightStoreWriter) default to new ones owned by the run.
+        task_store: TaskStore, or path to one, to lease tasks from so a restarted run resumes.
+        multi_date: One task and browser session per route (scrape_route_dates); not with a task_store.
+        per_task_files: Per-task JSON/CSV files under data/ instead of the default flight store.
+        profile: ProfileTemplate the run's own browsers start from.
+        prewarm: Launch the run's own browsers up front and keep one on standby.
     """
+    options = (options or ScrapeOptions()).replace(**overrides)
+    pool, lean, limiter, cache = options.pool, options.lean, options.limiter, options.cache
+    metrics, tracer, flight_store, autoscaler = options.metrics, options.tracer, options.flight_store, options.autoscaler
+
     if routes is None:
         routes = ROUTES
         
     if days_ahead is None:
         days_ahead = [0, 7, 14]  # Today, next week, two weeks
     
-    # Create task queue
-    task_queue = queue.Queue()
+    if multi_date and task_store is not None:
+        raise ValueError("multi_date runs need the in-memory scheduler, not a task_store")
+    
     results = []
+    tasks = build_tasks(routes, days_ahead)
+    
+    if task_store is not None:
+        # Durable queue: already finished tasks are skipped on restart
+        if isinstance(task_store, str):
+            task_store = TaskStore(task_store)
+        # Leases go out in id order, so insert in priority order
+        task_store.add_tasks(order_tasks(tasks))
+        counts = task_store.counts()
+        num_tasks = counts[PENDING] + counts[LEASED]
+    else:
+        num_tasks = len(routes) if multi_date else len(tasks)
+            
+    if limiter is None:
+        limiter = AdaptiveRateLimiter()
+    if metrics is None:
+        # A resumed run is only responsible for what the store still has open
+        planned = tasks if task_store is None else task_store.tasks(PENDING) + task_store.tasks(LEASED)
+        metrics = RunMetrics("farm", planned=planned)
+    if tracer is None:
+        tracer = Tracer("farm")
+    if flight_store is None and not per_task_files:
+        from flight_store import FlightStoreWriter
+
+        flight_store = FlightStoreWriter()
+    
+    # Browsers are shared between workers instead of one per task
+    num_workers = min(autoscaler.max_sessions if autoscaler else max_workers, num_tasks)
+    owns_pool = pool is None
+    if owns_pool:
+        pool_size = autoscaler.target if autoscaler else num_workers
+        if profile is not None:
+            prepare_profile(profile)
+        pool = DriverPool(lambda: setup_driver(headless=True, lean=lean, profile=profile), max_size=max(pool_size, 1),
+                          standby=1 if prewarm else 0, keep_cookies=profile is not None)
+        if prewarm:
+            pool.prewarm(max(pool_size, 1))
+    if autoscaler:
+        # Blocks seen by the limiter count as site errors; idle browsers above the target are quit
+        if autoscaler.limiter is None:
+            autoscaler.limiter = limiter
+        if autoscaler.on_resize is None:
+            autoscaler.on_resize = pool.resize
+        autoscaler.start()
+    
+    if task_store is None:
+        # Priority order with a deque per worker; idle workers steal from busy ones
+        scheduler = Scheduler(build_route_tasks(routes, days_ahead) if multi_date else tasks, workers=num_workers)
     
-    # Add tasks to queue
-    for route in routes:
-        for days in days_ahead:
-            date_str = get_formatted_date(days)
-            task_queue.put({
-                "origin": route["origin"],
-                "destination": route["destination"],
-                "date": date_str
-            })
-            
     # Create and start worker threads
+    options = options.replace(pool=pool, limiter=limiter, metrics=metrics, tracer=tracer, flight_store=flight_store)
     threads = []
+    stop = threading.Event()
     
-    for _ in range(min(max_workers, task_queue.qsize())):
-        thread = threading.Thread(
-            target=worker, 
-            args=(task_queue, results, max_workers)
-        )
+    for i in range(num_workers):
+        if task_store is not None:
+            thread = threading.Thread(target=store_worker, args=(task_store, results, options, stop))
+        else:
+            thread = threading.Thread(target=worker, args=(scheduler.queue(i), results, options))
         threads.append(thread)
         thread.start()
     
-    # Wait for all tasks to complete
-    task_queue.join()
+    # Wait for all tasks to complete; workers exit once nothing is left to take
+    try:
+        for thread in threads:
+            # Short joins so Ctrl-C is handled at once, not after the current task
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        # Hand the leases back so a restart picks these tasks up at once instead of after the lease expires
+        stop.set()
+        if task_store is not None:
+            released = task_store.release_owned(lease_owner_prefix())
+            logging.warning(f"Interrupted: released {released} leased tasks, they run again on restart")
+        raise
+    finally:
+        if autoscaler:
+            autoscaler.stop()
+        if owns_pool:
+            pool.close()
+        if flight_store is not None:
+            flight_store.close()
+        metrics.finish()
+        tracer.flush()
     
     # Log summary
     logging.info(f"Scraping completed for {len(results)} route-date combinations")
     for result in results:
         status = "SUCCESS" if result["flights_found"] > 0 else "FAILED"
         logging.info(f"{status}: {result['origin']} to {result['destination']} on {result['date']}: {result['flights_found']} flights")
+    if task_store is not None:
+        logging.info(f"Task store {task_store.path}: {task_store.counts()}")
+    else:
+        stats = scheduler.stats()
+        logging.info(f"Scheduler: {stats['stolen']} tasks stolen, {stats['urgent']} pulled forward for deadlines, "
+                     f"{stats['expired']} dropped past their deadline")
+    if cache:
+        stats = cache.stats()
+        logging.info(f"Result cache: {stats['hits']} hits, {stats['misses']} misses")
+    if autoscaler:
+        stats = autoscaler.summary()
+        logging.info(f"Autoscaler: {stats['min']}-{stats['max']} sessions (limit {stats['max_sessions']}), "
+                     f"{stats['changes']} changes, ended at {stats['final']}")
+    for key, stats in limiter.snapshot().items():
+        logging.info(f"Rate limiter {key}: {stats['rate'] * 60:.1f} requests/min "
+                     f"({stats['successes']} clean, {stats['blocks']} blocked)")
+    report = metrics.report()
+    for line in format_report(report).splitlines():
+        logging.info(line)
+    save_report(report)
+    log_breakdown(tracer)
     
     return results
 
 if __name__ == "__main__":
+    setup_logging()
     try:
         # Example usage
         logging.info("Starting Flight Scraper Farm")
         
-        # Option 1: Scrape predefined routes
-        results = run_scraper_farm(max_workers=2)
+        # Option 1: Scrape predefined routes; the autoscaler sizes the number
+        # of browsers to this box instead of a fixed worker count. Pass
+        # task_store="data/tasks.sqlite3" to let a crashed or interrupted run
+        # pick up where it left off (tasks already done are not scraped again)
+        results = run_scraper_farm(cache=ResultCache(), autoscaler=Autoscaler())
         
         # Option 2: Scrape custom routes
         # custom_routes = [
@@ -554,10 +792,7 @@ if __name__ == "__main__":
         # results = run_scraper_farm(routes=custom_routes, days_ahead=custom_days, max_workers=2)
         
         # Save summary
-        summary_file = f"data/summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=4)
-        logging.info(f"Summary saved to {summary_file}")
+        save_summary(results)
         
     except Exception as e:
         logging.error(f"Main program error: {e}", exc_info=True)
@@ -0,0 +1,167 @@
+"""
+The Selenium-free part of the farm: logging setup, routes, task lists and result files
+
+farm.py re-exports all of it. Code that never starts a browser (the asyncio
+farm's HTTP backend, the CLI) imports it from here so Selenium stays unloaded.
+"""
+import csv
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+_logging_ready = False
+
+def setup_logging(filename='flight_scraper_farm.log'):
+    """
+    Log to `filename` and the console; called by the entry points, not on import
+    Repeated calls add no duplicate handlers
+    """
+    global _logging_ready
+    if _logging_ready:
+        return
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    file_handler = logging.FileHandler(filename, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    root.addHandler(file_handler)
+
+    # Create a console handler, unless something already logs to the console
+    if not any(type(handler) is logging.StreamHandler for handler in root.handlers):
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(formatter)
+        root.addHandler(console_handler)
+    _logging_ready = True
+
+# Define popular routes to scrape
+ROUTES = [
+    {"origin": "Jeddah", "destination": "Dubai"},
+    {"origin": "Jeddah", "destination": "Riyadh"},
+    {"origin": "Dubai", "destination": "London"},
+    {"origin": "Riyadh", "destination": "Cairo"},
+    {"origin": "Jeddah", "destination": "Istanbul"}
+    # Add more routes as needed
+]
+
+# Format the date properly for Kayak's date picker
+def get_formatted_date(days_from_now=0):
+    target_date = datetime.now() + timedelta(days=days_from_now)
+    formatted_date = target_date.strftime("%B %d %Y")  # %B = full month name
+    array = formatted_date.split(" ")
+    
+    # Remove leading zero from day if present and add comma
+    if array[1][0] == "0":
+        array[1] = array[1][1] + ","
+    else:
+        array[1] = array[1] + ","
+        
+    formatted_date = ' '.join(array)
+    return formatted_date
+
+def save_to_json(data, origin, destination, date_str):
+    """Save scraped data to JSON file"""
+    filename = f"data/json/{origin}_{destination}_{date_str.replace(' ', '_')}.json"
+    os.makedirs('data/json', exist_ok=True)
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4)
+    logging.info(f"Saved JSON data to {filename}")
+    return filename
+
+def save_to_csv(data, origin, destination, date_str):
+    """Save scraped data to CSV file"""
+    if not data:
+        logging.warning("No data to save to CSV")
+        return None
+        
+    filename = f"data/csv/{origin}_{destination}_{date_str.replace(' ', '_')}.csv"
+    os.makedirs('data/csv', exist_ok=True)
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        fieldnames = data[0].keys()
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in data:
+            writer.writerow(row)
+    logging.info(f"Saved CSV data to {filename}")
+    return filename
+
+def summarize_task(flight_data, origin, destination, date_str, flight_store=None, from_cache=False):
+    """
+    Save a task's flights and return its summary row
+    Flights go to the flight store/sink when one is given, otherwise to per-task JSON/CSV files;
+    flights from the result cache were saved when first scraped and are not written again
+    """
+    if flight_data and (flight_store is not None or from_cache):
+        if flight_store is not None and not from_cache:
+            flight_store.write(flight_data)
+        return {
+            "origin": origin,
+            "destination": destination,
+            "date": date_str,
+            "flights_found": len(flight_data),
+            "json_file": None,
+            "csv_file": None
+        }
+    
+    if flight_data:
+        # Save results to files
+        json_file = save_to_json(flight_data, origin, destination, date_str)
+        csv_file = save_to_csv(flight_data, origin, destination, date_str)
+        
+        return {
+            "origin": origin,
+            "destination": destination,
+            "date": date_str,
+            "flights_found": len(flight_data),
+            "json_file": json_file,
+            "csv_file": csv_file
+        }
+    
+    logging.warning(f"No flight data found for {origin} to {destination} on {date_str}")
+    return {
+        "origin": origin,
+        "destination": destination,
+        "date": date_str,
+        "flights_found": 0,
+        "json_file": None,
+        "csv_file": None
+    }
+
+def build_tasks(routes, days_ahead):
+    """Expand routes x days ahead into route-date task dictionaries, keeping a route's priority/deadline"""
+    tasks = []
+    for route in routes:
+        for days in days_ahead:
+            task = {
+                "origin": route["origin"],
+                "destination": route["destination"],
+                "date": get_formatted_date(days)
+            }
+            for key in ("priority", "deadline"):
+                if route.get(key) is not None:
+                    task[key] = route[key]
+            tasks.append(task)
+    return tasks
+
+def build_route_tasks(routes, days_ahead):
+    """One task per route holding all its dates ("date" is the first, for scheduling)"""
+    tasks = []
+    for route in routes:
+        dates = [get_formatted_date(days) for days in days_ahead]
+        task = {"origin": route["origin"], "destination": route["destination"], "date": dates[0], "dates": dates}
+        for key in ("priority", "deadline"):
+            if route.get(key) is not None:
+                task[key] = route[key]
+        tasks.append(task)
+    return tasks
+
+def save_summary(results, directory="data"):
+    """Write a run's per-task summaries to <directory>/summary_<timestamp>.json"""
+    os.makedirs(directory, exist_ok=True)
+    summary_file = os.path.join(directory, f"summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=4)
+    logging.info(f"Summary saved to {summary_file}")
+    return summary_file
@@ -0,0 +1,184 @@
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+
+from kayak_urls import parse_travel_date
+
+_SAFE_RE = re.compile(r"[^A-Za-z0-9]+")
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("origin", pa.string()),
+        ("destination", pa.string()),
+        ("travel_date", pa.date32()),
+        ("scrape_time", pa.timestamp("s")),
+        ("flight_number", pa.int32()),
+        ("departure_time", pa.string()),
+        ("airline", pa.string()),
+        ("price", pa.string()),
+        ("duration", pa.string()),
+        ("stops", pa.string()),
+        ("source", pa.string()),
+    ])
+
+
+def route_key(origin, destination):
+    return f"{_SAFE_RE.sub('_', origin).strip('_')}-{_SAFE_RE.sub('_', destination).strip('_')}"
+
+
+def to_row(record, source="farm", scrape_time=None):
+    """Map a farm.py or main.py flight record onto the store's columns"""
+    origin = record.get("origin") or record.get("Origin")
+    destination = record.get("destination") or record.get("Destination")
+    stamp = record.get("scrape_time")
+    if stamp:
+        stamp = datetime.strptime(stamp, "%Y-%m-%d %H:%M:%S")
+    return {
+        "origin": origin,
+        "destination": destination,
+        "travel_date": parse_travel_date(record["date"]),
+        "scrape_time": stamp or scrape_time or datetime.now().replace(microsecond=0),
+        "flight_number": record.get("flight_number"),
+        "departure_time": record.get("time") or record.get("departure_time"),
+        "airline": record.get("airline"),
+        "price": record.get("price"),
+        "duration": record.get("duration"),
+        "stops": record.get("stops"),
+        "source": source,
+    }
+
+
+class FlightStoreWriter:
+    """
+    Append-only Parquet dataset of scraped flights, partitioned by scrape date and route
+
+    Layout: <root>/scrape_date=YYYY-MM-DD/route=<Origin>-<Destination>/part-<uuid>.parquet
+
+    Records are buffered and committed in batches: each batch is written to a
+    hidden temp file and renamed into place, so readers never see a partial
+    file. One writer can be shared by many threads; separate processes use
+    their own writers and never collide because every part file has a unique
+    name.
+    """
+
+    def __init__(self, root="data/flights", batch_size=500, source="farm"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("The flight store needs pyarrow: pip install pyarrow")
+
+        self.root = root
+        self.batch_size = batch_size
+        self.source = source
+        self._rows = []
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.files_written = 0
+        os.makedirs(root, exist_ok=True)
+
+    def write(self, records, scrape_time=None):
+        """Buffer flight records; flushes automatically once batch_size rows are waiting"""
+        rows = [to_row(record, self.source, scrape_time) for record in records]
+        with self._lock:
+            self._rows.extend(rows)
+            ready = len(self._rows) >= self.batch_size
+        if ready:
+            self.flush()
+
+    def flush(self):
+        """Commit every buffered row, one Parquet file per partition"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return
+
+        partitions = {}
+        for row in rows:
+            key = (row["scrape_time"].strftime("%Y-%m-%d"), route_key(row["origin"], row["destination"]))
+            partitions.setdefault(key, []).append(row)
+
+        schema = _schema()
+        for (scrape_date, route), part_rows in partitions.items():
+            directory = os.path.join(self.root, f"scrape_date={scrape_date}", f"route={route}")
+            os.makedirs(directory, exist_ok=True)
+            name = f"part-{uuid.uuid4().hex}.parquet"
+            tmp_path = os.path.join(directory, f".{name}.tmp")
+            table = pa.Table.from_pylist(part_rows, schema=schema)
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, os.path.join(directory, name))
+
+        with self._lock:
+            self.files_written += len(partitions)
+            self.rows_written += len(rows)
+        logging.info(f"Flight store: committed {len(rows)} rows in {len(partitions)} partitions under {self.root}")
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_flights(root="data/flights", filters=None, columns=None):
+    """
+    Load the dataset (or a filtered slice of it) as a pandas DataFrame
+    filters use pyarrow syntax, e.g. [("route", "=", "Karachi-Lahore")]
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    expression = None
+    for column, op, value in filters or []:
+        field = ds.field(column)
+        clause = {"=": field == value, "==": field == value, "!=": field != value, ">": field > value,
+                  ">=": field >= value, "<": field < value, "<=": field <= value}[op]
+        expression = clause if expression is None else expression & clause
+    return dataset.to_table(filter=expression, columns=columns).to_pandas()
+
+
+def import_archive(directories, root="data/flights"):
+    """Load legacy per-task JSON files into the dataset, using file mtimes as scrape times"""
+    with FlightStoreWriter(root, source="archive") as writer:
+        for directory in directories:
+            for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+                with open(path, encoding="utf-8") as f:
+                    records = json.load(f)
+                if records:
+                    writer.write(records, scrape_time=datetime.fromtimestamp(os.path.getmtime(path)).replace(microsecond=0))
+    logging.info(f"Imported {writer.rows_written} rows from {', '.join(directories)}")
+    return writer.rows_written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Columnar flight-price store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_parser = sub.add_parser("import", help="Import legacy kayak_flights_data* JSON directories")
+    import_parser.add_argument("directories", nargs="+")
+    import_parser.add_argument("--root", default="data/flights")
+    show_parser = sub.add_parser("show", help="Print rows for a route")
+    show_parser.add_argument("--root", default="data/flights")
+    show_parser.add_argument("--route", help="e.g. Karachi-Lahore")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "import":
+        import_archive(args.directories, args.root)
+    else:
+        frame = read_flights(args.root, filters=[("route", "=", args.route)] if args.route else None)
+        print(frame.to_string())
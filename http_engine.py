@@ -0,0 +1,255 @@
+import asyncio
+import contextlib
+import logging
+import random
+import re
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import httpx
+
+from kayak_urls import KAYAK_BASE_URL, build_results_url
+from tracing import TaskTrace
+
+# The poll endpoint, its request body and the payload shape parse_poll_results() reads are
+# assumptions, not taken from captured Kayak traffic. Only mock_kayak.py implements them, so
+# runs against the mock (or its replays) validate this engine against itself, not against
+# kayak.com. Capture a real results page's XHR traffic and adjust these before relying on
+# the engine for live scraping. Until then the engine is experimental: against the live
+# host it is not used unless allow_live is set, and searches go to the browser instead.
+POLL_PATH = "/i/api/search/dynamic/flights/poll"
+
+SEARCH_ID_RE = re.compile(r'"searchId"\s*:\s*"([^"]+)"')
+CHALLENGE_MARKERS = ("captcha", "px-captcha", "verify you are a human", "/security/check")
+
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "PKR": "Rs ", "SAR": "SAR ", "AED": "AED "}
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36")
+
+
+class ChallengeDetected(Exception):
+    """The site answered with a bot check instead of results"""
+
+
+class UnknownAirport(LookupError):
+    """No airport code is known for the origin or destination, so there is no results URL"""
+
+
+class SearchIncomplete(Exception):
+    """The search was still running after max_polls polls"""
+
+
+def is_live_host(base_url):
+    """Whether base_url points at kayak.com itself rather than a mock or replay server"""
+    host = urlsplit(base_url).hostname or ""
+    return host == "kayak.com" or host.endswith(".kayak.com")
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _format_clock(iso_timestamp):
+    return datetime.fromisoformat(iso_timestamp).strftime("%I:%M %p").lstrip("0").lower()
+
+
+def parse_poll_results(payload, origin, destination, date_str):
+    """
+    Turn a poll response into the same record shape scrape_flight_data returns
+    The expected {"results": [{"price", "currency", "legs": [...]}]} schema is the mock's (see POLL_PATH)
+    """
+    scrape_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    flight_data = []
+    for i, result in enumerate(payload.get("results", [])):
+        leg = (result.get("legs") or [{}])[0]
+        price = result.get("price")
+        symbol = CURRENCY_SYMBOLS.get(result.get("currency", "USD"), "")
+        stops = leg.get("stops")
+        duration = leg.get("duration")
+
+        flight_data.append({
+            "origin": origin,
+            "destination": destination,
+            "date": date_str,
+            "flight_number": i + 1,
+            "scrape_time": scrape_time,
+            "time": (f"{_format_clock(leg['departure'])} – {_format_clock(leg['arrival'])}"
+                     if leg.get("departure") and leg.get("arrival") else "Not available"),
+            "airline": leg.get("airline") or "Unknown",
+            "price": f"{symbol}{price}" if price is not None else "Price not available",
+            "duration": f"{duration // 60}h {duration % 60}m" if duration is not None else "Not available",
+            "stops": ("nonstop" if stops == 0 else f"{stops} stop" + ("s" if stops > 1 else ""))
+                     if stops is not None else "Not available",
+        })
+    return flight_data
+
+
+class HttpSearchEngine:
+    """
+    Browserless search engine that replays the results page's polling calls
+
+    One httpx.AsyncClient is shared by every search so connections are kept
+    alive and reused (over HTTP/2 when the h2 package is installed). An
+    optional AdaptiveRateLimiter paces every request and is told about
+    clean searches, challenges and timeouts. With a PageArchive every results
+    page and final poll payload is recorded for offline replay.
+
+    Experimental: the polling protocol is unverified against kayak.com (see
+    POLL_PATH), so scrape_flight_data_async uses the browser for the live
+    host unless `allow_live` is set.
+    """
+
+    def __init__(self, base_url=KAYAK_BASE_URL, max_connections=100, timeout=30,
+                 poll_interval=1.0, max_polls=30, limiter=None, archive=None, allow_live=False):
+        self.base_url = base_url
+        self.allow_live = allow_live
+        self.limiter = limiter
+        self.archive = archive
+        self.poll_interval = poll_interval
+        self.max_polls = max_polls
+        self.client = httpx.AsyncClient(
+            http2=_http2_available(),
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.9"},
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+        )
+
+    def _check_challenge(self, response):
+        text = response.text[:5000].lower() if "html" in response.headers.get("content-type", "") else ""
+        if response.status_code in (403, 429) or any(marker in text for marker in CHALLENGE_MARKERS) \
+                or "/security/check" in str(response.url):
+            raise ChallengeDetected(f"{response.status_code} from {response.url}")
+
+    async def _request(self, method, url, trace, stage, **kwargs):
+        if self.limiter:
+            with trace.span("rate_limit"):
+                await self.limiter.acquire_async(self.base_url)
+        with trace.span(stage) as span:
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TimeoutException:
+                if self.limiter:
+                    self.limiter.record_block(self.base_url, reason="timeout")
+                raise
+            span["status"] = response.status_code
+            try:
+                self._check_challenge(response)
+            except ChallengeDetected:
+                if self.limiter:
+                    self.limiter.record_block(self.base_url, reason=f"challenge ({response.status_code})")
+                raise
+            response.raise_for_status()
+        return response
+
+    async def search(self, origin, destination, date_str, trace=None):
+        """
+        Load the results page for its searchId, then poll until the search completes
+        Rate-limit waits, the page load, each poll and the pauses between polls are spans on trace, if given
+        """
+        trace = trace or TaskTrace(None, origin, destination, date_str)
+        url = build_results_url(origin, destination, date_str, base_url=self.base_url)
+        if not url:
+            raise UnknownAirport(f"No airport code known for {origin} or {destination}")
+
+        page = await self._request("GET", url, trace, "results_page")
+        match = SEARCH_ID_RE.search(page.text)
+        if not match:
+            raise ChallengeDetected(f"No searchId on results page {url}")
+        search_id = match.group(1)
+
+        for _ in range(self.max_polls):
+            response = await self._request(
+                "POST", self.base_url + POLL_PATH, trace, "poll",
+                json={"searchId": search_id, "pageNumber": 1, "sortMode": "bestflight_a"},
+                headers={"Referer": url},
+            )
+            payload = response.json()
+            if payload.get("status") == "complete":
+                break
+            with trace.span("poll_wait"):
+                await asyncio.sleep(self.poll_interval)
+        else:
+            # Partial results are not a clean search; the caller retries
+            raise SearchIncomplete(f"Search {search_id} not complete after {self.max_polls} polls")
+
+        if self.limiter:
+            self.limiter.record_success(self.base_url)
+        if self.archive is not None:
+            self.archive.record_page(url, page.text)
+            self.archive.record_poll(url, response.content)
+        with trace.span("extraction"):
+            return parse_poll_results(payload, origin, destination, date_str)
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+async def scrape_flight_data_async(engine, origin, destination, date_str, max_retries=2, fallback=True,
+                                   browser_slots=None, metrics=None, tracer=None, **browser_kwargs):
+    """
+    HTTP counterpart of farm.scrape_flight_data
+    Falls back to the browser scraper (in a worker thread) when a challenge appears, and uses
+    it from the start for the live host unless engine.allow_live;
+    browser_slots is an optional asyncio.Semaphore bounding concurrent fallbacks;
+    each attempt is counted on metrics, a RunMetrics, and its stages are timed on tracer, a Tracer, if given
+    """
+    async def browser():
+        from farm import scrape_flight_data
+
+        logging.info(f"Falling back to the browser for {origin} to {destination} on {date_str}")
+        async with browser_slots or contextlib.nullcontext():
+            return await asyncio.to_thread(scrape_flight_data, origin, destination, date_str, metrics=metrics,
+                                           tracer=tracer, **{"base_url": engine.base_url, **browser_kwargs})
+
+    if is_live_host(engine.base_url) and not engine.allow_live:
+        logging.warning("HTTP engine is experimental and not used against the live site (allow_live=False)")
+        return await browser() if fallback else []
+
+    trace = TaskTrace(tracer, origin, destination, date_str)
+    for attempt in range(max_retries + 1):
+        if metrics:
+            metrics.record_attempt(origin, destination, date_str)
+        trace.retry = attempt
+        try:
+            flight_data = await engine.search(origin, destination, date_str, trace=trace)
+            logging.info(f"HTTP engine: {len(flight_data)} flights for {origin} to {destination} on {date_str}")
+            return flight_data
+        except ChallengeDetected as e:
+            logging.warning(f"HTTP engine hit a challenge ({e})")
+            if not fallback:
+                return []
+            return await browser()
+        except UnknownAirport as e:
+            logging.error(f"HTTP engine cannot search {origin} to {destination}: {e}")
+            return []
+        except Exception as e:
+            logging.warning(f"HTTP engine error: {e}, attempt {attempt + 1}")
+            if attempt < max_retries:
+                with trace.span("retry_wait"):
+                    await asyncio.sleep(1 + random.uniform(0, 1))
+
+    logging.error(f"HTTP engine failed {origin} to {destination} on {date_str} after {max_retries} retries")
+    return []
+
+
+def scrape_flight_data_http(origin, destination, date_str, max_retries=2, fallback=True,
+                            base_url=KAYAK_BASE_URL, allow_live=False, **browser_kwargs):
+    """Drop-in replacement for farm.scrape_flight_data that avoids launching Chrome (experimental, see POLL_PATH)"""
+    async def run():
+        async with HttpSearchEngine(base_url=base_url, allow_live=allow_live) as engine:
+            return await scrape_flight_data_async(engine, origin, destination, date_str,
+                                                  max_retries=max_retries, fallback=fallback, **browser_kwargs)
+    return asyncio.run(run())
@@ -0,0 +1,71 @@
+import re
+from datetime import date, datetime
+
+KAYAK_BASE_URL = "https://www.kayak.com"
+
+# City names used by the scrapers mapped to the airport/metro code Kayak
+# picks as the first autocomplete suggestion; seeds the airport cache
+AIRPORT_CODES = {
+    "jeddah": "JED",
+    "dubai": "DXB",
+    "riyadh": "RUH",
+    "cairo": "CAI",
+    "istanbul": "IST",
+    "london": "LON",
+    "paris": "PAR",
+    "berlin": "BER",
+    "karachi": "KHI",
+    "lahore": "LHE",
+    "islamabad": "ISB",
+    "rawalpindi": "ISB",
+    "hyderabad": "HDD",
+    "multan": "MUX",
+    "new york": "NYC",
+    "los angeles": "LAX",
+    "chicago": "CHI",
+    "miami": "MIA",
+}
+
+_CODE_RE = re.compile(r"^[A-Z]{3}$")
+
+
+def resolve_airport_code(place, resolver=None):
+    """
+    Return the Kayak airport/metro code for a city name, or None if unknown
+    Looks in the persistent airport cache, which also holds codes learned from earlier runs
+    """
+    place = place.strip()
+    if _CODE_RE.match(place):
+        return place
+    if resolver is None:
+        from airport_cache import default_resolver
+        resolver = default_resolver()
+    return resolver.resolve(place)
+
+
+def parse_travel_date(value):
+    """Accept a date, datetime or the scrapers' "May 14, 2025" strings"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in ("%B %d, %Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised travel date: {value!r}")
+
+
+def build_results_url(origin, destination, travel_date, base_url=KAYAK_BASE_URL, resolver=None):
+    """
+    Build the one-way results URL for a route and date
+    Returns None when either city has no known code so callers can fall back to the search form
+    """
+    origin_code = resolve_airport_code(origin, resolver)
+    destination_code = resolve_airport_code(destination, resolver)
+    if not origin_code or not destination_code:
+        return None
+
+    day = parse_travel_date(travel_date).isoformat()
+    return f"{base_url}/flights/{origin_code}-{destination_code}/{day}?sort=bestflight_a"
@@ -0,0 +1,140 @@
+import json
+import logging
+import time
+
+# URL patterns understood by the CDP Network.setBlockedURLs command
+IMAGE_PATTERNS = ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*", "*.avif*"]
+FONT_PATTERNS = ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"]
+MEDIA_PATTERNS = ["*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*"]
+TRACKER_PATTERNS = [
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*googleadservices.com*",
+    "*facebook.net*",
+    "*connect.facebook.*",
+    "*hotjar.com*",
+    "*criteo.*",
+    "*adnxs.com*",
+    "*taboola.com*",
+    "*bing.com/bat*",
+    "*/ads/*",
+]
+
+
+class LeanProfile:
+    """
+    Browser profile that keeps page weight down for price extraction
+
+    Images are disabled through Chrome content settings; fonts, media, ads,
+    analytics and any extra URL patterns are blocked over CDP once the driver
+    is up. With measure=True the driver records performance logs so
+    measure_page() can report what each page actually transferred.
+    """
+
+    def __init__(self, block_images=True, block_fonts=True, block_media=True,
+                 block_trackers=True, extra_patterns=None, measure=False):
+        self.block_images = block_images
+        self.block_fonts = block_fonts
+        self.block_media = block_media
+        self.block_trackers = block_trackers
+        self.extra_patterns = list(extra_patterns or [])
+        self.measure = measure
+
+    @property
+    def blocked_patterns(self):
+        patterns = []
+        if self.block_images:
+            patterns += IMAGE_PATTERNS
+        if self.block_fonts:
+            patterns += FONT_PATTERNS
+        if self.block_media:
+            patterns += MEDIA_PATTERNS
+        if self.block_trackers:
+            patterns += TRACKER_PATTERNS
+        return patterns + self.extra_patterns
+
+    @property
+    def prefs(self):
+        prefs = {}
+        if self.block_images:
+            prefs["profile.managed_default_content_settings.images"] = 2
+        if self.block_media:
+            prefs["profile.managed_default_content_settings.media_stream"] = 2
+            prefs["profile.default_content_setting_values.autoplay"] = 2
+        return prefs
+
+    def apply_options(self, chrome_options):
+        """Options-time settings: call before the driver is created"""
+        if self.block_images:
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        if self.measure:
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    def apply_driver(self, driver):
+        """Session-time settings: install the CDP URL block list"""
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_patterns})
+        logging.info(f"Lean profile active: blocking {len(self.blocked_patterns)} URL patterns")
+
+
+def measure_page(driver):
+    """
+    Summarise network traffic since the last call from the performance log
+    Requires a driver started with a measuring LeanProfile
+    """
+    requests = set()
+    blocked = set()
+    encoded_bytes = 0
+
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        method = message.get("method")
+        params = message.get("params", {})
+        if method == "Network.requestWillBeSent":
+            requests.add(params.get("requestId"))
+        elif method == "Network.loadingFinished":
+            encoded_bytes += params.get("encodedDataLength", 0)
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            blocked.add(params.get("requestId"))
+
+    return {
+        "requests": len(requests - blocked),
+        "bytes": int(encoded_bytes),
+        "blocked_requests": len(blocked),
+    }
+
+
+def compare_page_weight(url, driver_factory, profile=None, settle_seconds=5):
+    """
+    Load the same page with a full and a lean browser and report what the lean profile saves
+    driver_factory(lean=...) must return a driver, e.g. farm.setup_driver
+    """
+    profile = profile or LeanProfile()
+    full_profile = LeanProfile(block_images=False, block_fonts=False, block_media=False,
+                               block_trackers=False, measure=True)
+    lean_profile = LeanProfile(profile.block_images, profile.block_fonts, profile.block_media,
+                               profile.block_trackers, profile.extra_patterns, measure=True)
+
+    weights = {}
+    for label, lean in (("full", full_profile), ("lean", lean_profile)):
+        driver = driver_factory(lean=lean)
+        try:
+            driver.get(url)
+            time.sleep(settle_seconds)  # Let late XHRs and lazy assets land
+            weights[label] = measure_page(driver)
+        finally:
+            driver.quit()
+
+    full, lean = weights["full"], weights["lean"]
+    report = {
+        "url": url,
+        "full": full,
+        "lean": lean,
+        "requests_saved": full["requests"] - lean["requests"],
+        "bytes_saved": full["bytes"] - lean["bytes"],
+    }
+    logging.info(f"Lean profile saved {report['requests_saved']} requests and "
+                 f"{report['bytes_saved'] / 1024:.0f} KiB on {url}")
+    return report
@@ -1,38 +1,43 @@
 import time
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-# from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException
 from datetime import datetime
 import json
 from datetime import datetime
 
-def scrape_kayak_flights(origin, destination):
-    date = datetime.now()  # Current date and time
-    formatted_day = str(date.day)
-    formatted_date = date.strftime("%B") + f" {formatted_day}, {date.year}"
-    
+from kayak_urls import KAYAK_BASE_URL, build_results_url
+from airport_cache import default_resolver
+from extraction import extract_result_cards, MAIN_FIELDS
+from tracing import TaskTrace
+from browser_startup import chrome_service
 
+def create_driver(headless=True):
     # Configure Chrome options
     chrome_options = Options()
     chrome_options.add_experimental_option("prefs", {
         "profile.default_content_setting_values.popups": 0,
         "profile.default_content_setting_values.notifications": 2
     })
-    # chrome_options.add_argument("--headless=new") 
-
-    driver = webdriver.Chrome(options=chrome_options)
-    driver.get("https://www.kayak.com/")
-
-    flight_data = []
-    
-    try:
-        original_window = driver.current_window_handle
-
-        # Select one-way
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--window-size=1920,1080")
+
+    # Cached chromedriver/Chrome paths skip the Selenium Manager lookup on every launch
+    return webdriver.Chrome(options=chrome_options, service=chrome_service(chrome_options))
+
+def search_via_form(driver, origin, destination, formatted_date, trace=None):
+    # Drive the homepage form and switch to the results tab, timing each step on trace if given
+    trace = trace or TaskTrace(None, origin, destination, formatted_date)
+    with trace.span("homepage_load"):
+        driver.get("https://www.kayak.com/")
+    original_window = driver.current_window_handle
+
+    # Select one-way
+    with trace.span("trip_type"):
         dropdown = WebDriverWait(driver, 10).until(
             EC.element_to_be_clickable((By.CLASS_NAME, "Uqct-title")))
         dropdown.click()
@@ -47,7 +52,8 @@ def scrape_kayak_flights(origin, destination):
             EC.element_to_be_clickable((By.XPATH, '//div[@aria-label="Remove value"]')))
         clear_btn.click()
 
-        # Origin
+    # Origin
+    with trace.span("autocomplete_origin"):
         origin_input = WebDriverWait(driver, 10).until(
             EC.element_to_be_clickable((By.XPATH, '//input[@aria-label="Flight origin input"]')))
         origin_input.send_keys(origin)
@@ -58,7 +64,8 @@ def scrape_kayak_flights(origin, destination):
         if li_elements:
             li_elements[0].click()
 
-        # Destination
+    # Destination
+    with trace.span("autocomplete_destination"):
         destination_input = WebDriverWait(driver, 10).until(
             EC.element_to_be_clickable((By.XPATH, '//input[@aria-label="Flight destination input"]')))
         destination_input.send_keys(destination)
@@ -69,18 +76,21 @@ def scrape_kayak_flights(origin, destination):
         if li_elements:
             li_elements[0].click()
 
-        # Select Date
+    # Select Date
+    with trace.span("date_picker"):
         depart_date = WebDriverWait(driver, 15).until(
             EC.element_to_be_clickable((By.XPATH, f'//div[@role="button" and contains(@aria-label, "{formatted_date}")]')))
         depart_date.click()
-        
+    
 
-        # Click search
+    # Click search
+    with trace.span("search_click"):
         button = WebDriverWait(driver, 10).until(
             EC.element_to_be_clickable((By.XPATH, '//button[@aria-label="Search"]')))
         button.click()
 
-        # Wait for possible tab switch
+    # Wait for possible tab switch
+    with trace.span("tab_switch") as span:
         print("🪟 Waiting for new tab or popup to open...")
         initial_windows = driver.window_handles
 
@@ -88,6 +98,7 @@ def scrape_kayak_flights(origin, destination):
             WebDriverWait(driver, 10).until(lambda d: len(d.window_handles) > len(initial_windows))
             print("✅ New window opened.")
         except:
+            span["new_window"] = False
             print("⚠️ No new window opened — continuing in same tab.")
         time.sleep(2)  # Adjust this time (in seconds) to wait a little longer
 
@@ -112,51 +123,118 @@ def scrape_kayak_flights(origin, destination):
         else:
             print("⚠️ No Kayak tab found — falling back to original.")
             driver.switch_to.window(original_window)
-        # Extract results
-        all_results = WebDriverWait(driver, 120).until(
-            EC.presence_of_all_elements_located((By.XPATH, '//div[@class="Fxw9-result-item-container"]'))
-        )
 
-        for result in all_results:
-            try:
-                timeFlighttag = result.find_element(By.XPATH, './/div[@class="vmXl vmXl-mod-variant-large"]')
-                timeFlight = timeFlighttag.find_element(By.TAG_NAME, 'span')
-                price = result.find_element(By.XPATH, './/div[@class="e2GB-price-text"]')
+def scrape_kayak_flights(origin, destination, pool=None, deep_link=True, cache=None, flight_store=None,
+                         base_url=KAYAK_BASE_URL, archive=None, tracer=None):
+    date = datetime.now()  # Current date and time
+    formatted_day = str(date.day)
+    formatted_date = date.strftime("%B") + f" {formatted_day}, {date.year}"
+    
+    # A recent enough scrape of the same route and date skips the browser entirely
+    if cache:
+        cached = cache.get(origin, destination, formatted_date)
+        if cached is not None:
+            print(f"♻️ Using cached results for {origin} → {destination} ({len(cached)} flights)")
+            return cached
+    
+    # Time each stage of the scrape when a tracing.Tracer is given
+    trace = TaskTrace(tracer, origin, destination, formatted_date)
+
+    # Borrow a browser from the shared pool when one is given
+    with trace.span("driver", pooled=pool is not None):
+        driver = pool.checkout() if pool else create_driver()
 
+    flight_data = []
+    
+    try:
+        # Deep link straight to the results page, the form is the fallback
+        results_url = build_results_url(origin, destination, formatted_date, base_url=base_url) if deep_link else None
+        if results_url:
+            print(f"🔗 Opening results page directly: {results_url}")
+            with trace.span("deep_link_load"):
+                driver.get(results_url)
+        else:
+            search_via_form(driver, origin, destination, formatted_date, trace=trace)
+            default_resolver().learn_from_url(origin, destination, driver.current_url)
+
+        # Extract results
+        results_locator = (By.XPATH, '//div[@class="Fxw9-result-item-container"]')
+        try:
+            with trace.span("results_wait"):
+                WebDriverWait(driver, 120).until(
+                    EC.presence_of_all_elements_located(results_locator)
+                )
+        except TimeoutException:
+            if not results_url:
+                raise
+            print("⚠️ Deep link showed no results — falling back to the search form.")
+            trace.retry = 1
+            search_via_form(driver, origin, destination, formatted_date, trace=trace)
+            default_resolver().learn_from_url(origin, destination, driver.current_url)
+            with trace.span("results_wait"):
+                WebDriverWait(driver, 120).until(
+                    EC.presence_of_all_elements_located(results_locator)
+                )
+
+        # Keep the rendered page so extraction changes can be replayed offline
+        if archive is not None:
+            with trace.span("archive"):
+                archive.record_page(driver.current_url, driver.page_source, strip_scripts=True)
+
+        with trace.span("extraction") as span:
+            # One execute_script call for all cards; cards missing a field are skipped
+            cards, misses = extract_result_cards(driver, MAIN_FIELDS)
+            if any(misses.values()):
+                print(f"⚠️ Cards with missing fields: {misses}")
+
+            for card in cards:
+                if card["departure_time"] is None or card["price"] is None:
+                    continue
                 flight_data.append({
                     "Origin":origin,
                     "Destination":destination,
-                    "departure_time": timeFlight.text,
-                    "price": price.text,
+                    "departure_time": card["departure_time"],
+                    "price": card["price"],
                     "date":formatted_date
                 })
-
-            except Exception:
-                continue
+            span["records"] = len(flight_data)
 
     except Exception as e:
         print("Error occurred:", e)
 
     finally:
-        driver.quit()
+        with trace.span("driver_release"):
+            if pool:
+                pool.checkin(driver, broken=not pool.is_healthy(driver))
+            else:
+                driver.quit()
+
+    # Append to the flight store or sink (Parquet, MongoDB) instead of writing another numbered JSON file
+    if flight_store is not None:
+        flight_store.write(flight_data)
+        print(f"✅ {len(flight_data)} flights handed to {type(flight_store).__name__}")
+        if cache:
+            cache.put(origin, destination, formatted_date, flight_data)
+        return flight_data
 
     import json
     import os
+    import re
 
     # Define the folder and filename
     folder_name = "kayak_flights_data_EU"
     base_name = "kayak_flights_EU"
     ext = ".json"
-    counter = 1
 
     # Create the folder if it doesn't exist
     if not os.path.exists(folder_name):
         os.makedirs(folder_name)
         print(f"✅ Folder '{folder_name}' created.")
 
-    # Find an available filename
-    while os.path.exists(f"{folder_name}/{base_name}_{counter}{ext}"):
-        counter += 1
+    # Find an available filename: one directory listing instead of probing each counter
+    pattern = re.compile(rf"^{re.escape(base_name)}_(\d+){re.escape(ext)}$")
+    taken = [int(m.group(1)) for m in map(pattern.match, os.listdir(folder_name)) if m]
+    counter = max(taken, default=0) + 1
 
     filename = f"{folder_name}/{base_name}_{counter}{ext}"
 
@@ -166,4 +244,7 @@ def scrape_kayak_flights(origin, destination):
 
     print(f"✅ Flight data saved to {filename}")
 
+    if cache:
+        cache.put(origin, destination, formatted_date, flight_data)
+
     return flight_data
\ No newline at end of file
@@ -0,0 +1,143 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+# Fields that identify one fare; rows equal on all of them are true duplicates
+RECORD_IDENTITY = ("origin", "destination", "date", "time", "airline", "price", "duration", "stops")
+
+
+def task_key(task):
+    """(origin, destination, date) for a task dict or an (origin, destination[, date]) tuple"""
+    if isinstance(task, dict):
+        return task["origin"], task["destination"], task.get("date")
+    origin, destination, *rest = task
+    return origin, destination, rest[0] if rest else None
+
+
+def record_identity(record):
+    """Identity of a scraped row across the farm's and main.py's field names"""
+    values = {
+        "origin": record.get("origin") or record.get("Origin"),
+        "destination": record.get("destination") or record.get("Destination"),
+        "time": record.get("time") or record.get("departure_time"),
+    }
+    return tuple(str(values.get(field, record.get(field)) or "").strip().lower() for field in RECORD_IDENTITY)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile, None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+class RunMetrics:
+    """
+    Throughput and coverage for one strategy run
+
+    Scrapers call record_attempt() for every page load (so retries are
+    counted) and the farm calls record() once per finished task with its
+    records and wall time. report() turns that into rates against the
+    planned task set, whatever the route list is. Safe to share between
+    threads.
+    """
+
+    def __init__(self, label, planned=None):
+        self.label = label
+        self.planned = {task_key(task) for task in planned or []}
+        self.started = time.perf_counter()
+        self.finished = None
+        self._lock = threading.Lock()
+        self._attempts = {}
+        self._tasks = []
+        self._identities = set()
+        self._records = 0
+
+    def record_attempt(self, origin, destination, date=None):
+        with self._lock:
+            key = (origin, destination, date)
+            self._attempts[key] = self._attempts.get(key, 0) + 1
+
+    def record(self, task, records, seconds, error=None, attempts=None):
+        """One finished task; attempts is for scrapers that ran elsewhere and could not call record_attempt"""
+        key = task_key(task)
+        identities = [record_identity(r) for r in records or []]
+        with self._lock:
+            if attempts:
+                self._attempts[key] = self._attempts.get(key, 0) + attempts
+            self._tasks.append({"key": key, "ok": bool(records) and error is None, "seconds": seconds,
+                                "records": len(identities), "error": error})
+            self._records += len(identities)
+            self._identities.update(identities)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+        return self
+
+    def report(self):
+        with self._lock:
+            tasks = list(self._tasks)
+            attempts = dict(self._attempts)
+            records, unique = self._records, len(self._identities)
+        wall = (self.finished or time.perf_counter()) - self.started
+        minutes = wall / 60 if wall else None
+
+        ok_keys = {t["key"] for t in tasks if t["ok"]}
+        done = len(tasks)
+        succeeded = sum(1 for t in tasks if t["ok"])
+        task_attempts = [attempts.get(t["key"], 0) for t in tasks]
+        pages = sum(attempts.values())
+        latencies = [t["seconds"] for t in tasks]
+        planned = self.planned or {t["key"] for t in tasks}
+
+        return {
+            "label": self.label,
+            "wall_seconds": round(wall, 3),
+            "tasks_planned": len(planned),
+            "tasks_done": done,
+            "tasks_per_minute": round(done / minutes, 2) if minutes else None,
+            "pages": pages,
+            "pages_per_minute": round(pages / minutes, 2) if minutes and attempts else None,
+            "records": records,
+            "records_per_second": round(records / wall, 2) if wall else None,
+            "success_rate": round(succeeded / done, 3) if done else None,
+            "failure_rate": round((done - succeeded) / done, 3) if done else None,
+            # Only tasks whose scraper reported its attempts count towards retries
+            "retry_rate": (round(sum(1 for a in task_attempts if a > 1) / len([a for a in task_attempts if a]), 3)
+                           if any(task_attempts) else None),
+            "latency_seconds": {f"p{p}": (round(percentile(latencies, p), 3) if latencies else None)
+                                for p in (50, 90, 95, 99)},
+            "duplicate_rate": round((records - unique) / records, 3) if records else 0.0,
+            "duplicate_tasks": done - len({t["key"] for t in tasks}),
+            "coverage": round(len(ok_keys & planned) / len(planned), 3) if planned else None,
+            "missing_tasks": sorted(" ".join(str(part) for part in key if part) for key in planned - ok_keys),
+        }
+
+
+def format_report(report):
+    latency = report["latency_seconds"]
+    lines = [
+        f"=== {report['label']} ===",
+        f"Tasks: {report['tasks_done']}/{report['tasks_planned']} done, coverage {report['coverage']}, "
+        f"success {report['success_rate']}, retries {report['retry_rate']}",
+        f"Throughput: {report['tasks_per_minute']} tasks/min, {report['pages_per_minute']} pages/min, "
+        f"{report['records_per_second']} records/s",
+        f"Latency: p50 {latency['p50']}s, p95 {latency['p95']}s, p99 {latency['p99']}s",
+        f"Duplicates: {report['duplicate_rate']:.1%} of {report['records']} records, "
+        f"{report['duplicate_tasks']} repeated tasks",
+    ]
+    return "\n".join(lines)
+
+
+def save_report(report, path="data/metrics.jsonl"):
+    """Append one run's report as a JSON line"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report) + "\n")
+    logging.info(f"Metrics for {report['label']} appended to {path}")
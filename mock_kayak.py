@@ -0,0 +1,251 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESULTS_PATH_RE = re.compile(r"^/flights/([A-Z]{3})-([A-Z]{3})/(\d{4}-\d{2}-\d{2})")
+POLL_PATH = "/i/api/search/dynamic/flights/poll"
+SEARCH_ID_RE = re.compile(r'"searchId"\s*:\s*"([^"]+)"')
+
+AIRLINES = ["PIA", "airblue", "Emirates", "Saudia", "flydubai", "Turkish Airlines", "British Airways", "Air France"]
+
+
+def synthetic_results(origin_code, destination_code, day, count=12):
+    """Deterministic fake results for a route and date"""
+    seed = int(hashlib.sha256(f"{origin_code}-{destination_code}-{day}".encode()).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    start = datetime.fromisoformat(day)
+    results = []
+    for i in range(count):
+        departure = start + timedelta(minutes=rng.randrange(0, 24 * 60, 5))
+        duration = rng.randrange(60, 600, 5)
+        stops = rng.choice([0, 0, 1, 1, 2])
+        results.append({
+            "resultId": f"{seed:x}-{i}",
+            "price": rng.randrange(60, 900),
+            "currency": "USD",
+            "legs": [{
+                "departure": departure.isoformat(),
+                "arrival": (departure + timedelta(minutes=duration)).isoformat(),
+                "duration": duration,
+                "stops": stops,
+                "airline": rng.choice(AIRLINES),
+            }],
+        })
+    return results
+
+
+def render_results_html(search_id, results):
+    """Results page markup using the same classes the browser extractors look for"""
+    cards = []
+    for result in results:
+        leg = result["legs"][0]
+        departure = datetime.fromisoformat(leg["departure"]).strftime("%I:%M %p").lstrip("0").lower()
+        arrival = datetime.fromisoformat(leg["arrival"]).strftime("%I:%M %p").lstrip("0").lower()
+        stops = "nonstop" if leg["stops"] == 0 else f"{leg['stops']} stop" + ("s" if leg["stops"] > 1 else "")
+        cards.append(
+            '<div class="Fxw9-result-item-container">'
+            f'<div class="vmXl vmXl-mod-variant-large"><span>{departure} – {arrival}</span></div>'
+            f'<div class="c_cgF">{leg["airline"]}</div>'
+            f'<div class="JWEO-stops-text stops">{stops}</div>'
+            f'<div class="xdW8-duration">{leg["duration"] // 60}h {leg["duration"] % 60}m</div>'
+            f'<div class="e2GB-price-text">${result["price"]}</div>'
+            '</div>'
+        )
+    return (
+        "<!DOCTYPE html><html><head><title>Flights</title>"
+        f'<script>window.R9 = {{"searchId":"{search_id}"}};</script></head>'
+        f'<body><div class="results">{"".join(cards)}</div></body></html>'
+    )
+
+
+class MockKayakServer:
+    """
+    Local stand-in for the Kayak results page and its polling API
+
+    Recorded poll responses are served from recordings_dir (one
+    <ORIG>-<DEST>_<YYYY-MM-DD>.json per search); anything not recorded gets
+    deterministic synthetic results, so the HTTP engine and the deep-link
+    browser flow can run without touching the live site.
+
+    recordings_dir: directory of recorded poll payloads, optional
+    challenge_routes: set of "ORIG-DEST" strings that get a captcha page instead
+    latency/jitter: seconds added to every response (jitter is spread deterministically)
+    failure_rate: fraction of results-page loads answered with a 503
+    archive: PageArchive whose recorded pages and poll payloads are replayed
+        ahead of recordings_dir and synthetic results
+
+    Injected latency and failures depend only on the seed, the URL and how
+    many times that URL has been requested, not on request interleaving, so
+    every concurrency strategy in a benchmark sees exactly the same faults.
+    """
+
+    def __init__(self, recordings_dir=None, host="127.0.0.1", port=0, challenge_routes=None,
+                 latency=0.0, jitter=0.0, failure_rate=0.0, seed=0, archive=None):
+        self.recordings_dir = recordings_dir
+        self.archive = archive
+        self.challenge_routes = set(challenge_routes or [])
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self._attempts = {}
+        self._searches = {}
+        self._search_paths = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self):
+        """Forget searches and per-URL attempt counts, e.g. between benchmark trials"""
+        with self._lock:
+            self._attempts.clear()
+            self._searches.clear()
+            self._search_paths.clear()
+
+    def _fault(self, key):
+        """(delay, fail) for the next request to key, reproducible across runs"""
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        digest = hashlib.sha256(f"{self.seed}|{key}|{attempt}".encode()).digest()
+        draw_delay = int.from_bytes(digest[:4], "big") / 2 ** 32
+        draw_fail = int.from_bytes(digest[4:8], "big") / 2 ** 32
+        return self.latency + self.jitter * draw_delay, draw_fail < self.failure_rate
+
+    def load_results(self, origin_code, destination_code, day):
+        """Recorded payload for a search if there is one, otherwise synthetic results"""
+        if self.recordings_dir:
+            path = os.path.join(self.recordings_dir, f"{origin_code}-{destination_code}_{day}.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    return json.load(f).get("results", [])
+        return synthetic_results(origin_code, destination_code, day)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+
+            def log_message(self, format, *args):
+                logging.debug("mock_kayak: " + format % args)
+
+            def _send(self, status, body, content_type):
+                data = body.encode("utf-8") if isinstance(body, str) else body
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                match = RESULTS_PATH_RE.match(self.path)
+                if not match:
+                    self._send(404, "not found", "text/plain")
+                    return
+                origin_code, destination_code, day = match.groups()
+                delay, fail = server._fault(self.path.split("?")[0])
+                if delay:
+                    time.sleep(delay)
+                if fail:
+                    self._send(503, "<html><body>Service unavailable</body></html>", "text/html")
+                    return
+                if f"{origin_code}-{destination_code}" in server.challenge_routes:
+                    self._send(403, "<html><body><div id='px-captcha'>Please verify you are a human</div></body></html>",
+                               "text/html")
+                    return
+                if server.archive is not None:
+                    path = self.path.split("?")[0].rstrip("/")
+                    recorded = server.archive.get(f"page:{path}")
+                    if recorded is not None:
+                        status, content_type, body = recorded
+                        # Polls for the recorded searchId are answered from the archive too
+                        match = SEARCH_ID_RE.search(body.decode("utf-8", "replace"))
+                        if match:
+                            with server._lock:
+                                server._search_paths[match.group(1)] = path
+                        self._send(status, body, content_type)
+                        return
+                results = server.load_results(origin_code, destination_code, day)
+                search_id = uuid.uuid4().hex
+                with server._lock:
+                    server._searches[search_id] = results
+                    server._search_paths[search_id] = self.path.split("?")[0]
+                self._send(200, render_results_html(search_id, results), "text/html; charset=utf-8")
+
+            def do_POST(self):
+                if self.path.split("?")[0] != POLL_PATH:
+                    self._send(404, "not found", "text/plain")
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    search_path = server._search_paths.get(request.get("searchId"))
+                delay, _ = server._fault(f"poll|{search_path}")
+                if delay:
+                    time.sleep(delay)
+                with server._lock:
+                    results = server._searches.get(request.get("searchId"))
+                if server.archive is not None and search_path:
+                    recorded = server.archive.get(f"poll:{search_path}")
+                    if recorded is not None:
+                        self._send(recorded[0], recorded[2], recorded[1])
+                        return
+                if results is None:
+                    self._send(404, json.dumps({"error": "unknown searchId"}), "application/json")
+                    return
+                payload = {"searchId": request["searchId"], "status": "complete", "results": results}
+                self._send(200, json.dumps(payload), "application/json")
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logging.info(f"Mock Kayak server listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for Kayak")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--recordings", help="Directory of recorded poll payloads")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of page loads that get a 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = MockKayakServer(recordings_dir=args.recordings, port=args.port, latency=args.latency,
+                             jitter=args.jitter, failure_rate=args.failure_rate, seed=args.seed)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
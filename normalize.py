@@ -0,0 +1,159 @@
+import glob
+import json
+import logging
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# Price prefixes/suffixes the scrapers see, mapped to ISO codes
+CURRENCY_CODES = {"$": "USD", "US$": "USD", "€": "EUR", "£": "GBP", "Rs": "PKR", "PKR": "PKR",
+                  "SAR": "SAR", "AED": "AED", "USD": "USD", "EUR": "EUR", "GBP": "GBP"}
+
+_PRICE_RE = r"^\s*(?P<prefix>[^\d\s.,]*)\s*(?P<amount>\d[\d,]*(?:\.\d+)?)\s*(?P<suffix>[A-Za-z]{3})?\s*$"
+_CLOCK_RE = r"(?P<hour>\d{1,2}):(?P<minute>\d{2})\s*(?P<meridiem>[ap]m)?"
+_DURATION_RE = r"^\s*(?:(?P<hours>\d+)\s*h)?\s*(?:(?P<minutes>\d+)\s*m)?\s*$"
+_STOPS_RE = r"(?P<stops>\d+)\s*stops?"
+
+
+def _column(frame, *names):
+    """
+    Per row, the first of `names` that has a value
+    The farm and main.py use different keys, and a mixed archive frame has both columns half-empty
+    """
+    merged = None
+    for name in names:
+        if name in frame:
+            values = frame[name].astype("string")
+            merged = values if merged is None else merged.combine_first(values)
+    if merged is None:
+        return pd.Series(pd.NA, index=frame.index, dtype="string")
+    return merged
+
+
+def _parse_unique(values, parse):
+    """
+    Run a column parser over the distinct strings only and broadcast back by code
+    Scraped columns repeat heavily (a few hundred prices/times across a whole archive)
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = parse(pd.Series(uniques, dtype="string"))
+    arrays = parsed if isinstance(parsed, tuple) else (parsed,)
+    taken = tuple(pd.array(array).take(codes, allow_fill=True) for array in arrays)
+    return taken if isinstance(parsed, tuple) else taken[0]
+
+
+def parse_prices(values):
+    """Price strings -> (integer minor units, ISO currency); sentinels become <NA>"""
+    parts = values.str.extract(_PRICE_RE)
+    amount = pd.to_numeric(parts["amount"].str.replace(",", "", regex=False), errors="coerce")
+    minor = np.round(amount.to_numpy(dtype="float64", na_value=np.nan) * 100)
+    symbol = parts["prefix"].where(parts["prefix"].fillna("") != "", parts["suffix"])
+    currency = symbol.map(CURRENCY_CODES, na_action="ignore").astype("string")
+    return pd.array(minor, dtype="Int64"), currency.where(~np.isnan(minor))
+
+
+def parse_clock_minutes(values):
+    """"11:00 pm" or "23:00" (or "8:50 pm – 11:20 pm", taking the departure) -> minutes since midnight"""
+    parts = values.str.extract(_CLOCK_RE)
+    hour = pd.to_numeric(parts["hour"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    minute = pd.to_numeric(parts["minute"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    meridiem = parts["meridiem"].str.lower().to_numpy(dtype=object, na_value="")
+    hour = np.where(meridiem == "am", hour % 12, hour)
+    hour = np.where(meridiem == "pm", hour % 12 + 12, hour)
+    minutes = hour * 60 + minute
+    minutes[(minutes < 0) | (minutes >= 24 * 60)] = np.nan
+    return pd.array(minutes, dtype="Int16")
+
+
+def parse_duration_minutes(values):
+    """"5h 20m" / "45m" / "2h" -> total minutes"""
+    parts = values.str.extract(_DURATION_RE)
+    hours = pd.to_numeric(parts["hours"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    minutes = pd.to_numeric(parts["minutes"], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    total = np.nan_to_num(hours) * 60 + np.nan_to_num(minutes)
+    total[np.isnan(hours) & np.isnan(minutes)] = np.nan
+    return pd.array(total, dtype="Int32")
+
+
+def parse_stops(values):
+    """"nonstop" -> 0, "2 stops" -> 2"""
+    counts = pd.to_numeric(values.str.extract(_STOPS_RE, flags=re.IGNORECASE)["stops"], errors="coerce")
+    counts = counts.to_numpy(dtype="float64", na_value=np.nan)
+    counts[values.str.contains("nonstop|non-stop|direct", case=False, regex=True).fillna(False).to_numpy()] = 0
+    return pd.array(counts, dtype="Int8")
+
+
+def normalize_flights(records):
+    """
+    Parse a whole result set into typed columns in one vectorized pass
+
+    Accepts a list of flight records (either scraper's schema) or a DataFrame
+    of them. Unparseable values and sentinels such as "Price not available"
+    become <NA>; the *_missing columns are the matching null masks.
+    """
+    frame = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(list(records))
+    if frame.empty:
+        frame = pd.DataFrame(index=pd.RangeIndex(0))
+
+    price_minor, currency = _parse_unique(_column(frame, "price"), parse_prices)
+    normalized = pd.DataFrame({
+        "origin": _column(frame, "origin", "Origin"),
+        "destination": _column(frame, "destination", "Destination"),
+        "travel_date": pd.to_datetime(_column(frame, "date", "travel_date"), format="mixed", errors="coerce"),
+        "scrape_time": pd.to_datetime(_column(frame, "scrape_time"), errors="coerce"),
+        "airline": _column(frame, "airline"),
+        "price_minor": price_minor,
+        "currency": currency,
+        "departure_minutes": _parse_unique(_column(frame, "departure_time", "time"), parse_clock_minutes),
+        "duration_minutes": _parse_unique(_column(frame, "duration"), parse_duration_minutes),
+        "stops": _parse_unique(_column(frame, "stops"), parse_stops),
+    }, index=frame.index)
+    for column in ("price_minor", "departure_minutes", "duration_minutes", "stops"):
+        normalized[f"{column}_missing"] = normalized[column].isna()
+    return normalized
+
+
+def load_archives(directories):
+    """Read the legacy kayak_flights_data* JSON files into one raw DataFrame"""
+    frames = []
+    for directory in directories:
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            with open(path, encoding="utf-8") as f:
+                records = json.load(f)
+            if records:
+                frame = pd.DataFrame.from_records(records)
+                frame["source_file"] = path
+                frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def normalize_archives(directories):
+    raw = load_archives(directories)
+    normalized = normalize_flights(raw)
+    if "source_file" in raw:
+        normalized["source_file"] = raw["source_file"]
+    logging.info(f"Normalized {len(normalized)} records from {len(directories)} directories")
+    return normalized
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parse archived flight records into typed columns")
+    parser.add_argument("directories", nargs="+", help="e.g. kayak_flights_data kayak_flights_data_EU")
+    parser.add_argument("--out", help="Write the typed table to this .parquet or .csv file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    table = normalize_archives(args.directories)
+    missing = {c: int(table[c].sum()) for c in table.columns if c.endswith("_missing")}
+    print(table.head(10).to_string())
+    print(f"{len(table)} rows, missing values: {missing}")
+    if args.out:
+        if args.out.endswith(".csv"):
+            table.to_csv(args.out, index=False)
+        else:
+            table.to_parquet(args.out, index=False)
+        print(f"Saved to {args.out}")
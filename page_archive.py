@@ -0,0 +1,196 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+_SCRIPT_RE = re.compile(r"<script\b[^>]*>.*?</script>", re.IGNORECASE | re.DOTALL)
+
+
+def page_key(url):
+    """Archive key for a results page: its path, so any host (live, mock, replay) maps to the same entry"""
+    return urlsplit(url).path.rstrip("/")
+
+
+class PageArchive:
+    """
+    Compressed, content-addressed store of fetched results pages and poll payloads
+
+    Bodies are gzipped into objects/<sha256[:2]>/<sha256[2:]>.gz, so a page
+    seen many times is stored once. index.jsonl maps keys to bodies and is
+    append-only (the last line for a key wins), which keeps recording from
+    several workers or processes safe. Keys are "page:<path>" for results
+    pages and "poll:<path>" for the poll payload of the search that page
+    started.
+    """
+
+    def __init__(self, root="data/pages"):
+        self.root = root
+        self.index_path = os.path.join(root, "index.jsonl")
+        self._lock = threading.Lock()
+        self._index = {}
+        self._bodies = {}
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.reload()
+
+    def reload(self):
+        """Re-read the index, picking up entries other processes recorded"""
+        index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        index[entry["key"]] = entry
+        with self._lock:
+            self._index = index
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest[2:] + ".gz")
+
+    def put(self, key, body, content_type, url=None, status=200):
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(gzip.compress(data, compresslevel=6))
+            os.replace(tmp_path, path)
+
+        entry = {"key": key, "sha256": digest, "content_type": content_type, "status": status,
+                 "url": url, "bytes": len(data), "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        with self._lock:
+            self._index[key] = entry
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        return digest
+
+    def record_page(self, url, html, strip_scripts=False):
+        """
+        Store a results page; strip_scripts is for a browser's rendered DOM,
+        whose scripts would otherwise re-run and redraw the page on replay
+        """
+        if strip_scripts:
+            html = _SCRIPT_RE.sub("", html)
+        return self.put(f"page:{page_key(url)}", html, "text/html; charset=utf-8", url=url)
+
+    def record_poll(self, page_url, payload):
+        body = payload if isinstance(payload, (str, bytes)) else json.dumps(payload)
+        return self.put(f"poll:{page_key(page_url)}", body, "application/json", url=page_url)
+
+    def get(self, key):
+        """(status, content_type, body bytes) for a key, or None; bodies stay cached in memory"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            body = self._bodies.get(entry["sha256"])
+        if body is None:
+            with open(self._object_path(entry["sha256"]), "rb") as f:
+                body = gzip.decompress(f.read())
+            with self._lock:
+                self._bodies[entry["sha256"]] = body
+        return entry["status"], entry["content_type"], body
+
+    def keys(self, prefix=""):
+        with self._lock:
+            return sorted(key for key in self._index if key.startswith(prefix))
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._index.values())
+        stored = sum(os.path.getsize(self._object_path(d)) for d in {e["sha256"] for e in entries})
+        return {"entries": len(entries), "objects": len({e["sha256"] for e in entries}),
+                "raw_bytes": sum(e["bytes"] for e in entries), "stored_bytes": stored}
+
+
+def replay_extraction(archive, fields=None, repeat=1):
+    """
+    Push every archived results page through the browserless extractor
+    Returns pages, cards, per-field misses and pages per minute (decompression excluded)
+    """
+    from extraction import FARM_FIELDS, extract_result_cards_html
+
+    fields = fields or FARM_FIELDS
+    pages = [archive.get(key)[2] for key in archive.keys("page:")]
+    cards = 0
+    misses = {name: 0 for name in fields}
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            records, missed = extract_result_cards_html(html, fields)
+            cards += len(records)
+            for name, count in missed.items():
+                misses[name] += count
+    elapsed = time.perf_counter() - started
+    processed = len(pages) * repeat
+    return {"pages": processed, "cards": cards, "misses": misses, "seconds": round(elapsed, 3),
+            "pages_per_minute": round(processed / elapsed * 60) if elapsed else None}
+
+
+def record_searches(archive, tasks, base_url, concurrency=10):
+    """Record results pages and poll payloads for route-date tasks with the HTTP engine"""
+    import asyncio
+    from http_engine import HttpSearchEngine, scrape_flight_data_async
+
+    async def run():
+        async with HttpSearchEngine(base_url=base_url, max_connections=concurrency, archive=archive) as engine:
+            slots = asyncio.Semaphore(concurrency)
+
+            async def one(task):
+                async with slots:
+                    return await scrape_flight_data_async(engine, task["origin"], task["destination"],
+                                                          task["date"], fallback=False)
+            return await asyncio.gather(*(one(task) for task in tasks))
+
+    results = asyncio.run(run())
+    logging.info(f"Recorded {sum(1 for r in results if r)}/{len(tasks)} searches into {archive.root}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Record and replay Kayak results pages")
+    parser.add_argument("--root", default="data/pages")
+    sub = parser.add_subparsers(dest="command", required=True)
+    record_parser = sub.add_parser("record", help="Fetch the farm routes with the HTTP engine and archive them")
+    record_parser.add_argument("--base-url", default="https://www.kayak.com")
+    record_parser.add_argument("--days", type=int, nargs="+", default=[0, 7, 14])
+    record_parser.add_argument("--concurrency", type=int, default=10)
+    serve_parser = sub.add_parser("serve", help="Serve the archive to the scrapers from a local server")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    extract_parser = sub.add_parser("extract", help="Time the extraction path over every archived page")
+    extract_parser.add_argument("--repeat", type=int, default=1)
+    extract_parser.add_argument("--fields", choices=["farm", "main"], default="farm")
+    sub.add_parser("stats", help="Archive size and deduplication")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    archive = PageArchive(args.root)
+
+    if args.command == "record":
+        from farm_common import ROUTES, build_tasks
+
+        record_searches(archive, build_tasks(ROUTES, args.days), args.base_url, args.concurrency)
+    elif args.command == "serve":
+        from mock_kayak import MockKayakServer
+
+        server = MockKayakServer(archive=archive, port=args.port)
+        logging.info(f"Replaying {len(archive.keys('page:'))} pages from {args.root} on {server.base_url}")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.httpd.server_close()
+    elif args.command == "extract":
+        from extraction import FARM_FIELDS, MAIN_FIELDS
+
+        print(replay_extraction(archive, FARM_FIELDS if args.fields == "farm" else MAIN_FIELDS, args.repeat))
+    else:
+        print(archive.stats())
@@ -0,0 +1,278 @@
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from normalize import normalize_flights
+
+DEFAULT_SOURCES = ["kayak_flights_data", "kayak_flights_data_EU", "data/json", "data/flights"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fares (
+    source_id INTEGER NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    travel_date TEXT,
+    scrape_time TEXT NOT NULL,
+    price_minor INTEGER,
+    currency TEXT,
+    departure_minutes INTEGER,
+    duration_minutes INTEGER,
+    stops INTEGER,
+    airline TEXT
+);
+CREATE INDEX IF NOT EXISTS fares_route ON fares (origin, destination, travel_date, scrape_time, price_minor);
+CREATE INDEX IF NOT EXISTS fares_scrape ON fares (scrape_time, origin, destination, price_minor);
+CREATE INDEX IF NOT EXISTS fares_source ON fares (source_id);
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    rows INTEGER NOT NULL
+);
+"""
+
+
+def _source_files(sources):
+    """Every archive file under the source directories: legacy JSON and flight-store Parquet parts"""
+    for source in sources:
+        if os.path.isfile(source):
+            yield source
+            continue
+        yield from sorted(glob.glob(os.path.join(source, "*.json")))
+        yield from sorted(glob.glob(os.path.join(source, "**", "part-*.parquet"), recursive=True))
+
+
+def _read_source(path):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path).to_pandas()
+    with open(path, encoding="utf-8") as f:
+        return pd.DataFrame.from_records(json.load(f))
+
+
+class PriceIndex:
+    """
+    On-disk SQLite index of every fare in the archive, for price-history queries
+
+    Rows are keyed by route, travel date and scrape time and hold the
+    normalized (integer) price, so queries read one index range instead of
+    re-opening and re-parsing JSON files. update() is incremental: only files
+    that are new or changed since the last update are (re)loaded. Legacy
+    files without a scrape_time use the file's modification time.
+    """
+
+    def __init__(self, path="data/price_index.sqlite3", sources=None):
+        self.path = path
+        self.sources = list(sources or DEFAULT_SOURCES)
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def update(self):
+        """Index new and changed archive files and drop deleted ones; returns the number of files (re)indexed"""
+        conn = self._conn()
+        known = {path: (source_id, mtime, size) for source_id, path, mtime, size
+                 in conn.execute("SELECT id, path, mtime, size FROM sources")}
+        started = time.perf_counter()
+        changed = []
+        for path in _source_files(self.sources):
+            stat = os.stat(path)
+            previous = known.get(path)
+            if previous and previous[1] == stat.st_mtime and previous[2] == stat.st_size:
+                continue
+            try:
+                raw = _read_source(path)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Price index: skipping unreadable {path}: {e}")
+                continue
+            raw["scrape_time"] = raw.get("scrape_time", pd.Series(pd.NA, index=raw.index))
+            # Legacy files carry no scrape time; the file's mtime is the best we have
+            fallback = datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+            raw["scrape_time"] = raw["scrape_time"].fillna(fallback).astype(str)
+            # Normalize per file: archives with different schemas never share a frame
+            fares = normalize_flights(raw).dropna(subset=["origin", "destination", "scrape_time"])
+            if len(raw) and fares.empty:
+                # Not recorded as a source, so a fixed parser picks it up on the next update
+                logging.warning(f"Price index: no usable fares in {path} ({len(raw)} records), not indexed")
+                continue
+            changed.append((path, stat, previous[0] if previous else None, fares))
+
+        # Fares of archive files that no longer exist must not answer queries
+        deleted = [(source_id,) for path, (source_id, _, _) in known.items() if not os.path.exists(path)]
+        if not changed and not deleted:
+            return 0
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("DELETE FROM fares WHERE source_id = ?", deleted)
+            conn.executemany("DELETE FROM sources WHERE id = ?", deleted)
+            # A file is recorded in sources in the same transaction as its fare rows
+            rows = sum(self._index_file(conn, path, stat, source_id, fares)
+                       for path, stat, source_id, fares in changed)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if deleted:
+            logging.info(f"Price index: dropped the fares of {len(deleted)} deleted files")
+        logging.info(f"Price index: indexed {len(changed)} files ({rows} fares) "
+                     f"in {time.perf_counter() - started:.2f}s")
+        return len(changed)
+
+    def _index_file(self, conn, path, stat, source_id, fares):
+        if source_id is None:
+            source_id = conn.execute("INSERT INTO sources (path, mtime, size, rows) VALUES (?, ?, ?, ?)",
+                                     (path, stat.st_mtime, stat.st_size, len(fares))).lastrowid
+        else:
+            # A rewritten file replaces everything it contributed before
+            conn.execute("DELETE FROM fares WHERE source_id = ?", (source_id,))
+            conn.execute("UPDATE sources SET mtime = ?, size = ?, rows = ? WHERE id = ?",
+                         (stat.st_mtime, stat.st_size, len(fares), source_id))
+        table = pd.DataFrame({
+            "source_id": source_id,
+            "origin": fares["origin"],
+            "destination": fares["destination"],
+            "travel_date": fares["travel_date"].dt.strftime("%Y-%m-%d"),
+            "scrape_time": fares["scrape_time"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "price_minor": fares["price_minor"],
+            "currency": fares["currency"],
+            "departure_minutes": fares["departure_minutes"],
+            "duration_minutes": fares["duration_minutes"],
+            "stops": fares["stops"],
+            "airline": fares["airline"],
+        }).astype(object)
+        table = table.where(table.notna(), None)
+        conn.executemany("INSERT INTO fares VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         table.itertuples(index=False, name=None))
+        return len(table)
+
+    def _prices(self, origin, destination, travel_date=None, since=None, until=None, currency=None):
+        clauses = ["origin = ?", "destination = ?", "price_minor IS NOT NULL"]
+        params = [origin, destination]
+        if travel_date:
+            clauses.append("travel_date = ?")
+            params.append(str(travel_date))
+        if since:
+            clauses.append("scrape_time >= ?")
+            params.append(str(since))
+        if until:
+            clauses.append("scrape_time < ?")
+            params.append(str(until))
+        if currency:
+            clauses.append("currency = ?")
+            params.append(currency)
+        query = f"SELECT scrape_time, travel_date, price_minor FROM fares WHERE {' AND '.join(clauses)}"
+        return pd.read_sql_query(query, self._conn(), params=params)
+
+    def price_stats(self, origin, destination, travel_date=None, since=None, until=None, currency=None,
+                    percentiles=(10, 90)):
+        """min/median/max and percentiles of a route's prices, in major units"""
+        prices = self._prices(origin, destination, travel_date, since, until, currency)["price_minor"].to_numpy()
+        if not len(prices):
+            return {"count": 0}
+        values = np.percentile(prices, [50, *percentiles]) / 100
+        stats = {"count": int(len(prices)), "min": float(prices.min()) / 100, "median": float(values[0]),
+                 "max": float(prices.max()) / 100}
+        stats.update({f"p{p}": float(v) for p, v in zip(percentiles, values[1:])})
+        return stats
+
+    def price_series(self, origin, destination, travel_date=None, since=None, until=None, currency=None,
+                     freq="D"):
+        """Cheapest and median price per scrape period (default: per scrape day)"""
+        frame = self._prices(origin, destination, travel_date, since, until, currency)
+        if frame.empty:
+            return pd.DataFrame(columns=["min", "median", "count"])
+        frame["scrape_time"] = pd.to_datetime(frame["scrape_time"])
+        grouped = frame.groupby(frame["scrape_time"].dt.to_period(freq))["price_minor"]
+        series = pd.DataFrame({"min": grouped.min() / 100, "median": grouped.median() / 100,
+                               "count": grouped.size()})
+        series.index.name = "scrape_period"
+        return series
+
+    def route_rankings(self, since=None, until=None, currency=None, limit=10):
+        """Routes ordered by their cheapest fare in the window"""
+        clauses = ["price_minor IS NOT NULL"]
+        params = []
+        if since:
+            clauses.append("scrape_time >= ?")
+            params.append(str(since))
+        if until:
+            clauses.append("scrape_time < ?")
+            params.append(str(until))
+        if currency:
+            clauses.append("currency = ?")
+            params.append(currency)
+        query = (f"SELECT origin, destination, MIN(price_minor) / 100.0 AS min_price, "
+                 f"AVG(price_minor) / 100.0 AS mean_price, COUNT(*) AS fares "
+                 f"FROM fares WHERE {' AND '.join(clauses)} "
+                 f"GROUP BY origin, destination ORDER BY min_price LIMIT ?")
+        return pd.read_sql_query(query, self._conn(), params=[*params, limit])
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def main(argv=None):
+    """Command line for the index: update it, then answer one query"""
+    import argparse
+    from datetime import timedelta
+
+    parser = argparse.ArgumentParser(description="Price-history queries over the scraped archive")
+    parser.add_argument("--index", default="data/price_index.sqlite3")
+    parser.add_argument("--source", action="append", help="Archive directory (repeatable); defaults to all known")
+    parser.add_argument("--days", type=int, help="Only fares scraped in the last N days")
+    parser.add_argument("--currency")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("update", help="Index new and changed archive files")
+    for name, help_text in (("stats", "Price statistics for a route"), ("series", "Price per scrape day")):
+        route_parser = sub.add_parser(name, help=help_text)
+        route_parser.add_argument("origin")
+        route_parser.add_argument("destination")
+        route_parser.add_argument("--travel-date", help="YYYY-MM-DD")
+    rank_parser = sub.add_parser("rank", help="Cheapest routes")
+    rank_parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = PriceIndex(args.index, sources=args.source)
+    index.update()
+    since = (datetime.now() - timedelta(days=args.days)).strftime("%Y-%m-%d %H:%M:%S") if args.days else None
+
+    started = time.perf_counter()
+    if args.command == "stats":
+        print(index.price_stats(args.origin, args.destination, args.travel_date, since=since, currency=args.currency))
+    elif args.command == "series":
+        print(index.price_series(args.origin, args.destination, args.travel_date, since=since,
+                                 currency=args.currency).to_string())
+    elif args.command == "rank":
+        print(index.route_rankings(since=since, currency=args.currency, limit=args.limit).to_string(index=False))
+    if args.command != "update":
+        print(f"Query took {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
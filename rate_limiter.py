@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class AdaptiveRateLimiter:
+    """
+    Token-bucket rate limiter keyed by host (and proxy) with AIMD control
+
+    Every key starts at `initial_rate` requests per second. Each clean
+    response adds `increase` to the rate (up to `max_rate`); a block, captcha
+    or timeout multiplies it by `decrease_factor` (down to `min_rate`).
+    acquire() blocks the calling thread until the key's bucket has a token;
+    acquire_async() does the same without blocking the event loop.
+    """
+
+    def __init__(self, initial_rate=0.3, min_rate=1 / 60, max_rate=2.0, increase=0.05,
+                 decrease_factor=0.5, burst=1):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.burst = burst
+
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    @staticmethod
+    def key_for(url_or_host, proxy=None):
+        host = urlparse(url_or_host).netloc if "://" in url_or_host else url_or_host
+        return f"{host}|{proxy}" if proxy else host
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = {"rate": self.initial_rate, "tokens": float(self.burst), "updated": time.monotonic(),
+                      "successes": 0, "blocks": 0}
+            self._buckets[key] = bucket
+        return bucket
+
+    def _reserve(self, key):
+        """Take a token now (possibly going into debt) and return how long to wait for it"""
+        with self._lock:
+            bucket = self._bucket(key)
+            now = time.monotonic()
+            bucket["tokens"] = min(self.burst, bucket["tokens"] + (now - bucket["updated"]) * bucket["rate"])
+            bucket["updated"] = now
+            bucket["tokens"] -= 1
+            if bucket["tokens"] >= 0:
+                return 0.0
+            return -bucket["tokens"] / bucket["rate"]
+
+    def acquire(self, host, proxy=None):
+        delay = self._reserve(self.key_for(host, proxy))
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, host, proxy=None):
+        delay = self._reserve(self.key_for(host, proxy))
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+    def record_success(self, host, proxy=None):
+        """Additive increase after a clean response"""
+        with self._lock:
+            bucket = self._bucket(self.key_for(host, proxy))
+            bucket["rate"] = min(self.max_rate, bucket["rate"] + self.increase)
+            bucket["successes"] += 1
+
+    def record_block(self, host, proxy=None, reason="blocked"):
+        """Multiplicative decrease after a block, captcha or timeout"""
+        key = self.key_for(host, proxy)
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket["rate"] = max(self.min_rate, bucket["rate"] * self.decrease_factor)
+            bucket["blocks"] += 1
+            rate = bucket["rate"]
+        logging.warning(f"Rate limiter: {reason} on {key}, slowing to {rate * 60:.1f} requests/min")
+
+    def current_rate(self, host, proxy=None):
+        """Current allowed requests per second for a host/proxy"""
+        with self._lock:
+            return self._bucket(self.key_for(host, proxy))["rate"]
+
+    def snapshot(self):
+        """Per-key rate (requests/s) and outcome counters, for run summaries"""
+        with self._lock:
+            return {
+                key: {"rate": round(bucket["rate"], 4), "successes": bucket["successes"], "blocks": bucket["blocks"]}
+                for key, bucket in self._buckets.items()
+            }
@@ -0,0 +1,324 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from scheduler import travel_date
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedule (
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    travel_date TEXT NOT NULL,
+    date TEXT NOT NULL,
+    interval REAL NOT NULL,
+    next_due REAL NOT NULL,
+    last_scraped REAL,
+    min_price INTEGER,
+    median_price INTEGER,
+    scrapes INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    PRIMARY KEY (origin, destination, travel_date)
+);
+CREATE INDEX IF NOT EXISTS schedule_due ON schedule (next_due);
+"""
+
+
+def price_signature(flights):
+    """(cheapest, median) fare in minor units, or (None, None) when no price parses"""
+    from normalize import normalize_flights
+
+    prices = normalize_flights(flights)["price_minor"].dropna()
+    if prices.empty:
+        return None, None
+    return int(prices.min()), int(prices.median())
+
+
+def _moved(old, new, threshold):
+    if old is None or new is None:
+        return old != new
+    return abs(new - old) > threshold * max(old, 1)
+
+
+class RecrawlSchedule:
+    """
+    Persistent per route-date recrawl schedule in SQLite
+
+    Every route and travel date has its own interval. A scrape whose
+    cheapest or median fare moved by more than `change_threshold` since the
+    previous one divides the interval by `speedup`; an unchanged one
+    multiplies it by `backoff`, both bounded by min/max_interval. Failures
+    are retried after `retry_interval` and do not touch the interval. A
+    travel date is never left unchecked for more than a quarter of the time
+    left until it. Dates in the past are dropped.
+    """
+
+    def __init__(self, path="data/recrawl.sqlite3", initial_interval=3600, min_interval=900,
+                 max_interval=7 * 86400, speedup=2.0, backoff=2.0, change_threshold=0.01, retry_interval=900):
+        self.path = path
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.speedup = speedup
+        self.backoff = backoff
+        self.change_threshold = change_threshold
+        self.retry_interval = retry_interval
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def sync(self, tasks):
+        """Add route-date tasks the schedule does not know yet (due now) and drop past travel dates"""
+        now = time.time()
+        rows = [(t["origin"], t["destination"], travel_date(t).isoformat(), t["date"], self.initial_interval, now)
+                for t in tasks if travel_date(t)]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO schedule (origin, destination, travel_date, date, interval, "
+                             "next_due) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            added = conn.total_changes - before
+            dropped = conn.execute("DELETE FROM schedule WHERE travel_date < ?",
+                                   (date.today().isoformat(),)).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if added or dropped:
+            logging.info(f"Recrawl schedule: {added} route-dates added, {dropped} past dates dropped")
+        return added
+
+    def due(self, limit, now=None):
+        """Up to `limit` entries whose time has come, most overdue first"""
+        rows = self._conn().execute("SELECT * FROM schedule WHERE next_due <= ? ORDER BY next_due LIMIT ?",
+                                    (now or time.time(), limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def next_due(self):
+        row = self._conn().execute("SELECT MIN(next_due) AS due FROM schedule").fetchone()
+        return row["due"]
+
+    def record(self, entry, flights, error=None):
+        """Reschedule an entry after a scrape; returns True when its prices moved"""
+        now = time.time()
+        key = (entry["origin"], entry["destination"], entry["travel_date"])
+        if error is not None or not flights:
+            self._conn().execute(
+                "UPDATE schedule SET next_due = ?, failures = failures + 1, last_error = ? "
+                "WHERE origin = ? AND destination = ? AND travel_date = ?",
+                (now + self.retry_interval, str(error or "no flights found"), *key))
+            return False
+
+        min_price, median_price = price_signature(flights)
+        first = entry["scrapes"] == 0
+        moved = not first and (_moved(entry["min_price"], min_price, self.change_threshold)
+                               or _moved(entry["median_price"], median_price, self.change_threshold))
+        if first:
+            interval = entry["interval"]
+        elif moved:
+            interval = entry["interval"] / self.speedup
+        else:
+            interval = entry["interval"] * self.backoff
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        # Fares move faster as the travel date nears
+        until_travel = (date.fromisoformat(entry["travel_date"]) - date.today()).days * 86400
+        next_due = now + max(min(interval, until_travel / 4), self.min_interval)
+        self._conn().execute(
+            "UPDATE schedule SET interval = ?, next_due = ?, last_scraped = ?, min_price = ?, median_price = ?, "
+            "scrapes = scrapes + 1, changes = changes + ?, last_error = NULL "
+            "WHERE origin = ? AND destination = ? AND travel_date = ?",
+            (interval, next_due, now, min_price, median_price, int(moved), *key))
+        return moved
+
+    def entries(self):
+        return [dict(row) for row in self._conn().execute("SELECT * FROM schedule ORDER BY next_due")]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RecrawlDaemon:
+    """
+    Long-running farm that keeps every route-date on its RecrawlSchedule
+
+    Each cycle re-syncs the routes x days_ahead task set (travel dates roll
+    forward with the calendar), then scrapes the most overdue entries, at
+    most `workers` at a time. The global `pages_per_hour` budget is a token
+    bucket charged for every page load, retries included, so fast-moving
+    routes take capacity from stable ones instead of adding to it. stop()
+    (or SIGINT/SIGTERM under run_forever) ends the loop after the current
+    cycle.
+
+    scrape(origin, destination, date_str, metrics=...) defaults to
+    farm.scrape_flight_data on a shared DriverPool; flights are saved with
+    farm.summarize_task, to flight_store when one is given.
+    """
+
+    def __init__(self, routes=None, days_ahead=None, schedule=None, pages_per_hour=120, workers=2,
+                 scrape=None, flight_store=None, poll_seconds=60):
+        from farm_common import ROUTES
+
+        self.routes = routes or ROUTES
+        self.days_ahead = days_ahead or [0, 7, 14]
+        self.schedule = schedule or RecrawlSchedule()
+        self.pages_per_hour = pages_per_hour
+        self.workers = workers
+        self.scrape = scrape
+        self.flight_store = flight_store
+        self.poll_seconds = poll_seconds
+        self.cycles = 0
+        self._pool = None
+        self._tokens = float(workers)
+        self._refilled = time.monotonic()
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.workers), self._tokens + (now - self._refilled) * self.pages_per_hour / 3600)
+        self._refilled = now
+
+    def _scraper(self):
+        if self.scrape is not None:
+            return self.scrape
+        from driver_pool import DriverPool
+        from farm import scrape_flight_data, setup_driver
+        from rate_limiter import AdaptiveRateLimiter
+
+        self._pool = DriverPool(lambda: setup_driver(headless=True), max_size=self.workers)
+        limiter = AdaptiveRateLimiter()
+        self.scrape = lambda origin, destination, date_str, **kwargs: scrape_flight_data(
+            origin, destination, date_str, pool=self._pool, limiter=limiter, **kwargs)
+        return self.scrape
+
+    def run_once(self):
+        """One cycle; returns how many route-dates were scraped"""
+        from farm_common import build_tasks, summarize_task
+        from metrics import RunMetrics
+
+        self.schedule.sync(build_tasks(self.routes, self.days_ahead))
+        self._refill()
+        entries = self.schedule.due(min(self.workers, math.floor(self._tokens)))
+        if not entries:
+            return 0
+
+        scrape = self._scraper()
+        metrics = RunMetrics(f"recrawl-{self.cycles}", planned=entries)
+
+        def crawl(entry):
+            started = time.perf_counter()
+            try:
+                flights = scrape(entry["origin"], entry["destination"], entry["date"], metrics=metrics)
+                error = None
+            except Exception as e:
+                logging.error(f"Recrawl of {entry['origin']} to {entry['destination']} on {entry['date']} "
+                              f"failed: {e}", exc_info=True)
+                flights, error = [], e
+            metrics.record(entry, flights, time.perf_counter() - started, error=error and str(error))
+            if flights:
+                summarize_task(flights, entry["origin"], entry["destination"], entry["date"], self.flight_store)
+            return self.schedule.record(entry, flights, error)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            moved = list(executor.map(crawl, entries))
+        if self.flight_store is not None:
+            self.flight_store.flush()
+
+        report = metrics.finish().report()
+        # Charge what was actually loaded; scrapers that do not count pages cost one per task
+        self._tokens -= report["pages"] or len(entries)
+        self.cycles += 1
+        logging.info(f"Recrawl cycle {self.cycles}: {len(entries)} route-dates, {sum(moved)} moved, "
+                     f"{report['pages'] or len(entries)} pages, {max(self._tokens, 0):.1f} pages of budget left")
+        return len(entries)
+
+    def _sleep_seconds(self):
+        """Until the next entry is due or the budget has a page again, at most poll_seconds"""
+        self._refill()
+        wait_budget = (1 - self._tokens) * 3600 / self.pages_per_hour if self._tokens < 1 else 0
+        next_due = self.schedule.next_due()
+        wait_due = max(next_due - time.time(), 0) if next_due is not None else self.poll_seconds
+        return min(max(wait_budget, wait_due, 1), self.poll_seconds)
+
+    def run_forever(self):
+        import signal
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                signal.signal(sig, lambda *_: self.stop())
+            except ValueError:
+                pass  # Not the main thread
+        logging.info(f"Recrawl daemon: {len(self.routes)} routes x {len(self.days_ahead)} dates, "
+                     f"{self.pages_per_hour} pages/hour, schedule in {self.schedule.path}")
+        try:
+            while not self._stop.is_set():
+                if not self.run_once():
+                    self._stop.wait(self._sleep_seconds())
+        finally:
+            if self._pool:
+                self._pool.close()
+            logging.info(f"Recrawl daemon stopped after {self.cycles} cycles")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Keep route-dates fresh, revisiting volatile fares sooner")
+    parser.add_argument("--schedule", default="data/recrawl.sqlite3")
+    parser.add_argument("--days", type=int, nargs="+", default=[0, 7, 14])
+    parser.add_argument("--pages-per-hour", type=float, default=120)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--engine", choices=["browser", "http"], default="browser")
+    parser.add_argument("--base-url", help="Results site for the HTTP engine, e.g. a mock or replay server")
+    parser.add_argument("--flight-store", help="Write flights to a Parquet flight store at this root")
+    parser.add_argument("--show", action="store_true", help="Print the schedule and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    schedule = RecrawlSchedule(args.schedule)
+    if args.show:
+        for entry in schedule.entries():
+            due = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["next_due"]))
+            print(f"{entry['origin']:>10} -> {entry['destination']:<10} {entry['travel_date']}  due {due}  "
+                  f"every {entry['interval'] / 3600:.1f}h  {entry['changes']}/{entry['scrapes']} changed")
+    else:
+        scrape = None
+        if args.engine == "http":
+            from http_engine import scrape_flight_data_http
+            from kayak_urls import KAYAK_BASE_URL
+
+            base_url = args.base_url or KAYAK_BASE_URL
+            scrape = lambda origin, destination, date_str, **kwargs: scrape_flight_data_http(
+                origin, destination, date_str, base_url=base_url, fallback=False, **kwargs)
+        flight_store = None
+        if args.flight_store:
+            from flight_store import FlightStoreWriter
+
+            flight_store = FlightStoreWriter(args.flight_store, source="recrawl")
+        RecrawlDaemon(days_ahead=args.days, schedule=schedule, pages_per_hour=args.pages_per_hour,
+                      workers=args.workers, scrape=scrape, flight_store=flight_store).run_forever()
+        if flight_store is not None:
+            flight_store.close()
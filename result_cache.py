@@ -0,0 +1,118 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Freshness-aware cache of scraped flights keyed by (origin, destination, date)
+
+    Entries live in a size-bounded in-memory LRU and, when `directory` is set,
+    as JSON files on disk bounded by `max_disk_entries` (least recently used
+    files are evicted first). Each route can have its own TTL through
+    `route_ttls` {(origin, destination): seconds}; everything else uses
+    `default_ttl`. Hit/miss counters are kept for run summaries.
+    """
+
+    def __init__(self, directory="data/cache", default_ttl=600, route_ttls=None,
+                 max_memory_entries=256, max_disk_entries=5000):
+        self.directory = directory
+        self.default_ttl = default_ttl
+        self.route_ttls = dict(route_ttls or {})
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _key(origin, destination, date_str):
+        return f"{origin.strip().lower()}|{destination.strip().lower()}|{date_str.strip()}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def ttl_for(self, origin, destination):
+        return self.route_ttls.get((origin, destination), self.default_ttl)
+
+    def get(self, origin, destination, date_str):
+        """Cached flights if they are younger than the route's TTL, otherwise None"""
+        key = self._key(origin, destination, date_str)
+        max_age = self.ttl_for(origin, destination)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+
+        if entry is None and self.directory:
+            path = self._path(key)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = json.load(f)
+                os.utime(path)  # Mark as recently used for disk eviction
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+
+        with self._lock:
+            if entry is not None and now - entry["stored_at"] <= max_age:
+                self.hits += 1
+                return entry["flights"]
+            self.misses += 1
+        return None
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def put(self, origin, destination, date_str, flights):
+        """Store a fresh scrape; empty results are not cached so failures get retried"""
+        if not flights:
+            return
+        key = self._key(origin, destination, date_str)
+        entry = {"key": key, "stored_at": time.time(), "flights": flights}
+        self._remember(key, entry)
+
+        if self.directory:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+
+    def _evict_disk(self):
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+        excess = len(entries) - self.max_disk_entries
+        if excess <= 0:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:excess]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+        logging.info(f"Result cache: evicted {excess} least recently used entries from disk")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
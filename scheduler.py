@@ -0,0 +1,208 @@
+import logging
+import math
+import queue
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from multiprocessing.managers import BaseManager
+
+_DATE_FORMATS = ("%B %d, %Y", "%B %d %Y", "%Y-%m-%d", "%d/%m/%Y")
+
+
+def travel_date(task):
+    """The task's travel date, or None when it has none or it does not parse"""
+    value = task.get("date")
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def task_deadline(task):
+    """A task's deadline as epoch seconds: accepts epoch numbers, datetimes and ISO strings"""
+    value = task.get("deadline")
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def route_priority(task, priorities=None):
+    """Explicit task/route "priority" first, then the (origin, destination) -> weight mapping; higher runs first"""
+    if task.get("priority") is not None:
+        return task["priority"]
+    return (priorities or {}).get((task["origin"], task["destination"]), 0)
+
+
+def task_sort_key(task, priorities=None, today=None):
+    """Higher route priority first, then the nearest travel date (the fares that move most), then deadline"""
+    day = travel_date(task)
+    days_out = (day - (today or date.today())).days if day else math.inf
+    deadline = task_deadline(task)
+    return -route_priority(task, priorities), days_out, deadline if deadline is not None else math.inf
+
+
+def order_tasks(tasks, priorities=None, today=None):
+    """Tasks in scheduling order; the sort is stable, so ties keep their route x days order"""
+    return sorted(tasks, key=lambda task: task_sort_key(task, priorities, today))
+
+
+class Scheduler:
+    """
+    Priority- and deadline-aware task scheduler with work stealing
+
+    Tasks are sorted by task_sort_key() and dealt round-robin into one deque
+    per worker, so every worker starts on its share of the most valuable
+    work. next(worker) pops the worker's own highest-priority task, unless
+    another deque's next task ranks higher, in which case it takes that one.
+    A worker whose deque is empty steals the front (highest-priority) half
+    of the longest other deque, so no worker sits idle while another has a
+    backlog and high-value routes still run first.
+
+    Tasks may carry a "deadline" (epoch seconds, datetime or ISO string).
+    A task whose deadline is closer than `urgency` times the running mean
+    task duration is taken first, whichever deque it is in. A task already past its
+    deadline when it comes up is dropped and listed in expired().
+
+    All methods are thread-safe. For worker processes, share one instance
+    through shared_scheduler().
+    """
+
+    def __init__(self, tasks, workers=1, priorities=None, urgency=2.0, task_seconds=60.0):
+        self.workers = max(workers, 1)
+        self.urgency = urgency
+        self._lock = threading.Lock()
+        # Deques hold (sort key, task) so workers can compare each other's next task
+        self._queues = [deque() for _ in range(self.workers)]
+        today = date.today()
+        ranked = sorted(((task_sort_key(task, priorities, today), task) for task in tasks), key=lambda item: item[0])
+        for i, item in enumerate(ranked):
+            self._queues[i % self.workers].append(item)
+        self._deadlined = sum(1 for q in self._queues for _, task in q if task.get("deadline") is not None)
+        self._task_seconds = task_seconds
+        self._finished = 0
+        self._stolen = 0
+        self._urgent = 0
+        self._expired = []
+
+    def _take_urgent(self, now):
+        """Earliest-deadline task due within the urgency horizon from any deque, or None"""
+        horizon = now + self.urgency * self._task_seconds
+        best = None
+        for q in self._queues:
+            for item in q:
+                deadline = task_deadline(item[1])
+                if deadline is not None and deadline <= horizon and (best is None or deadline < best[0]):
+                    best = (deadline, q, item)
+        if best is None:
+            return None
+        best[1].remove(best[2])
+        self._urgent += 1
+        return best[2][1]
+
+    def _steal(self, worker):
+        """Move the front half of the longest other deque, its highest-priority tasks, to this worker"""
+        victim = max(range(self.workers), key=lambda i: len(self._queues[i]))
+        count = math.ceil(len(self._queues[victim]) / 2)
+        if not count:
+            return False
+        stolen = [self._queues[victim].popleft() for _ in range(count)]
+        self._queues[worker].extend(stolen)
+        self._stolen += count
+        return True
+
+    def _take_best(self, worker):
+        """The worker's next task, or another deque's next task when that one ranks higher"""
+        own = self._queues[worker]
+        best = min((q for q in self._queues if q), key=lambda q: q[0][0])
+        if best is not own and own and own[0][0] <= best[0][0]:
+            best = own
+        if best is not own:
+            self._stolen += 1
+        return best.popleft()[1]
+
+    def next(self, worker=0):
+        """The next task for a worker, or None when every deque is empty"""
+        worker %= self.workers
+        with self._lock:
+            while True:
+                now = time.time()
+                task = self._take_urgent(now) if self._deadlined else None
+                if task is None:
+                    if not self._queues[worker] and not self._steal(worker):
+                        return None
+                    task = self._take_best(worker)
+                deadline = task_deadline(task)
+                if deadline is not None:
+                    self._deadlined -= 1
+                    if deadline < now:
+                        logging.warning(f"Scheduler: dropping {task['origin']} to {task['destination']} on "
+                                        f"{task['date']}, its deadline passed")
+                        self._expired.append(task)
+                        continue
+                return task
+
+    def done(self, task, seconds):
+        """Report a finished task's duration; it sets how early deadline tasks are pulled forward"""
+        with self._lock:
+            self._finished += 1
+            # Running mean of task durations
+            self._task_seconds += (seconds - self._task_seconds) / self._finished
+
+    def expired(self):
+        with self._lock:
+            return list(self._expired)
+
+    def stats(self):
+        with self._lock:
+            return {"remaining": sum(len(q) for q in self._queues), "finished": self._finished,
+                    "stolen": self._stolen, "urgent": self._urgent, "expired": len(self._expired),
+                    "mean_task_seconds": round(self._task_seconds, 2)}
+
+    def queue(self, worker):
+        return WorkerQueue(self, worker)
+
+
+class WorkerQueue:
+    """One worker's view of a Scheduler with the queue.Queue calls farm.worker uses"""
+
+    def __init__(self, scheduler, worker):
+        self.scheduler = scheduler
+        self.worker = worker
+        self._current = None
+
+    def get_nowait(self):
+        task = self.scheduler.next(self.worker)
+        if task is None:
+            raise queue.Empty
+        self._current = (task, time.perf_counter())
+        return task
+
+    def task_done(self):
+        task, started = self._current
+        self.scheduler.done(task, time.perf_counter() - started)
+
+
+class _SchedulerManager(BaseManager):
+    pass
+
+
+_SchedulerManager.register("Scheduler", Scheduler, exposed=("next", "done", "expired", "stats"))
+
+
+def shared_scheduler(tasks, workers=1, **kwargs):
+    """
+    A Scheduler served from a manager process, for ProcessPoolExecutor workers
+    Returns (manager, proxy); the proxy pickles into workers, call manager.shutdown() when done
+    """
+    manager = _SchedulerManager()
+    manager.start()
+    return manager, manager.Scheduler(tasks, workers, **kwargs)
@@ -0,0 +1,260 @@
+import copy
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+ASCENDING = 1  # pymongo.ASCENDING
+
+# Fields that identify one fare observation; upserts are keyed on whichever are present
+KEY_FIELDS = ("origin", "destination", "date", "scrape_time", "flight_number", "departure_time", "price")
+INDEX_FIELDS = ("origin", "destination", "date", "scrape_time")
+
+
+def to_document(record):
+    """Map a farm.py or main.py flight record onto one MongoDB document"""
+    doc = {k: v for k, v in record.items() if k not in ("Origin", "Destination", "time")}
+    doc["origin"] = record.get("origin") or record.get("Origin")
+    doc["destination"] = record.get("destination") or record.get("Destination")
+    if "time" in record:
+        doc["departure_time"] = record["time"]
+    stamp = record.get("scrape_time")
+    if isinstance(stamp, str):
+        stamp = datetime.strptime(stamp, "%Y-%m-%d %H:%M:%S")
+    doc["scrape_time"] = stamp or datetime.now().replace(microsecond=0)
+    return doc
+
+
+class BufferedSink:
+    """
+    Write-behind buffer in front of a slow store
+
+    write() only appends to an in-memory buffer and returns; a background
+    thread commits batches of `batch_size` records, or whatever is waiting
+    once `flush_interval` seconds have passed. Scraping threads therefore
+    never wait on the store. If the buffer grows past `max_pending` because
+    the store is down, the oldest records are dropped and counted. A failed
+    batch is put back and retried on the next round.
+
+    Subclasses implement _write_batch(records).
+    """
+
+    def __init__(self, batch_size=500, flush_interval=5.0, max_pending=100000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._pending = deque()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"{type(self).__name__}-writer", daemon=True)
+        self._thread.start()
+
+    def _write_batch(self, records):
+        raise NotImplementedError
+
+    def write(self, records):
+        """
+        Queue records for the background writer; never blocks on the store
+        Records without a scrape_time are stamped now, so a retried batch keeps its upsert keys
+        """
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        records = [record if record.get("scrape_time") else {**record, "scrape_time": stamp} for record in records]
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Sink is closed")
+            self._pending.extend(records)
+            overflow = len(self._pending) - self.max_pending
+            for _ in range(max(overflow, 0)):
+                self._pending.popleft()
+            if overflow > 0:
+                self.dropped += overflow
+                logging.warning(f"{type(self).__name__}: buffer full, dropped {overflow} oldest records")
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _take_batch(self):
+        with self._cond:
+            deadline = time.monotonic() + self.flush_interval
+            while not self._closed and len(self._pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self._pending), self.batch_size)
+            batch = [self._pending.popleft() for _ in range(count)]
+            self._in_flight = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    logging.error(f"{type(self).__name__}: batch of {len(batch)} failed, will retry: {e}")
+                    with self._cond:
+                        self._pending.extendleft(reversed(batch))
+                        self._in_flight = 0
+                        self._cond.notify_all()
+                        closed = self._closed
+                    if closed:
+                        # Don't spin on a dead store during shutdown
+                        return
+                    time.sleep(min(self.flush_interval, 5))
+                    continue
+                with self._cond:
+                    self.written += len(batch)
+                    self.batches += 1
+                    self._in_flight = 0
+                    self._cond.notify_all()
+
+            with self._cond:
+                if self._closed and not self._pending:
+                    return
+
+    def flush(self, timeout=None):
+        """Wait until everything written so far has been committed; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while (self._pending or self._in_flight) and self._thread.is_alive():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                # Wake the writer early instead of letting it sit out flush_interval
+                self._cond.notify_all()
+                self._cond.wait(0.1 if remaining is None else min(remaining, 0.1))
+        return not self._pending
+
+    def close(self, timeout=30):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self._pending:
+            logging.warning(f"{type(self).__name__}: {len(self._pending)} records were never committed")
+
+    def stats(self):
+        with self._cond:
+            return {"written": self.written, "batches": self.batches, "pending": len(self._pending),
+                    "dropped": self.dropped}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MongoSink(BufferedSink):
+    """
+    Buffered MongoDB sink for scraped flights
+
+    Batches go out as one unordered bulk_write of upserts keyed on KEY_FIELDS,
+    so a retried batch never duplicates a fare (records are stamped with
+    their scrape_time when queued). A
+    compound index on (origin, destination, date, scrape_time) is created on
+    start. Pass `collection` to use an existing collection, e.g. a
+    MemoryCollection for local runs without a mongod.
+    """
+
+    def __init__(self, uri="mongodb://localhost:27017", database="flights", collection="tickets", **kwargs):
+        if isinstance(collection, str):
+            try:
+                from pymongo import MongoClient
+            except ImportError:
+                raise ImportError("MongoSink needs pymongo: pip install pymongo")
+            self.client = MongoClient(uri)
+            collection = self.client[database][collection]
+        else:
+            self.client = None
+        self.collection = collection
+        self.collection.create_index([(field, ASCENDING) for field in INDEX_FIELDS], name="route_date_scrape")
+        super().__init__(**kwargs)
+
+    def _write_batch(self, records):
+        upserts = []
+        for record in records:
+            doc = to_document(record)
+            upserts.append(({field: doc[field] for field in KEY_FIELDS if field in doc}, {"$set": doc}))
+        if hasattr(self.collection, "bulk_upsert"):
+            # MemoryCollection
+            self.collection.bulk_upsert(upserts)
+            return
+        from pymongo import UpdateOne
+
+        self.collection.bulk_write([UpdateOne(key, update, upsert=True) for key, update in upserts], ordered=False)
+
+    def close(self, timeout=30):
+        super().close(timeout)
+        if self.client is not None:
+            self.client.close()
+
+
+class MemoryCollection:
+    """
+    In-process stand-in for the slice of the pymongo Collection API MongoSink uses
+
+    Supports create_index, insert_many, bulk_upsert of (filter, update) pairs
+    (equality filters and $set only, what MongoSink sends to bulk_write as
+    upserting UpdateOne operations), find and count_documents.
+    """
+
+    def __init__(self):
+        self.documents = []
+        self.indexes = {}
+        self._lock = threading.Lock()
+
+    def create_index(self, keys, name=None, **kwargs):
+        name = name or "_".join(f"{field}_{direction}" for field, direction in keys)
+        self.indexes[name] = list(keys)
+        return name
+
+    def _matches(self, doc, filter):
+        return all(doc.get(field) == value for field, value in (filter or {}).items())
+
+    def insert_many(self, documents, ordered=True):
+        with self._lock:
+            self.documents.extend(copy.deepcopy(list(documents)))
+
+    def bulk_upsert(self, upserts):
+        with self._lock:
+            for filter, update in upserts:
+                target = next((doc for doc in self.documents if self._matches(doc, filter)), None)
+                if target is None:
+                    target = dict(filter)
+                    self.documents.append(target)
+                target.update(copy.deepcopy(update.get("$set", {})))
+
+    def find(self, filter=None):
+        with self._lock:
+            return [dict(doc) for doc in self.documents if self._matches(doc, filter)]
+
+    def count_documents(self, filter):
+        return len(self.find(filter))
+
+
+class MultiSink:
+    """Hand the same records to several sinks, e.g. the Parquet store and MongoDB"""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def write(self, records):
+        for sink in self.sinks:
+            sink.write(records)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,312 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from scheduler import travel_date
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    date TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    summary TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (origin, destination, date)
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_expires);
+"""
+
+
+class TaskStore:
+    """
+    Durable route-date task queue backed by SQLite
+
+    Tasks move pending -> leased -> done, or back to pending on failure until
+    `max_attempts` is used up, after which they are marked failed. Failed
+    tasks are queued again with fresh attempts once `retry_failed_after`
+    seconds have passed (None: never). A lease that is not completed before
+    it expires (crashed worker, OOM-killed Chrome, Ctrl-C) is handed out
+    again, so a restarted farm resumes where the last one stopped. Unfinished
+    tasks whose travel date has passed are dropped instead of scraped. The
+    database runs in WAL mode and leases are taken inside BEGIN IMMEDIATE
+    transactions, so several threads and processes can lease from the same
+    file safely.
+    """
+
+    def __init__(self, path="data/tasks.sqlite3", lease_seconds=900, max_attempts=3, retry_failed_after=6 * 3600):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_failed_after = retry_failed_after
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    @staticmethod
+    def _to_task(row):
+        task = dict(row)
+        task["summary"] = json.loads(task["summary"]) if task["summary"] else None
+        return task
+
+    def add_tasks(self, tasks):
+        """Insert route-date tasks, skipping ones the store already knows; returns how many were new"""
+        now = time.time()
+        conn = self._transaction()
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (origin, destination, date, updated_at) VALUES (?, ?, ?, ?)",
+                [(t["origin"], t["destination"], t["date"], now) for t in tasks],
+            )
+            added = conn.total_changes - before
+            self._prune_past(conn, time.time())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if added < len(tasks):
+            logging.info(f"Task store: {len(tasks) - added} of {len(tasks)} tasks already known, resuming")
+        return added
+
+    def lease(self, owner, lease_seconds=None):
+        """Atomically claim the next pending (or expired) task; returns None when nothing is available"""
+        now = time.time()
+        expires = now + (lease_seconds or self.lease_seconds)
+        conn = self._transaction()
+        try:
+            # Expired leases that already used every attempt are given up on
+            conn.execute(
+                "UPDATE tasks SET state = ?, last_error = COALESCE(last_error, 'lease expired'), updated_at = ? "
+                "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, self.max_attempts),
+            )
+            if self.retry_failed_after is not None:
+                self._requeue_failed(conn, now - self.retry_failed_after)
+            while True:
+                row = conn.execute(
+                    "SELECT id, date FROM tasks WHERE state = ? OR (state = ? AND lease_expires < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (PENDING, LEASED, now),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                # A run that crosses midnight must not lease yesterday's travel date
+                if not self._is_past(row["date"]):
+                    break
+                conn.execute("DELETE FROM tasks WHERE id = ?", (row["id"],))
+                logging.info(f"Task store: dropped task {row['id']}, its travel date {row['date']} has passed")
+            conn.execute(
+                "UPDATE tasks SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, "
+                "updated_at = ? WHERE id = ?",
+                (LEASED, owner, expires, now, row["id"]),
+            )
+            task = conn.execute("SELECT * FROM tasks WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self._to_task(task)
+
+    @staticmethod
+    def _is_past(date_str):
+        day = travel_date({"date": date_str})
+        return day is not None and day < date.today()
+
+    def _prune_past(self, conn, now):
+        """Delete unfinished tasks whose travel date has passed; leases still running are left alone"""
+        rows = conn.execute(
+            "SELECT id, date FROM tasks WHERE state IN (?, ?) OR (state = ? AND lease_expires < ?)",
+            (PENDING, FAILED, LEASED, now),
+        ).fetchall()
+        past = [(row["id"],) for row in rows if self._is_past(row["date"])]
+        conn.executemany("DELETE FROM tasks WHERE id = ?", past)
+        if past:
+            logging.info(f"Task store: dropped {len(past)} tasks whose travel date has passed")
+        return len(past)
+
+    def _requeue_failed(self, conn, failed_before):
+        return conn.execute(
+            "UPDATE tasks SET state = ?, attempts = 0, updated_at = ? WHERE state = ? AND updated_at < ?",
+            (PENDING, time.time(), FAILED, failed_before),
+        ).rowcount
+
+    def retry_failed(self):
+        """Queue every failed task again with fresh attempts; returns how many"""
+        conn = self._transaction()
+        try:
+            count = self._requeue_failed(conn, float("inf"))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def _update_owned(self, task_id, owner, sql, params):
+        conn = self._transaction()
+        try:
+            cursor = conn.execute(sql + " WHERE id = ? AND state = ? AND lease_owner = ?",
+                                  (*params, task_id, LEASED, owner))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if cursor.rowcount == 0:
+            logging.warning(f"Task store: task {task_id} is no longer leased by {owner}")
+            return False
+        return True
+
+    def heartbeat(self, task_id, owner, lease_seconds=None):
+        """Extend a lease that is still being worked on"""
+        expires = time.time() + (lease_seconds or self.lease_seconds)
+        return self._update_owned(task_id, owner, "UPDATE tasks SET lease_expires = ?", (expires,))
+
+    def complete(self, task_id, owner, summary=None):
+        return self._update_owned(
+            task_id, owner,
+            "UPDATE tasks SET state = ?, lease_owner = NULL, lease_expires = NULL, last_error = NULL, "
+            "summary = ?, updated_at = ?",
+            (DONE, json.dumps(summary) if summary is not None else None, time.time()),
+        )
+
+    def fail(self, task_id, owner, error, summary=None):
+        """Record a failed attempt: back to pending, or failed once attempts are used up"""
+        return self._update_owned(
+            task_id, owner,
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, lease_owner = NULL, "
+            "lease_expires = NULL, last_error = ?, summary = ?, updated_at = ?",
+            (self.max_attempts, FAILED, PENDING, str(error),
+             json.dumps(summary) if summary is not None else None, time.time()),
+        )
+
+    def release(self, task_id, owner):
+        """Hand a lease back untouched (e.g. on shutdown) without counting the attempt"""
+        return self._update_owned(
+            task_id, owner,
+            "UPDATE tasks SET state = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+            "lease_expires = NULL, updated_at = ?",
+            (PENDING, time.time()),
+        )
+
+    def release_owned(self, owner_prefix):
+        """Hand back every lease whose owner starts with owner_prefix, e.g. all threads of a stopping process"""
+        conn = self._transaction()
+        try:
+            cursor = conn.execute(
+                "UPDATE tasks SET state = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE state = ? AND substr(lease_owner, 1, ?) = ?",
+                (PENDING, time.time(), LEASED, len(owner_prefix), owner_prefix),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount
+
+    def counts(self):
+        """Number of tasks in each state"""
+        rows = self._conn().execute("SELECT state, COUNT(*) AS n FROM tasks GROUP BY state").fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update({row["state"]: row["n"] for row in rows})
+        return counts
+
+    def tasks(self, state=None):
+        if state:
+            rows = self._conn().execute("SELECT * FROM tasks WHERE state = ? ORDER BY id", (state,)).fetchall()
+        else:
+            rows = self._conn().execute("SELECT * FROM tasks ORDER BY id").fetchall()
+        return [self._to_task(row) for row in rows]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class LeaseHeartbeat:
+    """
+    Keeps extending a lease from a background thread while its task runs
+
+    `beat()` extends the lease and returns False once it has been lost; it is
+    called every `interval` seconds (default a third of `lease_seconds`) until
+    the with block exits, so a slow scrape is not handed to another worker.
+    """
+
+    def __init__(self, beat, task_id, lease_seconds=None, interval=None):
+        self.beat = beat
+        self.task_id = task_id
+        self.interval = interval or max((lease_seconds or 900) / 3, 1)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{task_id}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.beat():
+                    logging.warning(f"Lost the lease on task {self.task_id}")
+                    return
+            except Exception as e:
+                logging.warning(f"Heartbeat failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect a scraper farm task store")
+    parser.add_argument("path", nargs="?", default="data/tasks.sqlite3")
+    parser.add_argument("--failed", action="store_true", help="List failed tasks with their last error")
+    parser.add_argument("--retry-failed", action="store_true", help="Queue failed tasks again now")
+    args = parser.parse_args()
+
+    store = TaskStore(args.path)
+    if args.retry_failed:
+        print(f"{store.retry_failed()} failed tasks queued again")
+    print(json.dumps(store.counts(), indent=4))
+    if args.failed:
+        for task in store.tasks(FAILED):
+            print(f"{task['origin']} to {task['destination']} on {task['date']}: "
+                  f"{task['attempts']} attempts, {task['last_error']}")
@@ -0,0 +1,49 @@
+"""AdaptiveRateLimiter token buckets and AIMD rate control"""
+import asyncio
+import time
+
+import pytest
+
+from rate_limiter import AdaptiveRateLimiter
+
+
+def test_keys_are_per_host_and_proxy():
+    assert AdaptiveRateLimiter.key_for("https://www.kayak.com/flights/KHI-LHE") == "www.kayak.com"
+    assert AdaptiveRateLimiter.key_for("www.kayak.com", "10.0.0.1:8080") == "www.kayak.com|10.0.0.1:8080"
+
+
+def test_success_adds_and_block_halves_within_bounds():
+    limiter = AdaptiveRateLimiter(initial_rate=1.0, min_rate=0.2, max_rate=1.1, increase=0.05, decrease_factor=0.5)
+    limiter.record_success("a")
+    assert limiter.current_rate("a") == pytest.approx(1.05)
+    for _ in range(5):
+        limiter.record_success("a")
+    assert limiter.current_rate("a") == pytest.approx(1.1)
+    limiter.record_block("a")
+    assert limiter.current_rate("a") == pytest.approx(0.55)
+    for _ in range(5):
+        limiter.record_block("a")
+    assert limiter.current_rate("a") == pytest.approx(0.2)
+    # Other hosts keep their own rate
+    assert limiter.current_rate("b") == pytest.approx(1.0)
+    assert limiter.snapshot()["a"] == {"rate": 0.2, "successes": 6, "blocks": 6}
+
+
+def test_burst_is_free_then_requests_are_paced():
+    limiter = AdaptiveRateLimiter(initial_rate=20, max_rate=20, burst=2)
+    assert limiter.acquire("a") == 0 and limiter.acquire("a") == 0
+    started = time.monotonic()
+    waited = limiter.acquire("a")
+    assert waited == pytest.approx(0.05, abs=0.02)
+    assert time.monotonic() - started >= 0.04
+
+
+def test_async_acquire_reserves_tokens_in_order():
+    limiter = AdaptiveRateLimiter(initial_rate=50, max_rate=50, burst=1)
+
+    async def run():
+        return await asyncio.gather(*(limiter.acquire_async("a") for _ in range(3)))
+
+    waits = asyncio.run(run())
+    assert waits[0] == 0
+    assert waits[1] == pytest.approx(0.02, abs=0.01) and waits[2] == pytest.approx(0.04, abs=0.01)
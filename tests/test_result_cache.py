@@ -0,0 +1,79 @@
+"""ResultCache TTLs, LRU bounds and the farm skipping the store for cached results"""
+import pytest
+
+from result_cache import ResultCache
+
+FLIGHTS = [{"origin": "Karachi", "destination": "Lahore", "price": "$120"}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("result_cache.time.time", lambda: now[0])
+    return now
+
+
+def test_hit_until_the_route_ttl_runs_out(clock):
+    cache = ResultCache(directory=None, default_ttl=60, route_ttls={("Dubai", "London"): 5})
+    cache.put("Karachi", "Lahore", "June 5, 2030", FLIGHTS)
+    cache.put("Dubai", "London", "June 5, 2030", FLIGHTS)
+    clock[0] += 30
+    assert cache.get(" karachi ", "LAHORE", "June 5, 2030") == FLIGHTS
+    assert cache.get("Dubai", "London", "June 5, 2030") is None
+    clock[0] += 31
+    assert cache.get("Karachi", "Lahore", "June 5, 2030") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 0.333}
+
+
+def test_empty_results_are_not_cached():
+    cache = ResultCache(directory=None)
+    cache.put("Karachi", "Lahore", "June 5, 2030", [])
+    assert cache.get("Karachi", "Lahore", "June 5, 2030") is None
+
+
+def test_memory_is_lru_bounded():
+    cache = ResultCache(directory=None, max_memory_entries=2)
+    for day in (1, 2):
+        cache.put("A", "B", f"June {day}, 2030", FLIGHTS)
+    cache.get("A", "B", "June 1, 2030")  # Most recently used now
+    cache.put("A", "B", "June 3, 2030", FLIGHTS)
+    assert cache.get("A", "B", "June 2, 2030") is None
+    assert cache.get("A", "B", "June 1, 2030") == FLIGHTS
+
+
+def test_disk_entries_survive_a_new_instance_and_are_bounded(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_disk_entries=2)
+    for day in (1, 2, 3):
+        cache.put("A", "B", f"June {day}, 2030", FLIGHTS)
+    assert len(list(tmp_path.glob("*.json"))) == 2
+    reopened = ResultCache(directory=str(tmp_path))
+    assert reopened.get("A", "B", "June 3, 2030") == FLIGHTS
+
+
+def test_farm_does_not_store_cached_flights_again(tmp_path, monkeypatch):
+    farm = pytest.importorskip("farm")
+    monkeypatch.chdir(tmp_path)
+
+    class Sink:
+        rows = []
+
+        def write(self, records):
+            self.rows.extend(records)
+
+        def close(self):
+            pass
+
+    def scrape(origin, destination, date_str, options=None, **kwargs):
+        flights = [{"origin": origin, "destination": destination, "date": date_str, "price": "$1"}]
+        options.cache.put(origin, destination, date_str, flights)
+        return flights
+
+    monkeypatch.setattr(farm, "scrape_flight_data", scrape)
+    cache = ResultCache(directory=None)
+    routes = [{"origin": "Karachi", "destination": "Lahore"}]
+    for _ in range(2):
+        results = farm.run_scraper_farm(routes=routes, days_ahead=[1, 2], cache=cache, flight_store=Sink(),
+                                        limiter=farm.AdaptiveRateLimiter())
+        assert [r["flights_found"] for r in results] == [1, 1]
+    assert len(Sink.rows) == 2
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,70 @@
+"""Scheduler ordering, priority-aware stealing and deadlines"""
+import threading
+import time
+
+from farm_common import get_formatted_date
+from scheduler import Scheduler, order_tasks
+
+
+def task(origin, days=7, **extra):
+    return {"origin": origin, "destination": "Lahore", "date": get_formatted_date(days), **extra}
+
+
+def drain(scheduler, worker=0):
+    tasks = []
+    while (task := scheduler.next(worker)) is not None:
+        tasks.append(task)
+    return tasks
+
+
+def test_order_is_priority_then_nearest_date():
+    tasks = [task("A", 14), task("B", 1), task("C", 7, priority=5), task("D", 0)]
+    assert [t["origin"] for t in order_tasks(tasks)] == ["C", "D", "B", "A"]
+
+
+def test_lone_worker_drains_in_priority_order():
+    tasks = [task(f"P{p}-{i}", priority=p) for i in range(4) for p in (0, 1, 2)]
+    scheduler = Scheduler(tasks, workers=3)
+    # Worker 0 steals and takes other deques' heads, so it still sees the best task first
+    assert [t["priority"] for t in drain(scheduler)] == [2] * 4 + [1] * 4 + [0] * 4
+    assert scheduler.stats()["stolen"] > 0
+
+
+def test_idle_worker_takes_the_best_remaining_task():
+    tasks = [task(f"T{i}", days=i) for i in range(8)]
+    scheduler = Scheduler(tasks, workers=2)
+    # Worker 1 starts on T1 but worker 0's head T0 ranks higher, so it goes first
+    assert [scheduler.next(1)["origin"] for _ in range(4)] == ["T0", "T1", "T2", "T3"]
+    assert [t["origin"] for t in drain(scheduler, 1)] == ["T4", "T5", "T6", "T7"]
+    assert scheduler.stats()["stolen"] >= 2
+
+
+def test_concurrent_workers_get_every_task_once():
+    tasks = [task(f"T{i}", days=i % 20, priority=i % 3) for i in range(200)]
+    scheduler = Scheduler(tasks, workers=4)
+    taken = [[] for _ in range(4)]
+    threads = [threading.Thread(target=lambda w=w: taken[w].extend(drain(scheduler, w))) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    origins = [t["origin"] for worker_tasks in taken for t in worker_tasks]
+    assert sorted(origins) == sorted(t["origin"] for t in tasks)
+
+
+def test_deadline_pulls_a_task_forward_and_expired_ones_are_dropped():
+    now = time.time()
+    tasks = [task("High", priority=9), task("Soon", deadline=now + 30), task("Gone", deadline=now - 1)]
+    scheduler = Scheduler(tasks, workers=1, task_seconds=60)
+    assert [t["origin"] for t in drain(scheduler)] == ["Soon", "High"]
+    assert [t["origin"] for t in scheduler.expired()] == ["Gone"]
+    assert scheduler.stats()["urgent"] >= 1
+
+
+def test_worker_queue_reports_durations():
+    scheduler = Scheduler([task("A"), task("B")], workers=1, task_seconds=60)
+    worker_queue = scheduler.queue(0)
+    worker_queue.get_nowait()
+    worker_queue.task_done()
+    stats = scheduler.stats()
+    assert stats["finished"] == 1 and stats["mean_task_seconds"] < 1
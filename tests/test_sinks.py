@@ -0,0 +1,114 @@
+"""Write-behind buffering, retries and upsert dedup in the MongoDB sink, against a MemoryCollection"""
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from sinks import MemoryCollection, MongoSink, MultiSink, to_document
+
+
+def record(number, price="$100", **fields):
+    return {"origin": "Karachi", "destination": "Lahore", "date": "June 5, 2030", "flight_number": number,
+            "time": "9:00 am – 11:00 am", "price": price, **fields}
+
+
+class FlakyCollection(MemoryCollection):
+    """Fails the first `failures` batches, as a briefly unreachable mongod would"""
+
+    def __init__(self, failures=1):
+        super().__init__()
+        self.failures = failures
+        self.calls = 0
+
+    def bulk_upsert(self, upserts):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("mongod unreachable")
+        super().bulk_upsert(upserts)
+
+
+class BlockedCollection(MemoryCollection):
+    """Holds every batch until released, so records pile up in the buffer"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def bulk_upsert(self, upserts):
+        self.release.wait(5)
+        super().bulk_upsert(upserts)
+
+
+def test_to_document_maps_both_record_shapes():
+    doc = to_document(record(1, scrape_time="2030-06-01 08:30:00"))
+    assert doc["departure_time"] == "9:00 am – 11:00 am" and "time" not in doc
+    assert doc["scrape_time"] == datetime(2030, 6, 1, 8, 30)
+
+    main_doc = to_document({"Origin": "Dubai", "Destination": "London", "price": "$300"})
+    assert (main_doc["origin"], main_doc["destination"]) == ("Dubai", "London")
+    assert "Origin" not in main_doc and isinstance(main_doc["scrape_time"], datetime)
+
+
+def test_batches_are_written_and_upserts_dedupe():
+    collection = MemoryCollection()
+    with MongoSink(collection=collection, batch_size=2, flush_interval=0.05) as sink:
+        stamped = [record(n, scrape_time="2030-06-01 08:30:00") for n in (1, 2, 3)]
+        sink.write(stamped)
+        sink.write(stamped[:2])  # The same fares again, e.g. a retried task
+        assert sink.flush(timeout=5)
+        assert sink.stats()["written"] == 5
+    assert "route_date_scrape" in collection.indexes
+    assert len(collection.documents) == 3
+
+
+def test_records_are_stamped_when_queued():
+    collection = MemoryCollection()
+    with MongoSink(collection=collection, batch_size=10, flush_interval=0.05) as sink:
+        sink.write([record(1)])
+        assert sink.flush(timeout=5)
+    assert isinstance(collection.documents[0]["scrape_time"], datetime)
+
+
+def test_failed_batch_is_retried_without_duplicates():
+    collection = FlakyCollection(failures=1)
+    with MongoSink(collection=collection, batch_size=2, flush_interval=0.05) as sink:
+        sink.write([record(1), record(2)])
+        assert sink.flush(timeout=5)
+        assert sink.stats() == {"written": 2, "batches": 1, "pending": 0, "dropped": 0}
+    assert collection.calls == 2
+    assert len(collection.documents) == 2
+
+
+def test_overflow_drops_the_oldest_records():
+    collection = BlockedCollection()
+    sink = MongoSink(collection=collection, batch_size=1, flush_interval=0.05, max_pending=3)
+    try:
+        sink.write([record(1)])
+        while sink.stats()["pending"]:  # Wait for the writer to take record 1 and block on it
+            time.sleep(0.01)
+        sink.write([record(n) for n in (2, 3, 4, 5, 6)])
+        assert sink.stats()["dropped"] == 2
+        collection.release.set()
+        assert sink.flush(timeout=5)
+    finally:
+        collection.release.set()
+        sink.close()
+    assert sorted(doc["flight_number"] for doc in collection.documents) == [1, 4, 5, 6]
+
+
+def test_write_after_close_raises():
+    sink = MongoSink(collection=MemoryCollection(), flush_interval=0.05)
+    sink.close()
+    with pytest.raises(RuntimeError):
+        sink.write([record(1)])
+
+
+def test_multisink_fans_out():
+    first, second = MemoryCollection(), MemoryCollection()
+    sinks = MultiSink(MongoSink(collection=first, flush_interval=0.05),
+                      MongoSink(collection=second, flush_interval=0.05))
+    sinks.write([record(1), record(2)])
+    sinks.flush()
+    sinks.close()
+    assert len(first.documents) == len(second.documents) == 2
@@ -0,0 +1,26 @@
+"""Which heavy packages each cli.py subcommand loads before doing any work"""
+import pytest
+
+import cli
+
+# Packages a subcommand must not import; anything else it needs may load
+FORBIDDEN = {
+    "--help": cli.HEAVY_PACKAGES,
+    "bench": cli.HEAVY_PACKAGES,
+    "report": cli.HEAVY_PACKAGES,
+    "crawl --engine http": ("selenium", "numpy", "pandas", "pyarrow", "matplotlib", "joblib", "pymongo"),
+    "farm --async http": ("selenium", "numpy", "pandas", "pyarrow", "matplotlib", "joblib", "pymongo"),
+    "query": ("selenium", "httpx", "matplotlib", "joblib", "pymongo"),
+    "crawl": ("httpx", "numpy", "pandas", "pyarrow", "matplotlib", "joblib", "pymongo"),
+    "farm": ("httpx", "numpy", "pandas", "pyarrow", "matplotlib", "joblib", "pymongo"),
+}
+
+
+def test_every_subcommand_is_covered():
+    assert set(FORBIDDEN) == set(cli.STARTUP_PROBES)
+
+
+@pytest.mark.parametrize("command", sorted(cli.STARTUP_PROBES))
+def test_heavy_imports(command):
+    heavy = cli.probe_startup(cli.STARTUP_PROBES[command])["heavy"]
+    assert not set(heavy) & set(FORBIDDEN[command]), f"{command} loads {heavy}"
@@ -0,0 +1,104 @@
+"""TaskStore leases, heartbeats, retries and resuming"""
+import time
+
+from farm_common import get_formatted_date
+from task_store import DONE, FAILED, LEASED, PENDING, LeaseHeartbeat, TaskStore
+
+
+def make_store(tmp_path, **kwargs):
+    return TaskStore(str(tmp_path / "tasks.sqlite3"), **kwargs)
+
+
+def task(origin="Karachi", destination="Lahore", days=7):
+    return {"origin": origin, "destination": destination, "date": get_formatted_date(days)}
+
+
+def test_lease_complete_and_resume(tmp_path):
+    store = make_store(tmp_path)
+    assert store.add_tasks([task(days=1), task(days=2)]) == 2
+    leased = store.lease("w1")
+    assert leased["state"] == LEASED and leased["attempts"] == 1
+    assert store.complete(leased["id"], "w1", {"flights_found": 3})
+    store.close()
+
+    # A restarted run knows the finished task and only leases the open one
+    resumed = make_store(tmp_path)
+    assert resumed.add_tasks([task(days=1), task(days=2)]) == 0
+    assert resumed.counts() == {PENDING: 1, LEASED: 0, DONE: 1, FAILED: 0}
+    assert resumed.lease("w2")["date"] == task(days=2)["date"]
+    assert resumed.lease("w2") is None
+
+
+def test_expired_lease_is_handed_out_again(tmp_path):
+    store = make_store(tmp_path, lease_seconds=0.2)
+    store.add_tasks([task()])
+    first = store.lease("crashed")
+    assert store.lease("other") is None
+    time.sleep(0.3)
+    second = store.lease("other")
+    assert second["id"] == first["id"] and second["attempts"] == 2
+    # The crashed worker no longer owns it
+    assert not store.complete(first["id"], "crashed")
+    assert store.complete(second["id"], "other")
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    store = make_store(tmp_path, lease_seconds=0.4)
+    store.add_tasks([task()])
+    leased = store.lease("w1")
+    with LeaseHeartbeat(lambda: store.heartbeat(leased["id"], "w1"), leased["id"], interval=0.1):
+        time.sleep(0.8)
+        assert store.lease("w2") is None
+    assert store.complete(leased["id"], "w1")
+
+
+def test_heartbeat_stops_once_the_lease_is_lost():
+    beats = []
+    with LeaseHeartbeat(lambda: beats.append(1) or False, 1, interval=0.05):
+        time.sleep(0.3)
+    assert beats == [1]
+
+
+def test_failures_use_up_attempts_then_retry_later(tmp_path):
+    store = make_store(tmp_path, max_attempts=2, retry_failed_after=0.3)
+    store.add_tasks([task()])
+    for _ in range(2):
+        leased = store.lease("w1")
+        store.fail(leased["id"], "w1", "no flights found")
+    assert store.counts()[FAILED] == 1
+    assert store.lease("w1") is None
+    time.sleep(0.4)
+    retried = store.lease("w1")
+    assert retried["attempts"] == 1 and retried["last_error"] == "no flights found"
+
+
+def test_retry_failed_requeues_now(tmp_path):
+    store = make_store(tmp_path, max_attempts=1, retry_failed_after=None)
+    store.add_tasks([task()])
+    store.fail(store.lease("w1")["id"], "w1", "boom")
+    assert store.lease("w1") is None
+    assert store.retry_failed() == 1
+    assert store.lease("w1") is not None
+
+
+def test_release_owned_returns_leases_without_an_attempt(tmp_path):
+    store = make_store(tmp_path)
+    store.add_tasks([task(days=1), task(days=2), task(days=3)])
+    store.lease("host:1:a")
+    store.lease("host:1:b")
+    other = store.lease("host:2:a")
+    assert store.release_owned("host:1:") == 2
+    assert store.counts() == {PENDING: 2, LEASED: 1, DONE: 0, FAILED: 0}
+    assert all(t["attempts"] == 0 for t in store.tasks(PENDING))
+    assert store.tasks(LEASED)[0]["id"] == other["id"]
+
+
+def test_past_travel_dates_are_pruned(tmp_path):
+    store = make_store(tmp_path)
+    store.add_tasks([task(days=-2), task(days=0)])
+    assert [t["date"] for t in store.tasks()] == [task(days=0)["date"]]
+
+    # A task whose date passes while the store is open is dropped at lease time
+    store._conn().execute("UPDATE tasks SET date = ?", (task(days=-1)["date"],))
+    assert store.lease("w1") is None
+    assert store.tasks() == []
@@ -0,0 +1,181 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from metrics import percentile
+
+
+@contextlib.contextmanager
+def _null_span():
+    yield {}
+
+
+class Tracer:
+    """
+    Per-stage timing spans for one run
+
+    Each span records its stage, task, retry number, wall-clock start/end,
+    duration and outcome ("ok", the exception type, or whatever the scraper
+    set on the span, e.g. "timeout" for a wait it tolerates). Spans are
+    buffered and appended to a JSONL trace file; durations are also kept per
+    stage so breakdown() can summarize the run without re-reading the file.
+    Safe to share between threads.
+    """
+
+    def __init__(self, label, path="data/traces.jsonl", flush_every=500):
+        self.run_id = f"{label}-{time.strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.path = path
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._durations = {}
+        self._errors = {}
+
+    @contextlib.contextmanager
+    def span(self, stage, task=None, retry=0, **attrs):
+        origin, destination, date = task or (None, None, None)
+        record = {"run": self.run_id, "stage": stage, "origin": origin, "destination": destination, "date": date,
+                  "retry": retry, "thread": threading.current_thread().name, **attrs}
+        record["start"] = time.time()
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.setdefault("outcome", type(e).__name__)
+            raise
+        finally:
+            record["seconds"] = round(time.perf_counter() - started, 6)
+            record["end"] = record["start"] + record["seconds"]
+            record.setdefault("outcome", "ok")
+            self._add(record)
+
+    def _add(self, record):
+        with self._lock:
+            self._buffer.append(record)
+            self._durations.setdefault(record["stage"], []).append(record["seconds"])
+            if record["outcome"] != "ok":
+                self._errors[record["stage"]] = self._errors.get(record["stage"], 0) + 1
+            full = len(self._buffer) >= self.flush_every
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Append buffered spans to the trace file"""
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+            if not spans:
+                return 0
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(span) + "\n" for span in spans)
+        return len(spans)
+
+    def breakdown(self):
+        with self._lock:
+            durations = {stage: list(values) for stage, values in self._durations.items()}
+            errors = dict(self._errors)
+        return _breakdown(durations, errors)
+
+
+def _breakdown(durations, errors):
+    """Per-stage count, failures, total/mean/p50/p95/max seconds and share of traced time, slowest first"""
+    traced = sum(sum(values) for values in durations.values())
+    stages = {}
+    for stage, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        total = sum(values)
+        stages[stage] = {
+            "count": len(values),
+            "errors": errors.get(stage, 0),
+            "total_seconds": round(total, 3),
+            "mean_seconds": round(total / len(values), 3),
+            "p50_seconds": round(percentile(values, 50), 3),
+            "p95_seconds": round(percentile(values, 95), 3),
+            "max_seconds": round(max(values), 3),
+            "share": round(total / traced, 3) if traced else 0.0,
+        }
+    return stages
+
+
+class TaskTrace:
+    """
+    Spans of one task, tagged with its route and the current retry number
+    A TaskTrace without a tracer records nothing, so scrapers can always call span()
+    """
+
+    def __init__(self, tracer, origin, destination, date):
+        self.tracer = tracer
+        self.task = (origin, destination, date)
+        self.retry = 0
+
+    def span(self, stage, **attrs):
+        if self.tracer is None:
+            return _null_span()
+        return self.tracer.span(stage, task=self.task, retry=self.retry, **attrs)
+
+
+def load_spans(path="data/traces.jsonl", run_id=None):
+    """Spans of one run from a trace file; the most recent run when run_id is None"""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                spans.append(json.loads(line))
+    if run_id is None and spans:
+        run_id = spans[-1]["run"]
+    return [span for span in spans if span["run"] == run_id]
+
+
+def breakdown_spans(spans):
+    durations, errors = {}, {}
+    for span in spans:
+        durations.setdefault(span["stage"], []).append(span["seconds"])
+        if span["outcome"] != "ok":
+            errors[span["stage"]] = errors.get(span["stage"], 0) + 1
+    return _breakdown(durations, errors)
+
+
+def format_breakdown(breakdown, label="Stage breakdown"):
+    lines = [f"=== {label} ===",
+             f"{'stage':<26}{'count':>7}{'errors':>8}{'total s':>10}{'p50 s':>9}{'p95 s':>9}{'max s':>9}{'share':>8}"]
+    for stage, stats in breakdown.items():
+        lines.append(f"{stage:<26}{stats['count']:>7}{stats['errors']:>8}{stats['total_seconds']:>10.2f}"
+                     f"{stats['p50_seconds']:>9.2f}{stats['p95_seconds']:>9.2f}{stats['max_seconds']:>9.2f}"
+                     f"{stats['share']:>8.1%}")
+    return "\n".join(lines)
+
+
+def log_breakdown(tracer):
+    """Flush a run's spans and log its per-stage breakdown"""
+    tracer.flush()
+    breakdown = tracer.breakdown()
+    if breakdown:
+        for line in format_breakdown(breakdown, f"Stages of {tracer.run_id}").splitlines():
+            logging.info(line)
+        logging.info(f"Spans of {tracer.run_id} appended to {tracer.path}")
+    return breakdown
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Per-stage latency breakdown of a traced run")
+    parser.add_argument("path", nargs="?", default="data/traces.jsonl")
+    parser.add_argument("--run", help="Run id; defaults to the most recent run in the file")
+    parser.add_argument("--list", action="store_true", help="List the run ids in the file")
+    args = parser.parse_args()
+
+    if args.list:
+        with open(args.path, encoding="utf-8") as f:
+            runs = dict.fromkeys(json.loads(line)["run"] for line in f if line.strip())
+        print("\n".join(runs))
+    else:
+        spans = load_spans(args.path, args.run)
+        if not spans:
+            raise SystemExit(f"No spans for {args.run or 'any run'} in {args.path}")
+        print(format_breakdown(breakdown_spans(spans), f"Stages of {spans[0]['run']} ({len(spans)} spans)"))